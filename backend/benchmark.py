@@ -0,0 +1,262 @@
+"""
+Micro-benchmarks of the layout pipeline on synthetic layouts.
+
+Usage:
+    python -m backend.benchmark                                # 10^3 .. 10^5
+    python -m backend.benchmark --sizes 1000000 10000000 --data-dir /tmp/synth
+    python -m backend.benchmark -o new.json --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from backend.layout_synth import write_layout_file
+from backend.models import GenerateRequest
+from backend.plot_layout import parse_data_file
+from backend.services.job_manager import JobManager
+from backend.services.layout_parser import LayoutParser
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# SSE clients reading one job during the fan-out benchmark
+FANOUT_SUBSCRIBERS = 50
+# lines published before the subscribers get to drain them
+FANOUT_BATCH = 1000
+
+
+# every benchmark takes the layout file and its size and returns the step to
+# time, doing its setup outside of it
+def _parse_layout_file(path: Path, size: int) -> Callable[[], Any]:
+    # a fresh parser each time, so nothing comes from its cache
+    return lambda: asyncio.run(LayoutParser().parse_layout_file(path))
+
+
+def _to_parsed_layout(path: Path, size: int) -> Callable[[], Any]:
+    parser = LayoutParser()
+    data = parser._load(path.read_text())
+    return lambda: parser._to_parsed_layout(data)
+
+
+def _layout_json(path: Path, size: int) -> Callable[[], Any]:
+    parser = LayoutParser()
+    data = parser._load(path.read_text())
+    return lambda: parser._to_layout_json(data)
+
+
+def _layout_body(path: Path, size: int) -> Callable[[], Any]:
+    # the JSON of /api/layouts/{job_id} in every encoding served
+    parser = LayoutParser()
+    data = parser._load(path.read_text())
+    return lambda: parser._body_from_data(data)
+
+
+def _plot_parse_data_file(path: Path, size: int) -> Callable[[], Any]:
+    return lambda: parse_data_file(str(path))
+
+
+def _broadcast(path: Path, size: int) -> Callable[[], Any]:
+    # one generator line per polygon handed to every subscriber of the job
+    async def run() -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            job_manager = JobManager(Path(tmp_dir), Path(sys.executable))
+            job = await job_manager.create_job(GenerateRequest())
+            subscriptions = [
+                job_manager.add_subscriber(job.job_id)
+                for _ in range(FANOUT_SUBSCRIBERS)
+            ]
+
+            async def drain(subscription) -> int:
+                received = 0
+                while True:
+                    batch = await subscription.next_batch()
+                    received += len(batch.lines) + batch.dropped
+                    if batch.finished:
+                        return received
+
+            readers = [asyncio.create_task(drain(s)) for s in subscriptions]
+            for index in range(1, size + 1):
+                job_manager._handle_output(
+                    job.job_id, f"[{index}/{size}] Generate polygon layer=Metal1"
+                )
+                if index % FANOUT_BATCH == 0:
+                    await asyncio.sleep(0)
+            job_manager._broadcast(job.job_id, None)
+            assert await asyncio.gather(*readers) == [size] * FANOUT_SUBSCRIBERS
+            job_manager.logs.close(job.job_id)
+            await job_manager.flush()
+
+    return lambda: asyncio.run(run())
+
+
+BENCHMARKS: dict[str, Callable[[Path, int], Callable[[], Any]]] = {
+    "parse_layout_file": _parse_layout_file,
+    "to_parsed_layout": _to_parsed_layout,
+    "layout_json": _layout_json,
+    "layout_body": _layout_body,
+    "plot_parse_data_file": _plot_parse_data_file,
+    "broadcast": _broadcast,
+}
+
+
+def measure(step: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """Best time of ``repeat`` runs, and the peak memory of one traced run."""
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        step()
+        seconds.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        step()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def layout_path(data_dir: Path, size: int, seed: int) -> Path:
+    """The synthetic layout of ``size`` polygons, written on first use."""
+    path = data_dir / f"synthetic-{size}-{seed}.txt"
+    if not path.exists():
+        partial = path.with_suffix(".partial")
+        write_layout_file(partial, size, seed)
+        partial.replace(path)
+    return path
+
+
+def run(
+    names: list[str], sizes: list[int], data_dir: Path, seed: int, repeat: int
+) -> dict[str, Any]:
+    results: dict[str, dict[str, dict[str, float]]] = {name: {} for name in names}
+    for size in sizes:
+        path = layout_path(data_dir, size, seed)
+        for name in names:
+            step = BENCHMARKS[name](path, size)
+            result = results[name][str(size)] = measure(step, repeat)
+            print(
+                f"{name:>22} {size:>9}: {result['seconds']:8.3f} s "
+                f"{result['seconds'] / size * 1e6:8.2f} us/polygon "
+                f"{result['peak_bytes'] / 2**20:9.1f} MiB"
+            )
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    results: dict[str, Any],
+    baseline: dict[str, Any],
+    tolerance: float,
+    memory_tolerance: float,
+    min_seconds: float = 0.0,
+) -> list[str]:
+    """Benchmarks slower or bigger than the baseline beyond the tolerances."""
+    regressions = []
+    for name, sizes in results["results"].items():
+        for size, result in sizes.items():
+            reference = baseline.get("results", {}).get(name, {}).get(size)
+            if reference is None:
+                continue
+            limits = {"seconds": tolerance, "peak_bytes": memory_tolerance}
+            if max(result["seconds"], reference["seconds"]) < min_seconds:
+                del limits["seconds"]
+            for key, limit in limits.items():
+                ratio = result[key] / reference[key] if reference[key] else 1.0
+                flag = "REGRESSION" if ratio > 1 + limit else "ok"
+                print(f"{name:>22} {size:>9} {key:>10}: {ratio:6.2f}x {flag}")
+                if ratio > 1 + limit:
+                    regressions.append(f"{name} {size} {key} {ratio:.2f}x")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Layout pipeline benchmarks.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Polygon counts of the synthetic layouts (default: 10^3 to 10^5).",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size.")
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="Keep the synthetic layouts here between runs (default: a temp dir).",
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmark.json", help="Results JSON path."
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Baseline results JSON to check against."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown over the baseline (default: 0.25, i.e. 25%%).",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.1,
+        help="Allowed peak memory growth over the baseline (default: 0.1).",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.05,
+        help="Times below this on both sides are not compared (default: 0.05).",
+    )
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = Path(args.data_dir or tmp_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        results = run(args.benchmarks, args.sizes, data_dir, args.seed, args.repeat)
+    Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(
+            results,
+            baseline,
+            args.tolerance,
+            args.memory_tolerance,
+            args.min_seconds,
+        )
+        if regressions:
+            print(f"{len(regressions)} regressions: " + ", ".join(regressions))
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
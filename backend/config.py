@@ -14,3 +14,55 @@ GENERATOR_SCRIPT = Path(
 )
 
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
+
+# approximate memory budget for parsed layouts kept by the layout parser
+LAYOUT_CACHE_BYTES = int(os.getenv("LAYOUT_CACHE_BYTES", str(512 * 1024 * 1024)))
+
+# size in pixels of the preview rendered when a job completes
+PREVIEW_WIDTH = int(os.getenv("PREVIEW_WIDTH", "256"))
+
+# default side of the density windows of /stats, in layout units (um)
+STATS_WINDOW = float(os.getenv("STATS_WINDOW", "10.0"))
+
+# JSON design rules checked on every completed layout, see data/drc_rules.json;
+# unset skips the check
+DRC_RULES = os.getenv("DRC_RULES") or None
+
+# largest overlay upload accepted, in bytes
+OVERLAY_MAX_BYTES = int(os.getenv("OVERLAY_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# seconds between polls of the geometry file of a running job
+LAYOUT_STREAM_INTERVAL = float(os.getenv("LAYOUT_STREAM_INTERVAL", "0.25"))
+
+# opt-in cache of generator outputs keyed on the request and generator script
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "0") == "1"
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", str(JOBS_DIR / ".results")))
+RESULT_CACHE_MAX_AGE = float(os.getenv("RESULT_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1024**3)))
+
+# job scheduler: concurrent generator processes, wall-clock timeout per job in
+# seconds, and optional address-space (bytes) and cpu (seconds) limits
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", str(os.cpu_count() or 4)))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "0")) or None
+JOB_MEMORY_LIMIT = int(os.getenv("JOB_MEMORY_LIMIT", "0")) or None
+JOB_CPU_LIMIT = int(os.getenv("JOB_CPU_LIMIT", "0")) or None
+
+# warm generator workers (0 runs one interpreter per job) and jobs per worker
+# before it is recycled
+GENERATOR_WORKERS = int(os.getenv("GENERATOR_WORKERS", "0"))
+GENERATOR_WORKER_MAX_JOBS = int(os.getenv("GENERATOR_WORKER_MAX_JOBS", "50"))
+
+# retention of finished job directories: maximum age in seconds and total size
+# in bytes of the jobs directory, and log lines kept in memory per job
+JOB_RETENTION_AGE = float(os.getenv("JOB_RETENTION_AGE", "0")) or None
+JOB_RETENTION_BYTES = int(os.getenv("JOB_RETENTION_BYTES", "0")) or None
+LOG_TAIL_LINES = int(os.getenv("LOG_TAIL_LINES", "200"))
+
+# log lines buffered per SSE subscriber before lines are dropped, and how long
+# in seconds and up to how many lines new log lines are batched into one event
+SSE_BUFFER_LINES = int(os.getenv("SSE_BUFFER_LINES", "1000"))
+SSE_BATCH_WINDOW = float(os.getenv("SSE_BATCH_WINDOW", "0.1"))
+SSE_BATCH_LINES = int(os.getenv("SSE_BATCH_LINES", "500"))
+
+# minimum seconds between progress events of one job
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "0.1"))
@@ -0,0 +1,263 @@
+"""
+Array-based rasterizer for layout rectangles, using only NumPy and zlib.
+"""
+
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, Sequence
+
+import numpy as np
+
+# background of the layout view, also used by plot_layout
+BACKGROUND = "#1e1e2e"
+
+# style of any layer missing from display_config
+DEFAULT_STYLE = {
+    "facecolor": "grey",
+    "edgecolor": "black",
+    "alpha": 0.4,
+    "linewidth": 0.5,
+    "zorder": 1,
+}
+
+# the named colours used by display_config, as CSS/matplotlib define them
+_NAMED_COLORS = {
+    "black": "#000000",
+    "blue": "#0000ff",
+    "cornflowerblue": "#6495ed",
+    "darkgoldenrod": "#b8860b",
+    "darkgray": "#a9a9a9",
+    "darkgreen": "#006400",
+    "darkorange": "#ff8c00",
+    "darkslategray": "#2f4f4f",
+    "fuchsia": "#ff00ff",
+    "gray": "#808080",
+    "grey": "#808080",
+    "indianred": "#cd5c5c",
+    "indigo": "#4b0082",
+    "khaki": "#f0e68c",
+    "limegreen": "#32cd32",
+    "mediumaquamarine": "#66cdaa",
+    "navy": "#000080",
+    "olive": "#808000",
+    "olivedrab": "#6b8e23",
+    "peru": "#cd853f",
+    "plum": "#dda0dd",
+    "purple": "#800080",
+    "red": "#ff0000",
+    "rosybrown": "#bc8f8f",
+    "royalblue": "#4169e1",
+    "salmon": "#fa8072",
+    "sandybrown": "#f4a460",
+    "slategrey": "#708090",
+    "teal": "#008080",
+    "thistle": "#d8bfd8",
+    "turquoise": "#40e0d0",
+    "white": "#ffffff",
+}
+
+
+def to_rgb(color: str | None) -> np.ndarray | None:
+    """Return a colour as float32 RGB in [0, 1], or None for ``"none"``."""
+    if color is None or color == "none":
+        return None
+    value = _NAMED_COLORS.get(color.lower(), color)
+    if not (value.startswith("#") and len(value) == 7):
+        # unknown names render grey rather than failing the whole image
+        value = _NAMED_COLORS["grey"]
+    return np.array([int(value[i : i + 2], 16) for i in (1, 3, 5)], np.float32) / 255
+
+
+def coverage_counts(
+    rows0: np.ndarray,
+    cols0: np.ndarray,
+    rows1: np.ndarray,
+    cols1: np.ndarray,
+    height: int,
+    width: int,
+) -> np.ndarray:
+    """Number of half-open pixel boxes [r0, r1) x [c0, c1) over each pixel."""
+    stride = width + 1
+    size = (height + 1) * stride
+    if size > np.iinfo(np.int32).max:
+        rows0, cols0, rows1, cols1 = (
+            a.astype(np.int64) for a in (rows0, cols0, rows1, cols1)
+        )
+    plus = np.concatenate((rows0 * stride + cols0, rows1 * stride + cols1))
+    minus = np.concatenate((rows0 * stride + cols1, rows1 * stride + cols0))
+    diff = np.bincount(plus, minlength=size) - np.bincount(minus, minlength=size)
+    counts = diff.astype(np.int32).reshape(height + 1, stride)
+    np.cumsum(counts, axis=0, out=counts)
+    np.cumsum(counts, axis=1, out=counts)
+    return counts[:height, :width]
+
+
+def _composite(
+    image: np.ndarray, counts: np.ndarray, color: np.ndarray, alpha: float
+) -> None:
+    if alpha <= 0:
+        return
+    # opacity of 0, 1, 2, ... stacked copies, looked up per pixel
+    stacked = np.arange(int(counts.max()) + 1)
+    opacity = (1 - np.power(1 - alpha, stacked)).astype(np.float32)
+
+    # most groups cover a small part of their window, touch only those pixels
+    if np.count_nonzero(counts) * 4 < counts.size:
+        covered = np.nonzero(counts)
+        pixel_opacity = opacity[counts[covered]]
+        for plane, value in zip(image, color):
+            pixels = plane[covered]
+            plane[covered] = pixels + (value - pixels) * pixel_opacity
+        return
+
+    opacity = opacity[counts]
+    delta = np.empty_like(opacity)
+    for plane, value in zip(image, color):
+        np.subtract(value, plane, out=delta)
+        delta *= opacity
+        plane += delta
+
+
+# data class to store rectangles grouped by style, prepared once per layout
+@dataclass
+class Rects:
+    # float32 sides of each rectangle, whatever the corner order of the input
+    left: np.ndarray
+    bottom: np.ndarray
+    right: np.ndarray
+    top: np.ndarray
+    # style i owns rows starts[i]:starts[i + 1]
+    starts: np.ndarray
+
+    @classmethod
+    def from_coords(
+        cls, coords: np.ndarray, style_ids: np.ndarray, styles: int
+    ) -> Rects:
+        """Group (x0, y0, x1, y1) rows by their index into ``styles`` styles."""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        style_ids = np.asarray(style_ids).reshape(-1)
+        # rows from LayoutArrays are already grouped by layer, others are
+        # sorted once; small unsigned keys make numpy use a radix sort
+        if len(style_ids) and np.any(style_ids[1:] < style_ids[:-1]):
+            keys = style_ids.astype(np.uint16) if styles <= 1 << 16 else style_ids
+            grouped = np.argsort(keys, kind="stable")
+            coords, style_ids = np.take(coords, grouped, axis=0), style_ids[grouped]
+        x0, y0, x1, y1 = coords.astype(np.float32).T
+        return cls(
+            left=np.minimum(x0, x1),
+            bottom=np.minimum(y0, y1),
+            right=np.maximum(x0, x1),
+            top=np.maximum(y0, y1),
+            starts=np.searchsorted(style_ids, np.arange(styles + 1)),
+        )
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    @property
+    def nbytes(self) -> int:
+        return 4 * self.left.nbytes + self.starts.nbytes
+
+    # half-open pixel boxes of one style group, at least one pixel each
+    def pixels(
+        self,
+        style_id: int,
+        bounds: tuple[float, float, float, float],
+        width: int,
+        height: int,
+    ) -> tuple[np.ndarray, ...]:
+        group = slice(self.starts[style_id], self.starts[style_id + 1])
+        left, bottom, right, top = bounds
+        scale_x = np.float32(width / (right - left) if right > left else 0.0)
+        scale_y = np.float32(height / (top - bottom) if top > bottom else 0.0)
+        cols0 = np.floor((self.left[group] - np.float32(left)) * scale_x)
+        cols1 = np.ceil((self.right[group] - np.float32(left)) * scale_x)
+        rows0 = np.floor((np.float32(top) - self.top[group]) * scale_y)
+        rows1 = np.ceil((np.float32(top) - self.bottom[group]) * scale_y)
+        np.maximum(cols1, cols0 + 1, out=cols1)
+        np.maximum(rows1, rows0 + 1, out=rows1)
+        limits = ((rows0, height), (cols0, width), (rows1, height), (cols1, width))
+        return tuple(
+            np.clip(values, 0, limit, out=values).astype(np.int32)
+            for values, limit in limits
+        )
+
+
+def rasterize(
+    rects: Rects,
+    styles: Sequence[Mapping[str, Any]],
+    bounds: tuple[float, float, float, float],
+    width: int,
+    height: int,
+    line_scale: float = 1.0,
+    style_ids: Iterable[int] | None = None,
+    background: str = BACKGROUND,
+) -> np.ndarray:
+    """Draw rectangles into an (height, width, 3) uint8 RGB image."""
+    # colour planes, so that compositing works on contiguous rows
+    image = np.empty((3, height, width), np.float32)
+    image[:] = to_rgb(background)[:, None, None]
+
+    drawn = range(len(styles)) if style_ids is None else set(style_ids)
+    order = sorted(drawn, key=lambda i: styles[i].get("zorder", 1))
+    for style_id in order:
+        style = styles[style_id]
+        r0, c0, r1, c1 = rects.pixels(style_id, bounds, width, height)
+        visible = (c1 > c0) & (r1 > r0)
+        if not visible.all():
+            r0, c0, r1, c1 = r0[visible], c0[visible], r1[visible], c1[visible]
+        if not len(r0):
+            continue
+        # work within the pixel window the group covers
+        row, col = r0.min(), c0.min()
+        r0, c0, r1, c1 = r0 - row, c0 - col, r1 - row, c1 - col
+        size = (r1.max(), c1.max())
+        window = image[:, row : row + size[0], col : col + size[1]]
+        covered = coverage_counts(r0, c0, r1, c1, *size)
+        alpha = float(style.get("alpha", 0.5))
+
+        face = to_rgb(style.get("facecolor", "grey"))
+        if face is not None:
+            _composite(window, covered, face, alpha)
+
+        edge = to_rgb(style.get("edgecolor", "black"))
+        line = float(style.get("linewidth", 0.5)) * line_scale
+        if edge is not None and line > 0:
+            # an outline is the box minus the box shrunk by the line width
+            inset = max(int(round(line)), 1)
+            hollow = (r1 - r0 > 2 * inset) & (c1 - c0 > 2 * inset)
+            outline = covered - coverage_counts(
+                r0[hollow] + inset,
+                c0[hollow] + inset,
+                r1[hollow] - inset,
+                c1[hollow] - inset,
+                *size,
+            )
+            _composite(window, outline, edge, alpha * min(line, 1.0))
+
+    return np.round(image.transpose(1, 2, 0) * 255).astype(np.uint8)
+
+
+def encode_png(image: np.ndarray, level: int = 6) -> bytes:
+    """Encode an (height, width, 3) uint8 RGB image as PNG."""
+    height, width, _ = image.shape
+    # filter type 0 (none) at the start of every scanline
+    scanlines = np.zeros((height, width * 3 + 1), np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        body = kind + payload
+        return struct.pack(">I", len(payload)) + body + struct.pack(
+            ">I", zlib.crc32(body)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), level))
+        + chunk(b"IEND", b"")
+    )
@@ -0,0 +1,135 @@
+"""
+Streaming reader for Boundbox repr dumps, such as routes and polygon dumps.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+CHUNK_SIZE = 1 << 20
+
+# no entry is longer than this, a longer remainder without one is garbage
+_MAX_ENTRY_BYTES = 1 << 16
+
+_NUMBER = rb"([^,\]]*)"
+# one entry exactly as Boundbox.__repr__ writes it, the layer quoted by repr
+_ENTRY = re.compile(
+    rb"\[(?:'([^'\\]*)'|\"([^\"\\]*)\"), Boundbox\(startCoord: \["
+    + _NUMBER
+    + rb", "
+    + _NUMBER
+    + rb"\], endCoord: \["
+    + _NUMBER
+    + rb", "
+    + _NUMBER
+    + rb"\], Dimensions: \[width: "
+    + _NUMBER
+    + rb", height: "
+    + _NUMBER
+    + rb"\]\)\]"
+)
+# the end of every entry, found nowhere else in it
+_ENTRY_END = b")]"
+# what may follow the last entry
+_END = re.compile(rb"[\s,\[\]]*")
+
+
+class ReprFormatError(ValueError):
+    """Raised when a file is not a well-formed Boundbox repr dump."""
+
+
+def is_repr(head: bytes) -> bool:
+    """Whether the first bytes of a file look like a repr dump."""
+    return head.lstrip()[:1] == b"["
+
+
+def is_repr_file(path: str | Path) -> bool:
+    with open(path, "rb") as handle:
+        return is_repr(handle.read(64))
+
+
+def _iter_chunks(
+    handle: BinaryIO, chunk_size: int
+) -> Iterator[tuple[list[tuple[bytes, ...]], int]]:
+    """Yield the matched entries of each chunk, and the chunk's byte offset."""
+    buffer = b""
+    offset = 0
+    while chunk := handle.read(chunk_size):
+        buffer += chunk
+        cut = buffer.rfind(_ENTRY_END)
+        if cut < 0:
+            if len(buffer) > _MAX_ENTRY_BYTES:
+                raise ReprFormatError(f"no entry found after byte {offset}")
+            continue
+        cut += len(_ENTRY_END)
+        complete, buffer = buffer[:cut], buffer[cut:]
+        entries = _ENTRY.findall(complete)
+        if len(entries) != complete.count(b"Boundbox("):
+            raise ReprFormatError(
+                f"malformed entry between bytes {offset} and {offset + cut}"
+            )
+        yield entries, offset
+        offset += cut
+    if not _END.fullmatch(buffer):
+        raise ReprFormatError(f"unexpected data at byte {offset}: {buffer[:40]!r}")
+
+
+# sort key reading digit runs as numbers
+def _natural(name: str) -> list[Any]:
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def read_layout(handle: BinaryIO, chunk_size: int = CHUNK_SIZE) -> dict[str, Any]:
+    """Read a dump into the structure the layout YAML loader produces."""
+    polygons: list[list[Any]] = []
+    # layer names repeat, decode each once
+    layers: dict[bytes, str] = {}
+    left = bottom = math.inf
+    right = top = -math.inf
+    for entries, offset in _iter_chunks(handle, chunk_size):
+        try:
+            numbers = list(map(float, [v for entry in entries for v in entry[2:]]))
+        except ValueError:
+            raise ReprFormatError(
+                f"bad number in the entries after byte {offset}"
+            ) from None
+        for (single, double, *_), (x0, y0, x1, y1, width, height) in zip(
+            entries, zip(*[iter(numbers)] * 6)
+        ):
+            quoted = single or double
+            layer = layers.get(quoted)
+            if layer is None:
+                layer = layers[quoted] = quoted.decode()
+            box = {
+                "x0": x0,
+                "y0": y0,
+                "x1": x1,
+                "y1": y1,
+                "width": width,
+                "height": height,
+            }
+            polygons.append([layer, box])
+        if numbers:
+            xs, ys = numbers[0::6] + numbers[2::6], numbers[1::6] + numbers[3::6]
+            left, right = min(left, *xs), max(right, *xs)
+            bottom, top = min(bottom, *ys), max(top, *ys)
+
+    if not polygons:
+        left = bottom = right = top = 0.0
+    return {
+        "canvas_width": right - left,
+        "canvas_height": top - bottom,
+        "start_x": left,
+        "start_y": bottom,
+        "layer_maps": {layer: layer for layer in sorted(layers.values(), key=_natural)},
+        "polygons": polygons,
+        "labels": [],
+    }
+
+
+def load_layout(path: str | Path, chunk_size: int = CHUNK_SIZE) -> dict[str, Any]:
+    with open(path, "rb") as handle:
+        return read_layout(handle, chunk_size)
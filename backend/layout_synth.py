@@ -0,0 +1,160 @@
+"""
+Deterministic synthetic layouts in the generator's YAML format.
+
+Usage:
+    python -m backend.layout_synth 1000000 -o big.txt --seed 0
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Iterator, TextIO
+
+import numpy as np
+
+_BOUNDBOX_TAG = "!!python/object:bin.utilities.geometryutils.Boundbox"
+
+LAYER_MAPS = [
+    "scell", "module", "abstractModule",
+    "Metal1", "Metal2", "Metal3", "Metal4", "Metal5", "Metal6", "Metal7",
+    "VIA1", "VIA2", "VIA3", "VIA4", "VIA5", "VIA6",
+    "Oxide Diffusion", "Gate Poly", "Contact",
+    "N Well", "N Implant", "N Low VT", "N High VT",
+    "P Implant", "P Well", "P Low VT", "P High VT",
+]  # fmt: skip
+
+# layer, share of the polygons, short side, and range of the long side in um;
+# wires on odd metals run along x and on even metals and poly along y
+_LAYERS = [
+    ("Contact", 0.40, 0.09, (0.09, 0.09)),
+    ("Metal1", 0.17, 0.1, (0.1, 3.0)),
+    ("Gate Poly", 0.075, 0.1, (0.5, 2.3)),
+    ("VIA1", 0.056, 0.1, (0.1, 0.1)),
+    ("VIA2", 0.038, 0.1, (0.1, 0.1)),
+    ("VIA3", 0.056, 0.1, (0.1, 0.1)),
+    ("VIA4", 0.006, 0.1, (0.1, 0.1)),
+    ("Metal2", 0.044, 0.18, (0.29, 3.0)),
+    ("Metal3", 0.047, 0.18, (0.29, 2.4)),
+    ("Metal4", 0.022, 0.29, (0.4, 2.5)),
+    ("Metal5", 0.003, 0.18, (0.9, 9.0)),
+    ("Oxide Diffusion", 0.013, 0.17, (1.0, 3.0)),
+    ("N Implant", 0.016, 0.27, (3.2, 3.2)),
+    ("P Implant", 0.016, 0.27, (3.2, 3.2)),
+    ("N Well", 0.01, 0.8, (3.4, 3.4)),
+    ("P Well", 0.003, 2.4, (3.4, 3.4)),
+    ("scell", 0.007, 3.4, (3.8, 4.0)),
+]
+_VERTICAL = {"Gate Poly", "Metal2", "Metal4"}
+# layers that carry labels, and the label texts, cycled through
+_LABELLED = ("Metal2", "Metal3", "Metal4")
+_NET_NAMES = ("VDD", "VSS", "v_in", "v_out")
+
+# coordinates snap to this grid, and the canvas holds one polygon per AREA
+GRID = 0.005
+AREA = 0.144
+# polygons per label, and per chunk written at once
+_POLYGONS_PER_LABEL = 64
+_CHUNK = 1 << 16
+# write buffer of the output file
+_BUFFER_BYTES = 1 << 20
+
+
+def canvas_size(polygons: int) -> tuple[float, float]:
+    """Width and height of a 4:3 canvas for ``polygons`` polygons."""
+    height = max(np.sqrt(polygons * AREA * 3 / 4), 10.0)
+    return _snap(height * 4 / 3), _snap(height)
+
+
+def _snap(value: float) -> float:
+    return round(round(value / GRID) * GRID, 3)
+
+
+def _chunks(polygons: int, seed: int) -> Iterator[tuple[list[str], np.ndarray]]:
+    """Yield (layers, x0 y0 x1 y1 rows) in chunks of ``_CHUNK`` polygons."""
+    rng = np.random.default_rng(seed)
+    width, height = canvas_size(polygons)
+    names = [layer for layer, *_ in _LAYERS]
+    shares = np.array([share for _, share, *_ in _LAYERS])
+    short = np.array([side for *_, side, _ in _LAYERS])
+    lengths = np.array([bounds for *_, bounds in _LAYERS])
+    vertical = np.array([layer in _VERTICAL for layer in names])
+    for start in range(0, polygons, _CHUNK):
+        count = min(_CHUNK, polygons - start)
+        kinds = rng.choice(len(names), count, p=shares / shares.sum())
+        low, high = lengths[kinds].T
+        long = np.round((low + (high - low) * rng.random(count)) / GRID) * GRID
+        sides = np.column_stack((long, short[kinds]))
+        sides[vertical[kinds]] = sides[vertical[kinds], ::-1]
+        sides = np.minimum(sides, (width, height))
+        corner = rng.random((count, 2)) * ((width, height) - sides)
+        corner = np.round(corner / GRID) * GRID
+        yield [names[kind] for kind in kinds.tolist()], np.round(
+            np.hstack((corner, corner + sides)), 3
+        )
+
+
+_POLYGON = (
+    "- - %s\n  - %s" + _BOUNDBOX_TAG + "\n"
+    "    _Boundbox__x0coord: %r\n"
+    "    _Boundbox__y0coord: %r\n"
+    "    _Boundbox__x1coord: %r\n"
+    "    _Boundbox__y1coord: %r\n"
+    "    height: %r\n"
+    "    width: %r\n"
+    "    area: %r\n"
+)
+
+
+def write_layout(handle: TextIO, polygons: int, seed: int = 0) -> int:
+    """Write a layout of polygons rectangles, returning its label count."""
+    width, height = canvas_size(polygons)
+    handle.write("layer_maps:\n")
+    handle.writelines(f"  {layer}: {layer}\n" for layer in LAYER_MAPS)
+    handle.write(
+        f"canvas_height: {height}\ncanvas_width: {width}\n"
+        "start_x: 0.0\nstart_y: 0.0\npolygons:\n"
+    )
+
+    labels: list[str] = []
+    labelled = 0
+    for layers, boxes in _chunks(polygons, seed):
+        anchors = [""] * len(layers)
+        for row, layer in enumerate(layers):
+            if layer in _LABELLED:
+                labelled += 1
+                if labelled % _POLYGONS_PER_LABEL == 1:
+                    labels.append(layer)
+                    anchors[row] = f"&id{len(labels):03d} "
+        sides = np.round(boxes[:, 2:] - boxes[:, :2], 3)
+        areas = np.round(sides[:, 0] * sides[:, 1], 4)
+        heights, widths = sides[:, ::-1].T.tolist()
+        rows = zip(layers, anchors, *boxes.T.tolist(), heights, widths, areas.tolist())
+        handle.write("".join([_POLYGON % row for row in rows]))
+
+    handle.write("labels:\n")
+    for index, layer in enumerate(labels, start=1):
+        name = _NET_NAMES[(index - 1) % len(_NET_NAMES)]
+        text = name if index <= len(_NET_NAMES) else f"{name}_{index}"
+        handle.write(f"- - {layer}\n  - *id{index:03d}\n  - {text}\n")
+    return len(labels)
+
+
+def write_layout_file(path: str | Path, polygons: int, seed: int = 0) -> int:
+    with open(path, "w", encoding="utf-8", buffering=_BUFFER_BYTES) as handle:
+        return write_layout(handle, polygons, seed)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic layout YAML file.")
+    parser.add_argument("polygons", type=int, help="Number of rectangles.")
+    parser.add_argument("-o", "--output", required=True, help="Output YAML path.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    labels = write_layout_file(args.output, args.polygons, args.seed)
+    print(f"Wrote {args.polygons} polygons and {labels} labels to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
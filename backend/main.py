@@ -1,18 +1,86 @@
 from __future__ import annotations
 
+import asyncio
 import importlib
+import json
+import os
+import re
+import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+import aiofiles
+import yaml
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from pydantic_core import to_json
 from sse_starlette.sse import EventSourceResponse
 
-from .config import ALLOWED_ORIGINS, DATA_DIR, GENERATOR_SCRIPT, JOBS_DIR
-from .models import GenerateRequest, JobStatus
-from .services import JobManager, LayoutParser
+from .config import (
+    ALLOWED_ORIGINS,
+    DATA_DIR,
+    DRC_RULES,
+    GENERATOR_SCRIPT,
+    GENERATOR_WORKER_MAX_JOBS,
+    GENERATOR_WORKERS,
+    JOB_CPU_LIMIT,
+    JOB_MEMORY_LIMIT,
+    JOB_RETENTION_AGE,
+    JOB_RETENTION_BYTES,
+    JOB_TIMEOUT,
+    JOBS_DIR,
+    LAYOUT_CACHE_BYTES,
+    LAYOUT_STREAM_INTERVAL,
+    LOG_TAIL_LINES,
+    MAX_CONCURRENT_JOBS,
+    OVERLAY_MAX_BYTES,
+    PREVIEW_WIDTH,
+    PROGRESS_INTERVAL,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_MAX_AGE,
+    RESULT_CACHE_MAX_BYTES,
+    SSE_BATCH_LINES,
+    SSE_BATCH_WINDOW,
+    SSE_BUFFER_LINES,
+    STATS_WINDOW,
+)
+from .models import (
+    FINISHED_STATUSES,
+    DrcRules,
+    GenerateRequest,
+    Job,
+    JobProgress,
+    JobStatus,
+)
+from .services import (
+    JobManager,
+    LayoutBody,
+    LayoutChecker,
+    LayoutParser,
+    LayoutTail,
+    MetricsRegistry,
+    RequestMetrics,
+    ResultCache,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # rehydrate jobs from a previous run, apply the retention policy and warm up
+    # generator workers
+    job_manager.load_jobs()
+    await job_manager.collect_garbage()
+    await job_manager.start()
+    yield
+    await job_manager.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# in-process counters of the API and the job pipeline, served by /metrics
+metrics = MetricsRegistry()
 
 # middleware to compress responses
 app.add_middleware(GZipMiddleware, minimum_size=1000)
@@ -24,13 +92,56 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# outermost middleware, so that request latencies include compression
+app.add_middleware(RequestMetrics, registry=metrics)
 
 # create jobs directory if it doesn't exist
 JOBS_DIR.mkdir(parents=True, exist_ok=True)
 
-# singleton instances of job manager and layout parser
-job_manager = JobManager(JOBS_DIR, GENERATOR_SCRIPT)
-layout_parser = LayoutParser()
+# opt-in cache of generator outputs for identical requests
+result_cache = (
+    ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_AGE, RESULT_CACHE_MAX_BYTES)
+    if RESULT_CACHE_ENABLED
+    else None
+)
+
+# singleton instances of layout parser and job manager, the design rule check
+# shares the parsed layouts
+layout_parser = LayoutParser(LAYOUT_CACHE_BYTES, snapshots=True, metrics=metrics)
+drc_rules = (
+    DrcRules.model_validate_json(Path(DRC_RULES).read_text()) if DRC_RULES else None
+)
+checker = LayoutChecker(drc_rules, layout_parser) if drc_rules else None
+job_manager = JobManager(
+    JOBS_DIR,
+    GENERATOR_SCRIPT,
+    result_cache,
+    max_concurrent=MAX_CONCURRENT_JOBS,
+    timeout=JOB_TIMEOUT,
+    memory_limit=JOB_MEMORY_LIMIT,
+    cpu_limit=JOB_CPU_LIMIT,
+    retention_age=JOB_RETENTION_AGE,
+    retention_bytes=JOB_RETENTION_BYTES,
+    log_tail_lines=LOG_TAIL_LINES,
+    subscriber_buffer=SSE_BUFFER_LINES,
+    workers=GENERATOR_WORKERS,
+    worker_max_jobs=GENERATOR_WORKER_MAX_JOBS,
+    progress_interval=PROGRESS_INTERVAL,
+    checker=checker,
+    metrics=metrics,
+)
+
+
+# parse and serialize each completed layout right away, so that the first
+# request for it is a cache hit
+async def warm_layout_cache(job: Job, output_path: Path) -> None:
+    if output_path.exists():
+        await layout_parser.parse_layout_body(output_path)
+        previews = await layout_parser.parse_layout_previews(output_path)
+        await asyncio.to_thread(previews.render, PREVIEW_WIDTH)
+
+
+job_manager.completion_hooks.append(warm_layout_cache)
 
 
 # helper function to load display config
@@ -50,6 +161,12 @@ async def root():
     return {"message": "Layout Copilot API"}
 
 
+# Prometheus text format, nothing is kept outside of this process
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.content_type)
+
+
 @app.post("/api/generate")
 async def generate_layout(request: GenerateRequest):
     job = await job_manager.create_job(request)
@@ -65,38 +182,107 @@ async def job_status(job_id: str):
     return job
 
 
+@app.delete("/api/generate/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# helper function to chunk log lines into SSE events, the event id is the
+# sequence number of the last line so clients can resume with Last-Event-ID
+def _log_events(lines: list[tuple[int, str]]) -> list[dict[str, str]]:
+    events = []
+    for start in range(0, len(lines), SSE_BATCH_LINES):
+        chunk = lines[start : start + SSE_BATCH_LINES]
+        events.append(
+            {
+                "event": "log",
+                "id": str(chunk[-1][0]),
+                "data": "\n".join(line for _, line in chunk),
+            }
+        )
+    return events
+
+
+def _progress_event(progress: JobProgress) -> dict[str, str]:
+    return {"event": "progress", "data": progress.model_dump_json()}
+
+
 @app.get("/api/generate/{job_id}/stream")
-async def stream_job_logs(job_id: str):
+async def stream_job_logs(
+    job_id: str,
+    request: Request,
+    last_event_id: int | None = None,
+    logs: bool = True,
+):
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
+    # browsers send Last-Event-ID on reconnect, the query parameter covers
+    # clients that open a fresh EventSource
+    header = request.headers.get("last-event-id")
+    try:
+        after = int(header) if header else (last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
     async def event_generator():
-        queue = job_manager.add_subscriber(job_id)
+        subscription = job_manager.add_subscriber(job_id, logs)
         try:
-            # stream all logs from the job history that occurred before the subscriber connected
-            for line in job_manager.get_history(job_id):
-                yield {"event": "log", "data": line}
+            # replay the logs the client has not seen yet, in batches
+            history = await job_manager.get_history(job_id, after) if logs else []
+            sent = after + len(history)
+            for event in _log_events(list(enumerate(history, after + 1))):
+                yield event
+
+            current = job_manager.get_job(job_id)
+            if current and current.progress:
+                yield _progress_event(current.progress)
 
-            # stream new logs as they occur
+            # stream new logs as they occur, batching lines that arrive close
+            # together; subscriptions to finished jobs, including cached
+            # results, hand out what was pushed during the replay and finish
             while True:
-                log_line = await queue.get()
+                batch = await subscription.next_batch(
+                    SSE_BATCH_WINDOW, SSE_BATCH_LINES
+                )
+                if batch.dropped:
+                    yield {"event": "dropped", "data": str(batch.dropped)}
+                # lines pushed while the history was replayed were already sent
+                lines = [(seq, line) for seq, line in batch.lines if seq > sent]
+                if lines:
+                    sent = lines[-1][0]
+                    for event in _log_events(lines):
+                        yield event
+                if batch.progress:
+                    yield _progress_event(batch.progress)
+                if batch.violations:
+                    yield {
+                        "event": "violations",
+                        "data": to_json(batch.violations).decode(),
+                    }
+                if batch.drc:
+                    yield {
+                        "event": "drc",
+                        "data": batch.drc.model_dump_json(exclude={"violations"}),
+                    }
                 # trigger when the job is complete or failed
-                if log_line is None:
+                if batch.finished:
                     current = job_manager.get_job(job_id)
                     status = current.status.value if current else "unknown"
                     yield {"event": "complete", "data": status}
                     break
-                yield {"event": "log", "data": log_line}
         finally:
-            job_manager.remove_subscriber(job_id, queue)
+            job_manager.remove_subscriber(job_id, subscription)
 
     return EventSourceResponse(event_generator())
 
 
-@app.get("/api/layouts/{job_id}")
-async def get_layout(job_id: str):
-    # Can only be called after the job is completed to get the layout data
+# helper function to resolve the layout file of a completed job
+def _completed_output_path(job_id: str) -> Path:
     job = job_manager.get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -106,10 +292,269 @@ async def get_layout(job_id: str):
     output_path = job_manager.get_output_path(job_id)
     if not output_path or not output_path.exists():
         raise HTTPException(status_code=404, detail="Layout file not found")
+    return Path(output_path)
+
+
+@app.get("/api/layouts/{job_id}/stream")
+async def stream_layout(
+    job_id: str, request: Request, last_event_id: int | None = None
+):
+    # geometry appended by the generator while the job runs, layout.yaml stays
+    # the source of truth once the job is complete
+    job = job_manager.get_job(job_id)
+    partial_path = job_manager.get_partial_path(job_id)
+    if not job or not partial_path:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    # the event id is the byte offset into the geometry file
+    header = request.headers.get("last-event-id")
+    try:
+        offset = int(header) if header else (last_event_id or 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    async def event_generator():
+        tail = LayoutTail(partial_path, offset)
+        while True:
+            # check first so that everything written before the end is sent
+            current = job_manager.get_job(job_id)
+            finished = not current or current.status in FINISHED_STATUSES
+            while (batch := await tail.read()) is not None:
+                if batch.header or batch.polygons or batch.labels:
+                    yield {
+                        "event": "geometry",
+                        "id": str(batch.offset),
+                        "data": json.dumps(batch.to_json()),
+                    }
+            if finished:
+                status = current.status.value if current else "unknown"
+                yield {"event": "complete", "data": status}
+                return
+            await asyncio.sleep(LAYOUT_STREAM_INTERVAL)
+
+    return EventSourceResponse(event_generator())
+
+
+# serve a layout body, or 304 when the client already has it
+def _layout_response(
+    body: LayoutBody, request: Request, cache_control: str
+) -> Response:
+    headers = {
+        "ETag": body.etag,
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+    if body.matches(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+
+    content, encoding = body.encode(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@app.get("/api/layouts/{job_id}")
+async def get_layout(job_id: str, request: Request):
+    # Can only be called after the job is completed to get the layout data
+    output_path = _completed_output_path(job_id)
+
+    # the output of a completed job never changes, so its serialized and
+    # precompressed body is built once and cached for good by clients
+    body = await layout_parser.parse_layout_body(output_path)
+    return _layout_response(body, request, "public, max-age=31536000, immutable")
+
+
+@app.get("/api/layouts/{job_id}/instances")
+async def get_instanced_layout(job_id: str, request: Request):
+    # the layout with repeated rectangles stored once, see models.InstancedLayout;
+    # /api/layouts/{job_id} keeps serving every polygon for older clients
+    output_path = _completed_output_path(job_id)
+    body = await layout_parser.parse_layout_instances(output_path)
+    return _layout_response(body, request, "public, max-age=31536000, immutable")
+
+
+# overlay names double as file names in the job directory
+_OVERLAY_NAME = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def _overlay_path(job_id: str, name: str) -> Path:
+    output_path = _completed_output_path(job_id)
+    if not _OVERLAY_NAME.fullmatch(name):
+        raise HTTPException(status_code=400, detail="Invalid overlay name")
+    return output_path.parent / "overlays" / f"{name}.txt"
+
+
+@app.put("/api/layouts/{job_id}/overlays/{name}")
+async def upload_overlay(job_id: str, name: str, request: Request):
+    # geometry to draw over the job's layout, such as a routes dump; the body
+    # is a layout file in any format the parser reads, streamed to disk
+    overlay_path = _overlay_path(job_id, name)
+    too_large = HTTPException(
+        status_code=413, detail=f"Overlay exceeds {OVERLAY_MAX_BYTES} bytes"
+    )
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > OVERLAY_MAX_BYTES:
+        raise too_large
+    overlay_path.parent.mkdir(exist_ok=True)
+    upload_path = overlay_path.with_name(f".{name}.{uuid.uuid4().hex}.upload")
+    try:
+        received = 0
+        async with aiofiles.open(upload_path, "wb") as handle:
+            async for chunk in request.stream():
+                # chunked uploads carry no length, count what arrives
+                received += len(chunk)
+                if received > OVERLAY_MAX_BYTES:
+                    raise too_large
+                await handle.write(chunk)
+        # check the upload before it replaces a previous overlay
+        overlay = await asyncio.to_thread(layout_parser.read_layout_file, upload_path)
+        os.replace(upload_path, overlay_path)
+    except (ValueError, yaml.YAMLError) as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid layout: {exc}") from exc
+    finally:
+        upload_path.unlink(missing_ok=True)
+    return {
+        "name": name,
+        "polygons": len(overlay.polygons),
+        "labels": len(overlay.labels),
+        "layers": sorted({polygon.layer for polygon in overlay.polygons}),
+    }
+
+
+@app.get("/api/layouts/{job_id}/overlays/{name}")
+async def get_overlaid_layout(job_id: str, name: str, request: Request):
+    # the job's layout with the overlay drawn over it, revalidated on each use
+    # since the overlay can be uploaded again
+    output_path = _completed_output_path(job_id)
+    overlay_path = _overlay_path(job_id, name)
+    if not overlay_path.exists():
+        raise HTTPException(status_code=404, detail="Overlay not found")
+    body = await layout_parser.parse_layout_overlay(output_path, overlay_path)
+    return _layout_response(body, request, "no-cache")
+
+
+@app.get("/api/layouts/{job_id}/binary")
+async def get_layout_binary(job_id: str):
+    # columnar float32 encoding of the layout, see services/layout_arrays.py
+    output_path = _completed_output_path(job_id)
+    body = await layout_parser.parse_layout_binary(output_path)
+    return Response(content=body, media_type="application/octet-stream")
+
+
+@app.get("/api/layouts/{job_id}/query")
+async def query_layout(
+    job_id: str,
+    x0: float,
+    y0: float,
+    x1: float,
+    y1: float,
+    layers: str | None = None,
+):
+    # return only the polygons and labels intersecting the viewport
+    output_path = _completed_output_path(job_id)
+    index = await layout_parser.parse_layout_index(output_path)
+    layer_names = [name for name in layers.split(",") if name] if layers else None
+    return index.query_layout(x0, y0, x1, y1, layer_names)
+
+
+@app.get("/api/layouts/{job_id}/diff/{other_job_id}")
+async def diff_layouts(job_id: str, other_job_id: str):
+    # polygons and labels to remove from job_id's layout and to add to turn it
+    # into other_job_id's, see models.LayoutDiff
+    output_path = _completed_output_path(job_id)
+    other_path = _completed_output_path(other_job_id)
+    body = await layout_parser.parse_layout_diff(output_path, other_path)
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/layouts/{job_id}/stats")
+async def get_layout_stats(
+    job_id: str, window: float = Query(default=STATS_WINDOW, gt=0)
+):
+    # per-layer counts, total and union areas, bounds and a density map over
+    # window x window squares
+    output_path = _completed_output_path(job_id)
+    try:
+        body = await layout_parser.parse_layout_stats(output_path, window)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/layouts/{job_id}/nets")
+async def get_layout_nets(job_id: str):
+    # nets of the metal and via layers, named after their labels
+    output_path = _completed_output_path(job_id)
+    nets = await layout_parser.parse_layout_nets(output_path)
+    return Response(content=nets.to_json(), media_type="application/json")
+
+
+@app.get("/api/layouts/{job_id}/nets/at")
+async def get_net_at(job_id: str, x: float, y: float, layers: str | None = None):
+    # net of the topmost metal or via under a point, with its polygons to
+    # highlight
+    output_path = _completed_output_path(job_id)
+    nets = await layout_parser.parse_layout_nets(output_path)
+    layer_names = [name for name in layers.split(",") if name] if layers else None
+    highlight = nets.net_at(x, y, layer_names)
+    if highlight is None:
+        raise HTTPException(status_code=404, detail="No net at this point")
+    return highlight
+
+
+@app.get("/api/layouts/{job_id}/nets/{net_id}")
+async def get_net(job_id: str, net_id: int):
+    output_path = _completed_output_path(job_id)
+    nets = await layout_parser.parse_layout_nets(output_path)
+    if not 0 <= net_id < nets.net_count:
+        raise HTTPException(status_code=404, detail="Net not found")
+    return nets.highlight(net_id)
+
+
+@app.get("/api/layouts/{job_id}/drc")
+async def get_drc_report(job_id: str):
+    # design rule violations of the layout, with the check's throughput
+    _completed_output_path(job_id)
+    try:
+        report = await job_manager.get_drc_report(job_id)
+    except (ValueError, yaml.YAMLError) as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid layout: {exc}") from exc
+    if report is None:
+        raise HTTPException(status_code=404, detail="Design rule check not enabled")
+    return Response(content=report, media_type="application/json")
+
+
+@app.get("/api/layouts/{job_id}/preview.png")
+async def get_layout_preview(
+    job_id: str,
+    w: int | None = Query(default=None, ge=1),
+    h: int | None = Query(default=None, ge=1),
+    layers: str | None = None,
+):
+    # raster thumbnail, a missing dimension follows the canvas aspect ratio
+    output_path = _completed_output_path(job_id)
+    previews = await layout_parser.parse_layout_previews(output_path)
+    if w is None and h is None:
+        w = PREVIEW_WIDTH
+    layer_names = [name for name in layers.split(",") if name] if layers else None
+    png = await asyncio.to_thread(previews.render, w, h, layer_names)
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
 
-    # parse the layout file and return the layout data
-    parsed_layout = await layout_parser.parse_layout_file(Path(output_path))
-    return parsed_layout
+@app.get("/api/layouts/{job_id}/tiles/{z}/{x}/{y}")
+async def get_layout_tile(job_id: str, z: int, x: int, y: int):
+    # level-of-detail tile, coverage rasters when zoomed out and real
+    # geometry once a tile is sparse enough
+    output_path = _completed_output_path(job_id)
+    tiles = await layout_parser.parse_layout_tiles(output_path)
+    tile = tiles.get_tile(z, x, y)
+    if not tile:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    return tile
 
 
 @app.get("/api/layout/config")
@@ -12,6 +12,20 @@ class JobStatus(str, Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = frozenset(
+    {JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED}
+)
+
+
+class JobProgress(BaseModel):
+    done: int
+    total: int
+    # items per second and seconds remaining, unknown until there is a rate
+    rate: float | None = None
+    eta: float | None = None
 
 
 class Job(BaseModel):
@@ -20,11 +34,18 @@ class Job(BaseModel):
     created_at: datetime
     completed_at: datetime | None = None
     error: str | None = None
+    priority: int = 0
+    # 1-based position in the scheduler queue while pending
+    queue_position: int | None = None
+    # latest progress reported by the generator
+    progress: JobProgress | None = None
 
 
 class GenerateRequest(BaseModel):
     cell_name: str | None = None
     config: dict[str, Any] | None = None
+    # higher priorities are scheduled first, does not affect the output
+    priority: int = 0
 
 
 class Polygon(BaseModel):
@@ -54,6 +75,160 @@ class LayoutData(BaseModel):
     labels: list[Label]
 
 
+class TileKind(str, Enum):
+    RASTER = "raster"
+    VECTOR = "vector"
+
+
+class LayoutTile(BaseModel):
+    z: int
+    x: int
+    y: int
+    # x0, y0, x1, y1 of the tile in layout coordinates
+    bounds: list[float]
+    kind: TileKind
+    # raster tiles: base64 uint8 coverage per layer, raster_size rows of
+    # raster_size pixels, first row at the bottom of the tile
+    raster_size: int = 0
+    coverage: dict[str, str] = {}
+    # vector tiles: the real geometry touching the tile
+    polygons: list[Polygon] = []
+    labels: list[Label] = []
+
+
+class LayerDiff(BaseModel):
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+class LayoutDiff(BaseModel):
+    # canvas and layer maps of the target layout
+    canvas_width: float
+    canvas_height: float
+    start_x: float
+    start_y: float
+    layer_maps: dict[str, str]
+    # indices into the base layout's polygons and labels to drop, ascending
+    removed_polygons: list[int]
+    removed_labels: list[int]
+    # geometry of the target layout missing from the base, in document order
+    added_polygons: list[Polygon]
+    added_labels: list[Label]
+    # polygon counts per layer
+    polygon_layers: dict[str, LayerDiff]
+    # label counts per layer
+    label_layers: dict[str, LayerDiff]
+
+
+class LayerStats(BaseModel):
+    polygons: int
+    # sum of the polygon areas, stacked duplicates counted every time
+    total_area: float
+    # area covered by at least one polygon
+    union_area: float
+    # union area over canvas area
+    utilization: float
+    # x0, y0, x1, y1 of the layer's polygons
+    bounds: list[float]
+    # covered fraction of each density window, rows of columns, first row
+    # at the bottom of the canvas
+    density: list[list[float]]
+
+
+class LayoutStats(BaseModel):
+    canvas_width: float
+    canvas_height: float
+    start_x: float
+    start_y: float
+    # side of the square density windows, tiled from (start_x, start_y)
+    window: float
+    rows: int
+    columns: int
+    layers: dict[str, LayerStats]
+
+
+class Net(BaseModel):
+    # nets are numbered in the document order of their first polygon
+    id: int
+    # first label on the net, or net{id} when it has none
+    name: str
+    # every label text on the net, more than one means shorted nets
+    labels: list[str]
+    polygons: int
+    layers: list[str]
+    # x0, y0, x1, y1 of the net's polygons
+    bounds: list[float]
+
+
+class NetList(BaseModel):
+    nets: list[Net]
+
+
+class NetHighlight(BaseModel):
+    net: Net
+    # indices into LayoutData.polygons of the net's polygons
+    polygons: list[int]
+
+
+class InstanceGroup(BaseModel):
+    # layer index, x0, y0, x1, y1 of each shape at the first instance
+    shapes: list[list[int]]
+    # dx, dy of every instance, the first one is [0, 0]
+    offsets: list[list[int]]
+
+
+class InstancedLayout(BaseModel):
+    canvas_width: float
+    canvas_height: float
+    start_x: float
+    start_y: float
+    layer_maps: dict[str, str]
+    # shape coordinates and offsets are integer multiples of this
+    resolution: float
+    # layer names indexed by the shapes
+    layers: list[str]
+    groups: list[InstanceGroup]
+    labels: list[Label]
+    # polygons of the expanded layout, and shapes stored to draw them
+    polygons: int
+    shapes: int
+
+
+class DrcRules(BaseModel):
+    # minimum width per layer
+    width: dict[str, float] = {}
+    # minimum distance between shapes per layer
+    spacing: dict[str, float] = {}
+    # minimum enclosure of each via layer by each metal layer
+    enclosure: dict[str, dict[str, float]] = {}
+
+
+class DrcViolation(BaseModel):
+    # width, spacing or enclosure
+    rule: str
+    layer: str
+    # enclosing layer of an enclosure violation
+    other_layer: str | None = None
+    # measured width, distance or enclosure, and the rule's minimum
+    value: float
+    limit: float
+    # x0, y0, x1, y1 of the offending shape or gap
+    bounds: list[float]
+    # indices into LayoutData.polygons
+    polygons: list[int]
+
+
+class DrcReport(BaseModel):
+    # violations per rule, keyed rule:layer or enclosure:via:metal
+    counts: dict[str, int]
+    # polygons on checked layers, and the time taken to check them
+    polygons: int
+    seconds: float
+    polygons_per_second: float
+    violations: list[DrcViolation] = []
+
+
 class LayerConfig(BaseModel):
     color: str
     facecolor: str
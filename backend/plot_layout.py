@@ -1,26 +1,51 @@
 """
-Plot all layout elements from a data.txt YAML file using matplotlib.
+Plot all layout elements from a data.txt YAML file, or a Boundbox repr dump,
+using matplotlib.
 
 Usage:
     python backend/plot_layout.py                          # default: data/data.txt
     python backend/plot_layout.py path/to/data.txt         # custom file
     python backend/plot_layout.py data/data.txt -o out.png # save to file
+    python backend/plot_layout.py big.txt -o out.png --renderer raster --width 4000
+    python backend/plot_layout.py backend/jobs -O plots/ -j 8   # batch mode
 """
 
+import io
+import os
 import re
 import sys
+import glob
+import json
+import time
+import hashlib
 import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+from matplotlib.collections import PolyCollection
 from matplotlib.patches import Patch
 
 # ---------------------------------------------------------------------------
-# Import display colours from sibling module
+# Import display colours and the rasterizer from sibling modules
 # ---------------------------------------------------------------------------
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 from display_config import display_colors  # noqa: E402
+from layout_raster import (  # noqa: E402
+    BACKGROUND,
+    DEFAULT_STYLE,
+    Rects,
+    encode_png,
+    rasterize,
+)
+from layout_repr import is_repr_file, load_layout  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 
 def _build_style_lookup() -> dict:
@@ -33,13 +58,12 @@ def _build_style_lookup() -> dict:
 
 
 # Fallback style for any layer not in display_config
-_DEFAULT_STYLE = {
-    "facecolor": "grey",
-    "edgecolor": "black",
-    "alpha": 0.4,
-    "linewidth": 0.5,
-    "zorder": 1,
-}
+_DEFAULT_STYLE = DEFAULT_STYLE
+
+# matplotlib output resolution, and the largest figure side in inches so that
+# huge canvases do not allocate gigapixel figures
+_DPI = 200
+_MAX_FIGURE_INCHES = 60.0
 
 
 # ---------------------------------------------------------------------------
@@ -52,8 +76,22 @@ _BBOX_FIELD = re.compile(
 )
 
 
+_CANVAS_KEYS = ("canvas_width", "canvas_height", "start_x", "start_y")
+
+
 def parse_data_file(filepath: str) -> dict:
     """Return a dict with canvas info and a list of (layer, x0, y0, x1, y1) tuples."""
+    # Boundbox repr dumps (routes, polygons) are streamed, see layout_repr.py
+    if is_repr_file(filepath):
+        layout = load_layout(filepath)
+        return {
+            **{key: layout[key] for key in _CANVAS_KEYS},
+            "polygons": [
+                (layer, box["x0"], box["y0"], box["x1"], box["y1"])
+                for layer, box in layout["polygons"]
+            ],
+        }
+
     text = Path(filepath).read_text()
 
     # ---- canvas metadata ---------------------------------------------------
@@ -127,6 +165,26 @@ def parse_data_file(filepath: str) -> dict:
 # ---------------------------------------------------------------------------
 
 
+def _group_by_style(polygons: list, style_lookup: dict) -> tuple:
+    """Return (styles, style_ids, coords, layers) with one style per group."""
+    styles: list[dict] = []
+    group_of: dict[str, int] = {}
+    style_index: dict[int, int] = {}
+    for layer, *_ in polygons:
+        if layer not in group_of:
+            style = style_lookup.get(layer, _DEFAULT_STYLE)
+            if id(style) not in style_index:
+                style_index[id(style)] = len(styles)
+                styles.append(style)
+            group_of[layer] = style_index[id(style)]
+
+    style_ids = np.fromiter(
+        (group_of[p[0]] for p in polygons), dtype=np.int32, count=len(polygons)
+    )
+    coords = np.array([p[1:5] for p in polygons], dtype=np.float64).reshape(-1, 4)
+    return styles, style_ids, coords, list(group_of)
+
+
 def plot_layout(data: dict, output_path: str | None = None) -> None:
     style_lookup = _build_style_lookup()
 
@@ -134,35 +192,33 @@ def plot_layout(data: dict, output_path: str | None = None) -> None:
     canvas_h = data["canvas_height"]
 
     # Figure size proportional to canvas, with a reasonable scale factor
-    scale = 2.0
+    scale = min(2.0, _MAX_FIGURE_INCHES / max(canvas_w, canvas_h, 1e-9))
     fig, ax = plt.subplots(
         figsize=(canvas_w * scale, canvas_h * scale),
-        facecolor="#1e1e2e",
+        facecolor=BACKGROUND,
     )
-    ax.set_facecolor("#1e1e2e")
-
-    # Track which layers appear for the legend
-    legend_layers: dict[str, dict] = {}
-
-    for layer, x0, y0, x1, y1 in data["polygons"]:
-        style = style_lookup.get(layer, _DEFAULT_STYLE)
-        w = x1 - x0
-        h = y1 - y0
-
-        rect = patches.Rectangle(
-            (x0, y0),
-            w,
-            h,
-            linewidth=style.get("linewidth", 0.5),
-            edgecolor=style.get("edgecolor", "black"),
-            facecolor=style.get("facecolor", "grey"),
+    ax.set_facecolor(BACKGROUND)
+
+    # One collection per style instead of one patch per polygon
+    styles, style_ids, coords, layers = _group_by_style(data["polygons"], style_lookup)
+    x0, y0, x1, y1 = coords.T
+    corners = np.stack(
+        [np.column_stack(xy) for xy in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))],
+        axis=1,
+    )
+    for style_id, style in enumerate(styles):
+        collection = PolyCollection(
+            corners[style_ids == style_id],
+            linewidths=style.get("linewidth", 0.5),
+            edgecolors=style.get("edgecolor", "black"),
+            facecolors=style.get("facecolor", "grey"),
             alpha=style.get("alpha", 0.5),
             zorder=style.get("zorder", 1),
         )
-        ax.add_patch(rect)
+        ax.add_collection(collection)
 
-        if layer not in legend_layers:
-            legend_layers[layer] = style
+    # Track which layers appear for the legend
+    legend_layers = {layer: style_lookup.get(layer, _DEFAULT_STYLE) for layer in layers}
 
     # ---- Axes configuration ------------------------------------------------
     margin = 0.2
@@ -205,7 +261,7 @@ def plot_layout(data: dict, output_path: str | None = None) -> None:
 
     if output_path:
         fig.savefig(
-            output_path, dpi=200, bbox_inches="tight", facecolor=fig.get_facecolor()
+            output_path, dpi=_DPI, bbox_inches="tight", facecolor=fig.get_facecolor()
         )
         print(f"Saved layout plot to {output_path}")
     else:
@@ -214,6 +270,222 @@ def plot_layout(data: dict, output_path: str | None = None) -> None:
     plt.close(fig)
 
 
+def _canvas_bounds(data: dict) -> tuple[float, float, float, float]:
+    x0, y0 = data["start_x"], data["start_y"]
+    x1 = x0 + (data["canvas_width"] or 1.0)
+    return (x0, y0, x1, y0 + (data["canvas_height"] or 1.0))
+
+
+def render_raster(data: dict, output_path: str, width: int = 4000) -> None:
+    """Write the polygons straight to a PNG with the NumPy rasterizer."""
+    x0, y0, x1, y1 = _canvas_bounds(data)
+    height = max(int(round(width * (y1 - y0) / (x1 - x0))), 1)
+    styles, rects = _prepare_raster(data)
+    # keep line widths in proportion with a matplotlib figure of this width
+    line_scale = width / ((x1 - x0) * 2.0) / 72
+    image = rasterize(rects, styles, (x0, y0, x1, y1), width, height, line_scale)
+    Path(output_path).write_bytes(encode_png(image))
+    print(f"Saved layout raster to {output_path} ({width}x{height})")
+
+
+def render_tiles(data: dict, output_stem: str, width: int, tile_size: int) -> list[str]:
+    """Rasterize the canvas at width pixels as tile_size square tiles."""
+    x0, y0, x1, y1 = _canvas_bounds(data)
+    side = (x1 - x0) * tile_size / width
+    columns = max(int(np.ceil((x1 - x0) / side - 1e-9)), 1)
+    rows = max(int(np.ceil((y1 - y0) / side - 1e-9)), 1)
+    styles, rects = _prepare_raster(data)
+    line_scale = width / ((x1 - x0) * 2.0) / 72
+
+    outputs = []
+    for row in range(rows):
+        for column in range(columns):
+            left, top = x0 + column * side, y1 - row * side
+            bounds = (left, top - side, left + side, top)
+            image = rasterize(rects, styles, bounds, tile_size, tile_size, line_scale)
+            path = f"{output_stem}.{row}_{column}.png"
+            Path(path).write_bytes(encode_png(image))
+            outputs.append(path)
+    return outputs
+
+
+def _prepare_raster(data: dict) -> tuple[list, Rects]:
+    styles, style_ids, coords, _ = _group_by_style(
+        data["polygons"], _build_style_lookup()
+    )
+    return styles, Rects.from_coords(coords, style_ids, len(styles))
+
+
+def _peak_memory_mib() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+
+MANIFEST_NAME = "manifest.json"
+
+
+def collect_inputs(patterns: list[str]) -> list[Path]:
+    """Expand files, glob patterns and directories into layout files."""
+    found: list[Path] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            files = sorted(path.glob("*/layout.yaml")) or sorted(
+                p for p in path.iterdir() if p.suffix in (".txt", ".yaml")
+            )
+        elif path.is_file():
+            files = [path]
+        else:
+            files = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        found.extend(files)
+    # the same file given twice is rendered once
+    return list({path.resolve(): path for path in found}.values())
+
+
+def _output_stem(path: Path) -> str:
+    # job outputs are all named layout.yaml, name them after their job id; the
+    # hash of the resolved path keeps same-named inputs in different
+    # directories apart
+    name = path.parent.name if path.name == "layout.yaml" else path.stem
+    digest = hashlib.sha256(str(path.resolve()).encode()).hexdigest()
+    return f"{name}.{digest[:8]}"
+
+
+def _safe_name(layer: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", layer)
+
+
+def _input_key(path: Path, options: dict) -> str:
+    digest = hashlib.sha256(path.read_bytes())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        manifest = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _write_manifest(path: Path, manifest: dict) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+def _init_worker() -> None:
+    # each worker keeps matplotlib imported and warm for all of its files
+    plt.switch_backend("Agg")
+
+
+def _render_file(path: str, output_dir: str, options: dict) -> tuple[list[str], int]:
+    """Render one layout file as the batch options ask, in a pool worker."""
+    data = parse_data_file(path)
+    stem = str(Path(output_dir) / _output_stem(Path(path)))
+    variants = [(stem, data)]
+    if options["per_layer"]:
+        layers = sorted({polygon[0] for polygon in data["polygons"]})
+        variants = [
+            (
+                f"{stem}.{_safe_name(layer)}",
+                {**data, "polygons": [p for p in data["polygons"] if p[0] == layer]},
+            )
+            for layer in layers
+        ]
+
+    outputs: list[str] = []
+    # per-file messages would interleave across workers
+    with contextlib.redirect_stdout(io.StringIO()):
+        for output_stem, variant in variants:
+            if options["tile_size"]:
+                outputs += render_tiles(
+                    variant, output_stem, options["width"], options["tile_size"]
+                )
+            elif options["renderer"] == "raster":
+                render_raster(variant, f"{output_stem}.png", width=options["width"])
+                outputs.append(f"{output_stem}.png")
+            else:
+                plot_layout(variant, output_path=f"{output_stem}.png")
+                outputs.append(f"{output_stem}.png")
+    return outputs, len(data["polygons"])
+
+
+def run_batch(
+    inputs: list[Path],
+    output_dir: Path,
+    options: dict,
+    jobs: int,
+    force: bool = False,
+) -> int:
+    """Render many layout files in a process pool and return the failure count."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # outputs are recorded as resolved paths, valid from any working directory
+    output_dir = output_dir.resolve()
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    pending: dict[str, str] = {}
+    skipped = 0
+    for path in inputs:
+        key = _input_key(path, options)
+        entry = manifest.get(str(path.resolve()))
+        if (
+            entry
+            and entry.get("key") == key
+            and all(Path(output).exists() for output in entry.get("outputs", ()))
+        ):
+            skipped += 1
+            continue
+        pending[str(path)] = key
+
+    start = time.perf_counter()
+    rendered = polygons = failures = 0
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max(min(jobs, len(pending)), 1), initializer=_init_worker
+        ) as pool:
+            futures = {
+                pool.submit(_render_file, path, str(output_dir), options): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    outputs, count = future.result()
+                except Exception as exc:  # one bad file must not stop the batch
+                    failures += 1
+                    print(f"Failed {path}: {exc}")
+                    continue
+                rendered += 1
+                polygons += count
+                manifest[str(Path(path).resolve())] = {
+                    "key": pending[path],
+                    "outputs": outputs,
+                }
+                done = rendered + failures
+                print(f"[{done}/{len(pending)}] {path}: {count} polygons")
+    finally:
+        _write_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - start
+    rate = 1 / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Rendered {rendered} files ({skipped} unchanged, {failures} failed) in "
+        f"{elapsed:.2f} s: {rendered * rate:.1f} files/s, "
+        f"{polygons * rate:.0f} polygons/s"
+    )
+    return failures
+
+
 # ---------------------------------------------------------------------------
 # CLI entry point
 # ---------------------------------------------------------------------------
@@ -223,9 +495,10 @@ def main():
     parser = argparse.ArgumentParser(description="Plot IC layout from data.txt")
     parser.add_argument(
         "datafile",
-        nargs="?",
-        default=str(Path(__file__).resolve().parent.parent / "data" / "data.txt"),
-        help="Path to the YAML data file (default: data/data.txt)",
+        nargs="*",
+        default=[str(Path(__file__).resolve().parent.parent / "data" / "data.txt")],
+        help="Path to the YAML data file (default: data/data.txt); in batch mode "
+        "any number of files, glob patterns or jobs directories",
     )
     parser.add_argument(
         "-o",
@@ -233,14 +506,82 @@ def main():
         default=None,
         help="Save plot to file instead of showing interactively (e.g. layout.png)",
     )
+    parser.add_argument(
+        "--renderer",
+        choices=("matplotlib", "raster"),
+        default="matplotlib",
+        help="raster writes a PNG directly with NumPy, for very large layouts",
+    )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=4000,
+        help="Image width in pixels for the raster renderer (default: 4000)",
+    )
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument(
+        "-O",
+        "--output-dir",
+        default=None,
+        help="Render every input into this directory in a process pool",
+    )
+    batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: one per CPU)",
+    )
+    batch.add_argument(
+        "--per-layer", action="store_true", help="Write one image per layer"
+    )
+    batch.add_argument(
+        "--tile-size",
+        type=int,
+        default=0,
+        help="Write square raster tiles of this many pixels, the canvas being "
+        "--width pixels wide",
+    )
+    batch.add_argument(
+        "--force", action="store_true", help="Re-render inputs listed as unchanged"
+    )
     args = parser.parse_args()
 
-    data = parse_data_file(args.datafile)
+    if args.output_dir:
+        inputs = collect_inputs(args.datafile)
+        if not inputs:
+            parser.error("no layout files match the inputs")
+        options = {
+            "renderer": args.renderer,
+            "width": args.width,
+            "per_layer": args.per_layer,
+            "tile_size": args.tile_size,
+        }
+        failures = run_batch(
+            inputs, Path(args.output_dir), options, args.jobs, force=args.force
+        )
+        sys.exit(1 if failures else 0)
+
+    if len(args.datafile) > 1 or args.per_layer or args.tile_size:
+        parser.error("several inputs, --per-layer and --tile-size need --output-dir")
+    if args.renderer == "raster" and not args.output:
+        parser.error("--renderer raster needs --output")
+
+    datafile = args.datafile[0]
+    data = parse_data_file(datafile)
     n = len(data["polygons"])
-    print(f"Parsed {n} polygons from {args.datafile}")
+    print(f"Parsed {n} polygons from {datafile}")
     print(f"Canvas: {data['canvas_width']} x {data['canvas_height']}")
 
-    plot_layout(data, output_path=args.output)
+    start = time.perf_counter()
+    if args.renderer == "raster":
+        render_raster(data, args.output, width=args.width)
+    else:
+        plot_layout(data, output_path=args.output)
+    elapsed = time.perf_counter() - start
+    peak = _peak_memory_mib()
+    peak_text = f", peak memory {peak:.0f} MiB" if peak is not None else ""
+    print(f"Rendered in {elapsed:.2f} s{peak_text}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,39 @@
 from .job_manager import JobManager
+from .job_store import LogSpool, StatusWriter
+from .layout_arrays import LayoutArrays
+from .layout_body import LayoutBody
+from .layout_drc import LayoutChecker
+from .layout_nets import LayoutNets
 from .layout_parser import LayoutParser
+from .layout_preview import LayoutPreviews
+from .layout_stream import LayoutTail
+from .layout_tiles import LayoutTiles
+from .log_stream import Subscription
+from .metrics import MetricsRegistry, RequestMetrics
+from .progress import ProgressTracker
+from .result_cache import ResultCache
+from .spatial_index import BoxGrid, LayoutIndex, STRTree
+from .worker_pool import WorkerPool
 
-__all__ = ["JobManager", "LayoutParser"]
+__all__ = [
+    "BoxGrid",
+    "JobManager",
+    "LayoutArrays",
+    "LayoutBody",
+    "LayoutChecker",
+    "LayoutIndex",
+    "LayoutNets",
+    "LayoutParser",
+    "LayoutPreviews",
+    "LayoutTail",
+    "LayoutTiles",
+    "LogSpool",
+    "MetricsRegistry",
+    "ProgressTracker",
+    "RequestMetrics",
+    "ResultCache",
+    "STRTree",
+    "StatusWriter",
+    "Subscription",
+    "WorkerPool",
+]
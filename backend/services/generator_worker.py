@@ -0,0 +1,88 @@
+# long-lived generator process of the worker pool, a standalone script using
+# only the standard library: generator_worker.py <generator_script> <token>;
+# each stdin line is a JSON request {"argv": [...], "cpu_limit": seconds} and
+# each job's output ends with a newline and the line "<token> exit <code>"
+
+from __future__ import annotations
+
+import importlib.util
+import inspect
+import json
+import math
+import runpy
+import sys
+import traceback
+from pathlib import Path
+from typing import Callable
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# import the generator and return a callable running one job
+def _load_entry(script: Path) -> Callable[[list[str]], object]:
+    sys.path.insert(0, str(script.parent))
+    spec = importlib.util.spec_from_file_location(f"_generator_{script.stem}", script)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load generator script: {script}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    main = getattr(module, "main", None)
+    if not callable(main):
+        # no in-process entry point, run the script as __main__ for every job
+        return lambda argv: runpy.run_path(str(script), run_name="__main__")
+    if not inspect.signature(main).parameters:
+        return lambda argv: main()
+    return main
+
+
+def _run(entry: Callable[[list[str]], object], script: Path, argv: list[str]) -> int:
+    sys.argv = [str(script), *argv]
+    try:
+        result = entry(argv)
+    except SystemExit as exc:
+        result = exc.code
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    if result is None:
+        return 0
+    if isinstance(result, int):
+        return result
+    print(result, file=sys.stderr)
+    return 1
+
+
+# allow the next job ``seconds`` of cpu time on top of what earlier jobs used
+def _limit_cpu(seconds: int) -> None:
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def main() -> int:
+    script, token = Path(sys.argv[1]), sys.argv[2]
+    entry = _load_entry(script)
+    print(f"{token} ready", flush=True)
+
+    for raw_line in sys.stdin:
+        request = json.loads(raw_line)
+        if request.get("cpu_limit"):
+            _limit_cpu(request["cpu_limit"])
+        code = _run(entry, script, request["argv"])
+        sys.stderr.flush()
+        # the generator's last write may not end its line
+        print(f"\n{token} exit {code}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,38 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import heapq
+import itertools
 import json
+import shutil
+import time
 import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Awaitable, Callable
 
-from ..models import GenerateRequest, Job, JobStatus
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from ..models import (
+    FINISHED_STATUSES,
+    DrcViolation,
+    GenerateRequest,
+    Job,
+    JobStatus,
+)
+from .job_store import LogSpool, StatusWriter, atomic_write_text, directory_size
+from .layout_drc import LayoutChecker
+from .layout_stream import PARTIAL_FILE
+from .log_stream import Subscription
+from .metrics import MetricsRegistry
+from .progress import ProgressTracker, parse_progress
+from .result_cache import ResultCache, link_or_copy
+from .worker_pool import WorkerError, WorkerPool
 
 
 # data class to store job context
@@ -17,64 +41,440 @@ class JobContext:
     job: Job
     output_path: Path
     status_path: Path
+    log_path: Path
+    # geometry the generator may append while running, see layout_stream.py
+    partial_path: Path
+    # design rule check report, see layout_drc.py
+    drc_path: Path
+
+    @classmethod
+    def for_job(cls, job: Job, job_dir: Path) -> JobContext:
+        return cls(
+            job=job,
+            output_path=job_dir / "layout.yaml",
+            status_path=job_dir / "status.json",
+            log_path=job_dir / "job.log",
+            partial_path=job_dir / PARTIAL_FILE,
+            drc_path=job_dir / "drc.json",
+        )
 
 
 class JobManager:
-    def __init__(self, jobs_dir: Path, generator_script: Path) -> None:
+    def __init__(
+        self,
+        jobs_dir: Path,
+        generator_script: Path,
+        result_cache: ResultCache | None = None,
+        max_concurrent: int = 4,
+        timeout: float | None = None,
+        memory_limit: int | None = None,
+        cpu_limit: int | None = None,
+        retention_age: float | None = None,
+        retention_bytes: int | None = None,
+        log_tail_lines: int = 200,
+        subscriber_buffer: int = 1000,
+        workers: int = 0,
+        worker_max_jobs: int = 50,
+        progress_interval: float = 0.1,
+        checker: LayoutChecker | None = None,
+        metrics: MetricsRegistry | None = None,
+    ) -> None:
         self.jobs_dir = jobs_dir
         self.generator_script = generator_script
+        self.result_cache = result_cache
+        # scheduler limits: concurrent generators, wall-clock seconds per job,
+        # and optional address-space bytes and cpu seconds per generator
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        # with workers > 0 generators run in warm processes instead of one
+        # interpreter per job, see services/worker_pool.py; their cpu limit
+        # is set again before each job rather than once per process
+        self.worker_pool = (
+            WorkerPool(
+                generator_script,
+                workers,
+                worker_max_jobs,
+                self._resource_limits(cpu=False),
+                cpu_limit,
+            )
+            if workers > 0
+            else None
+        )
+        # finished job directories older than retention_age seconds, or the
+        # oldest ones while the jobs directory exceeds retention_bytes, are removed
+        self.retention_age = retention_age
+        self.retention_bytes = retention_bytes
+        self.gc_interval = 60.0
+        self._last_gc = 0.0
         self.jobs: dict[str, JobContext] = {}
         self.processes: dict[str, asyncio.subprocess.Process] = {}
-        self.subscribers: dict[str, set[asyncio.Queue[str | None]]] = {}
-        self.log_history: dict[str, list[str]] = {}
+        # log lines buffered per SSE subscriber before they are dropped
+        self.subscriber_buffer = subscriber_buffer
+        self.subscribers: dict[str, set[Subscription]] = {}
+        # progress parsed from generator output is sent to subscribers at most
+        # once per progress_interval seconds
+        self.progress_interval = progress_interval
+        self._progress: dict[str, ProgressTracker] = {}
+        # optional design rule check of each completed layout, run before the
+        # job's subscribers are told it is complete but after its generator
+        # slot is freed for the next queued job
+        self.checker = checker
+        # logs are spooled to jobs/{job_id}/job.log, only a tail stays in memory
+        self.logs = LogSpool(log_tail_lines)
+        self.status_writer = StatusWriter()
+        self.tasks: dict[str, asyncio.Task[None]] = {}
+        # post-steps of completed jobs, outside the concurrency limit
+        self._finishing: dict[str, asyncio.Task[None]] = {}
+        # priority queue of (-priority, sequence, job_id), cancelled jobs are
+        # dropped from _queued and skipped when popped
+        self._queue: list[tuple[int, int, str]] = []
+        self._queued: dict[str, GenerateRequest] = {}
+        self._sequence = itertools.count()
+        self._cancelled: set[str] = set()
+        # result cache keys of pending and running jobs, both ways
+        self._inflight: dict[str, str] = {}
+        self._job_keys: dict[str, str] = {}
         self._lock = asyncio.Lock()
+        # callbacks run in the background with each completed job's output,
+        # e.g. to warm caches before the first client asks for the layout
+        self.completion_hooks: list[Callable[[Job, Path], Awaitable[None]]] = []
+        # completion hooks and garbage collections, referenced until done
+        self._background_tasks: set[asyncio.Future[object]] = set()
+        # start time and stdout lines of each running generator
+        self._started: dict[str, float] = {}
+        self._output_lines: dict[str, int] = {}
+        self.metrics = metrics or MetricsRegistry()
+        self._register_metrics()
+
+    def _register_metrics(self) -> None:
+        metrics = self.metrics
+        self._jobs_gauge = metrics.gauge(
+            "layout_jobs", "Jobs in the registry by status.", ("status",)
+        )
+        metrics.gauge(
+            "layout_jobs_queued",
+            "Pending jobs waiting for a generator slot.",
+            function=lambda: len(self._queued),
+        )
+        self._jobs_finished = metrics.counter(
+            "layout_jobs_finished_total", "Jobs finished by status.", ("status",)
+        )
+        self._generator_seconds = metrics.histogram(
+            "layout_generator_duration_seconds",
+            "Wall-clock time of generator runs by outcome.",
+            ("outcome",),
+            buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+        )
+        self._background_failures = metrics.counter(
+            "layout_background_failures_total",
+            "Failed completion hooks and garbage collections.",
+            ("task",),
+        )
+        self._lines_total = metrics.counter(
+            "layout_generator_output_lines_total", "Lines written by generators."
+        )
+        self._line_rate = metrics.gauge(
+            "layout_job_output_lines_per_second",
+            "Stdout lines per second of each running generator since it started.",
+            ("job_id",),
+        )
+        self._sse_subscribers = metrics.gauge(
+            "layout_sse_subscribers", "Open SSE subscriptions per job.", ("job_id",)
+        )
+        self._sse_depth = metrics.gauge(
+            "layout_sse_queue_depth",
+            "Lines buffered by the furthest behind subscriber of each job.",
+            ("job_id",),
+        )
+        metrics.add_collector(self._collect_metrics)
+
+    # gauges computed from the registry on each scrape, jobs without
+    # subscribers or generators have no series
+    def _collect_metrics(self) -> None:
+        counts = dict.fromkeys((status.value for status in JobStatus), 0)
+        for context in self.jobs.values():
+            counts[context.job.status.value] += 1
+        for status, count in counts.items():
+            self._jobs_gauge.labels(status).set(count)
+
+        now = time.monotonic()
+        self._line_rate.clear()
+        for job_id, started in self._started.items():
+            lines = self._output_lines.get(job_id, 0)
+            self._line_rate.labels(job_id).set(lines / max(now - started, 1e-3))
+
+        self._sse_subscribers.clear()
+        self._sse_depth.clear()
+        for job_id, subscriptions in self.subscribers.items():
+            if subscriptions:
+                self._sse_subscribers.labels(job_id).set(len(subscriptions))
+                depth = max(subscription.depth for subscription in subscriptions)
+                self._sse_depth.labels(job_id).set(depth)
 
     async def create_job(self, request: GenerateRequest) -> Job:
         async with self._lock:
+            # identical requests coalesce onto the job already generating them
+            key = self._cache_key(request)
+            if key and key in self._inflight:
+                return self.jobs[self._inflight[key]].job
+
             job_id = str(uuid.uuid4())
             job_dir = self.jobs_dir / job_id
             job_dir.mkdir(parents=True, exist_ok=True)
-            output_path = job_dir / "layout.yaml"
-            status_path = job_dir / "status.json"
 
             # create job and context and set status to pending
             job = Job(
                 job_id=job_id,
                 status=JobStatus.PENDING,
                 created_at=datetime.now(timezone.utc),
+                priority=request.priority,
             )
-            self.jobs[job_id] = JobContext(
-                job=job, output_path=output_path, status_path=status_path
-            )
-            self.log_history[job_id] = []
+            context = JobContext.for_job(job, job_dir)
+            self.jobs[job_id] = context
             self.subscribers[job_id] = set()
-            await self._write_status(job_id)
+
+            cached = self.result_cache.lookup(key) if key else None
+            if cached:
+                # reuse the stored output, the job is complete right away
+                link_or_copy(cached, context.output_path)
+                job.status = JobStatus.COMPLETED
+                job.completed_at = datetime.now(timezone.utc)
+                self.logs.append(
+                    job_id, context.log_path, f"Reused cached result {key[:12]}"
+                )
+                self.logs.close(job_id)
+                self._jobs_finished.labels(job.status.value).inc()
+                self._run_completion_hooks(job_id)
+            elif key:
+                self._inflight[key] = job_id
+                self._job_keys[job_id] = key
+            self._write_status(job_id)
             return job
 
+    # rebuild the registry from status files left by a previous process
+    def load_jobs(self) -> int:
+        loaded = 0
+        for status_path in sorted(self.jobs_dir.glob("*/status.json")):
+            job_dir = status_path.parent
+            if job_dir.name.startswith(".") or job_dir.name in self.jobs:
+                continue
+            try:
+                job = Job.model_validate_json(status_path.read_text())
+            except (OSError, ValueError):
+                continue
+            context = JobContext.for_job(job, job_dir)
+            self.jobs[job.job_id] = context
+            self.subscribers[job.job_id] = set()
+            loaded += 1
+
+            # generators do not survive a restart
+            if job.status not in FINISHED_STATUSES:
+                job.status = JobStatus.FAILED
+                job.error = "Interrupted by server restart"
+                job.completed_at = datetime.now(timezone.utc)
+                atomic_write_text(status_path, self._render_status(job))
+        return loaded
+
+    async def collect_garbage(self) -> list[str]:
+        if not (self.retention_age or self.retention_bytes):
+            return []
+        self._last_gc = time.monotonic()
+        job_dirs = {
+            job_id: context.output_path.parent
+            for job_id, context in self.jobs.items()
+        }
+        sizes = await asyncio.to_thread(
+            lambda: {job_id: directory_size(path) for job_id, path in job_dirs.items()}
+        )
+
+        # oldest finished jobs first, running and queued jobs are kept
+        now = datetime.now(timezone.utc)
+        total = sum(sizes.values())
+        finished = sorted(
+            (context.job.completed_at or context.job.created_at, job_id)
+            for job_id, context in self.jobs.items()
+            if context.job.status in FINISHED_STATUSES
+            and job_id not in self.tasks
+            and job_id not in self._finishing
+            and job_id in sizes
+        )
+        removed: list[str] = []
+        for finished_at, job_id in finished:
+            expired = bool(self.retention_age) and (
+                (now - finished_at).total_seconds() > self.retention_age
+            )
+            over_quota = bool(self.retention_bytes) and total > self.retention_bytes
+            if not (expired or over_quota):
+                continue
+            total -= sizes[job_id]
+            removed.append(job_id)
+            self._forget_job(job_id)
+
+        for job_id in removed:
+            await asyncio.to_thread(shutil.rmtree, job_dirs[job_id], True)
+        return removed
+
+    async def flush(self) -> None:
+        await self.status_writer.flush()
+        await asyncio.gather(*list(self._finishing.values()), return_exceptions=True)
+        await asyncio.gather(*list(self._background_tasks), return_exceptions=True)
+
+    async def start(self) -> None:
+        if self.worker_pool:
+            await self.worker_pool.start()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self.worker_pool:
+            await self.worker_pool.close()
+
     async def start_job(self, job_id: str, request: GenerateRequest) -> None:
-        asyncio.create_task(self._run_job(job_id, request))
+        # cached and coalesced jobs are already complete or started
+        context = self.jobs.get(job_id)
+        if not context or job_id in self.tasks or job_id in self._queued:
+            return
+        if context.job.status != JobStatus.PENDING:
+            return
+        heapq.heappush(self._queue, (-request.priority, next(self._sequence), job_id))
+        self._queued[job_id] = request
+        self._dispatch()
+
+    async def cancel_job(self, job_id: str) -> Job | None:
+        context = self.jobs.get(job_id)
+        if not context:
+            return None
+        if context.job.status in FINISHED_STATUSES:
+            return context.job
+
+        # still queued or never started, finish it here
+        task = self.tasks.get(job_id)
+        if not task:
+            self._queued.pop(job_id, None)
+            self._release(job_id)
+            await self._fail_job(job_id, "Job cancelled", JobStatus.CANCELLED)
+            self.logs.close(job_id)
+            return context.job
+
+        # running, kill the generator and let the job task record the outcome
+        self._cancelled.add(job_id)
+        process = self.processes.get(job_id)
+        if process and process.returncode is None:
+            process.kill()
+        await asyncio.wait({task}, timeout=5)
+        return context.job
 
     # get job context by job id
     def get_job(self, job_id: str) -> Job | None:
         context = self.jobs.get(job_id)
-        return context.job if context else None
+        if not context:
+            return None
+        context.job.queue_position = self.queue_position(job_id)
+        return context.job
+
+    def queue_position(self, job_id: str) -> int | None:
+        if job_id not in self._queued:
+            return None
+        waiting = sorted(entry for entry in self._queue if entry[2] in self._queued)
+        return [entry[2] for entry in waiting].index(job_id) + 1
 
     def get_output_path(self, job_id: str) -> Path | None:
         context = self.jobs.get(job_id)
         return context.output_path if context else None
 
-    def get_history(self, job_id: str) -> list[str]:
-        return list(self.log_history.get(job_id, []))
+    def get_partial_path(self, job_id: str) -> Path | None:
+        context = self.jobs.get(job_id)
+        return context.partial_path if context else None
+
+    # log lines after the first ``after`` ones, line n has sequence number n
+    async def get_history(self, job_id: str, after: int = 0) -> list[str]:
+        context = self.jobs.get(job_id)
+        if not context:
+            return []
+        return await self.logs.read_after(job_id, context.log_path, after)
+
+    def get_log_tail(self, job_id: str) -> list[str]:
+        return self.logs.tail(job_id)
+
+    def add_subscriber(self, job_id: str, logs: bool = True) -> Subscription:
+        subscription = Subscription(self.subscriber_buffer, logs)
+        self.subscribers.setdefault(job_id, set()).add(subscription)
+        # finished jobs will not broadcast completion again, unless their
+        # post-step is still running
+        context = self.jobs.get(job_id)
+        if (
+            context
+            and context.job.status in FINISHED_STATUSES
+            and job_id not in self._finishing
+        ):
+            subscription.finish()
+        return subscription
 
-    def add_subscriber(self, job_id: str) -> asyncio.Queue[str | None]:
-        queue: asyncio.Queue[str | None] = asyncio.Queue()
-        self.subscribers.setdefault(job_id, set()).add(queue)
-        return queue
+    def remove_subscriber(self, job_id: str, subscription: Subscription) -> None:
+        self.subscribers.get(job_id, set()).discard(subscription)
 
-    def remove_subscriber(self, job_id: str, queue: asyncio.Queue[str | None]) -> None:
-        self.subscribers.get(job_id, set()).discard(queue)
+    def _cache_key(self, request: GenerateRequest) -> str | None:
+        if not self.result_cache or not self.generator_script.exists():
+            return None
+        return self.result_cache.key_for(request, self.generator_script)
+
+    # start queued jobs in priority order while below the concurrency limit
+    def _dispatch(self) -> None:
+        while self._queue and len(self.tasks) < self.max_concurrent:
+            _, _, job_id = heapq.heappop(self._queue)
+            request = self._queued.pop(job_id, None)
+            if request is None:
+                continue
+            self.tasks[job_id] = asyncio.create_task(self._run_job(job_id, request))
+
+    def _release(self, job_id: str) -> None:
+        key = self._job_keys.pop(job_id, None)
+        if key:
+            self._inflight.pop(key, None)
 
     async def _run_job(self, job_id: str, request: GenerateRequest) -> None:
+        try:
+            await self._execute_job(job_id, request)
+        finally:
+            self.tasks.pop(job_id, None)
+            self.processes.pop(job_id, None)
+            self._started.pop(job_id, None)
+            self._output_lines.pop(job_id, None)
+            self._cancelled.discard(job_id)
+            # a completed job's post-step still logs and reports progress
+            if job_id not in self._finishing:
+                self._progress.pop(job_id, None)
+                self.logs.close(job_id)
+            self._release(job_id)
+            self._dispatch()
+            if time.monotonic() - self._last_gc > self.gc_interval:
+                self._last_gc = time.monotonic()
+                self._background(self.collect_garbage(), "gc")
+
+    def _forget_job(self, job_id: str) -> None:
+        context = self.jobs.pop(job_id, None)
+        self.subscribers.pop(job_id, None)
+        self.logs.forget(job_id)
+        if context:
+            self.status_writer.forget(context.status_path)
+
+    # apply the configured rlimits in the generator process before exec
+    def _resource_limits(self, cpu: bool = True) -> Callable[[], None] | None:
+        cpu_limit = self.cpu_limit if cpu else None
+        if resource is None or not (self.memory_limit or cpu_limit):
+            return None
+        memory_limit = self.memory_limit
+
+        def apply() -> None:
+            if memory_limit:
+                resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+            if cpu_limit:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit))
+
+        return apply
+
+    async def _execute_job(self, job_id: str, request: GenerateRequest) -> None:
         context = self.jobs.get(job_id)
         if not context:
             return
@@ -85,75 +485,291 @@ class JobManager:
             )
             return
 
+        if job_id in self._cancelled:
+            await self._fail_job(job_id, "Job cancelled", JobStatus.CANCELLED)
+            return
+
         context.job.status = JobStatus.RUNNING
-        await self._write_status(job_id)
+        self._write_status(job_id)
 
-        # construct generator script arguments and run it as a subprocess
-        args = [
-            "python",
-            str(self.generator_script),
-            "--output",
-            str(context.output_path),
-        ]
+        # construct generator script arguments
+        argv = ["--output", str(context.output_path)]
         if request.cell_name:
-            args.extend(["--cell-name", request.cell_name])
+            argv.extend(["--cell-name", request.cell_name])
         if request.config:
             config_path = context.output_path.parent / "config.json"
             config_path.write_text(json.dumps(request.config))
-            args.extend(["--config", str(config_path)])
+            argv.extend(["--config", str(config_path)])
+
+        try:
+            returncode = await self._run_generator(job_id, argv)
+        except asyncio.TimeoutError:
+            process = self.processes.get(job_id)
+            if process:
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+            await self._fail_job(
+                job_id, f"Generator timed out after {self.timeout:g} s"
+            )
+            return
+        except WorkerError as exc:
+            await self._fail_job(job_id, str(exc))
+            return
+
+        if job_id in self._cancelled:
+            await self._fail_job(job_id, "Job cancelled", JobStatus.CANCELLED)
+            return
+        if returncode == 0:
+            context.job.status = JobStatus.COMPLETED
+            context.job.completed_at = datetime.now(timezone.utc)
+            self._jobs_finished.labels(JobStatus.COMPLETED.value).inc()
+        elif returncode is None:
+            process = self.processes.get(job_id)
+            code = process.returncode if process else None
+            await self._fail_job(job_id, f"Generator worker exited with code {code}")
+            return
+        else:
+            await self._fail_job(job_id, f"Generator exited with code {returncode}")
+            return
+
+        key = self._job_keys.get(job_id)
+        if self.result_cache and key and context.output_path.exists():
+            self.result_cache.store(key, context.output_path)
+
+        self._write_status(job_id)
+        self._finishing[job_id] = asyncio.create_task(self._finish_job(job_id))
+
+    # post-step of a completed job, started once its generator slot is free
+    async def _finish_job(self, job_id: str) -> None:
+        try:
+            await self._check_layout(job_id)
+            self._run_completion_hooks(job_id)
+            self._broadcast(job_id, None)
+        finally:
+            self._finishing.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            self.logs.close(job_id)
+
+    # design rule check as a post-step, violations go to subscribers as each
+    # rule finishes and the report to drc.json
+    async def _check_layout(self, job_id: str) -> None:
+        context = self.jobs.get(job_id)
+        if not self.checker or not context or not context.output_path.exists():
+            return
+        try:
+            report = await self.checker.check(
+                context.output_path,
+                lambda violations: self._publish_violations(job_id, violations),
+            )
+            text = report.model_dump_json()
+            await asyncio.to_thread(atomic_write_text, context.drc_path, text)
+        # the layout is usable without a report, whatever went wrong
+        except Exception as exc:
+            self._broadcast(job_id, f"Design rule check failed: {exc}")
+            return
+        self._broadcast(
+            job_id,
+            f"Design rule check: {len(report.violations)} violations in "
+            f"{report.seconds:.2f} s ({report.polygons_per_second:.0f} polygons/s)",
+        )
+        summary = report.model_copy(update={"violations": []})
+        for subscription in self.subscribers.get(job_id, set()):
+            subscription.set_drc(summary)
+
+    def _publish_violations(
+        self, job_id: str, violations: list[DrcViolation]
+    ) -> None:
+        for subscription in self.subscribers.get(job_id, set()):
+            subscription.push_violations(violations)
+
+    # stored design rule check report of a completed job, checked on first use
+    # for jobs that skipped the post-step such as cached results
+    async def get_drc_report(self, job_id: str) -> str | None:
+        context = self.jobs.get(job_id)
+        if not context:
+            return None
+        finishing = self._finishing.get(job_id)
+        if finishing:
+            # the post-step writes the report, a client leaving must not
+            # cancel it
+            await asyncio.shield(finishing)
+            if not context.drc_path.exists():
+                return None
+        if context.drc_path.exists():
+            return await asyncio.to_thread(context.drc_path.read_text)
+        if not self.checker or context.job.status != JobStatus.COMPLETED:
+            return None
+        report = await self.checker.check(context.output_path)
+        text = report.model_dump_json()
+        await asyncio.to_thread(atomic_write_text, context.drc_path, text)
+        return text
+
+    def _run_completion_hooks(self, job_id: str) -> None:
+        context = self.jobs.get(job_id)
+        if not context:
+            return
+        for hook in self.completion_hooks:
+            # hooks are best effort, their failures must not affect the job
+            self._background(hook(context.job, context.output_path), "hook")
+
+    # run a coroutine in the background, keeping it referenced until it is done
+    # and counting its failures
+    def _background(self, awaitable: Awaitable[object], kind: str) -> None:
+        task = asyncio.ensure_future(awaitable)
+        self._background_tasks.add(task)
+        task.add_done_callback(lambda task: self._background_done(task, kind))
+
+    def _background_done(self, task: asyncio.Future[object], kind: str) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._background_failures.labels(kind).inc()
 
+    # run the generator and record how long it took and how it ended
+    async def _run_generator(self, job_id: str, argv: list[str]) -> int | None:
+        self._started[job_id] = started = time.monotonic()
+        self._output_lines[job_id] = 0
+        outcome = "error"
+        try:
+            if self.worker_pool:
+                returncode = await self._run_in_worker(job_id, argv)
+            else:
+                returncode = await self._run_subprocess(job_id, argv)
+            outcome = "completed" if returncode == 0 else "failed"
+            return returncode
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if job_id in self._cancelled:
+                outcome = "cancelled"
+            self._generator_seconds.labels(outcome).observe(time.monotonic() - started)
+
+    # run the generator script as a subprocess and return its exit code
+    async def _run_subprocess(self, job_id: str, argv: list[str]) -> int | None:
         process = await asyncio.create_subprocess_exec(
-            *args,
+            "python",
+            str(self.generator_script),
+            *argv,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
+            preexec_fn=self._resource_limits(),
         )
         self.processes[job_id] = process
+        # cancelled while the process was spawned, with nothing to kill yet
+        if job_id in self._cancelled:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+        await asyncio.wait_for(self._stream_output(job_id, process), self.timeout)
+        return process.returncode
 
+    # run the generator in a warm worker, None means the worker died mid-job;
+    # the timeout starts once a worker is available
+    async def _run_in_worker(self, job_id: str, argv: list[str]) -> int | None:
+        assert self.worker_pool is not None
+        worker = await self.worker_pool.acquire()
+        self.processes[job_id] = worker.process
+        try:
+            if job_id in self._cancelled:
+                return None
+            return await asyncio.wait_for(
+                worker.run(argv, lambda line: self._handle_output(job_id, line)),
+                self.timeout,
+            )
+        finally:
+            # a worker released mid-job is killed and replaced
+            self.worker_pool.release(worker)
+
+    async def _stream_output(
+        self, job_id: str, process: asyncio.subprocess.Process
+    ) -> None:
         # check if the generator script is writing to stdout and working correctly
         assert process.stdout is not None
 
         # stream stdout from the generator script to the subscribers to be sent to the frontend
         async for raw_line in process.stdout:
             line = raw_line.decode(errors="replace").rstrip()
-            await self._broadcast(job_id, line)
+            self._handle_output(job_id, line)
 
         # wait for the generator script to finish
         await process.wait()
-        if process.returncode == 0:
-            context.job.status = JobStatus.COMPLETED
-            context.job.completed_at = datetime.now(timezone.utc)
-        else:
-            await self._fail_job(
-                job_id, f"Generator exited with code {process.returncode}"
-            )
-            return
 
-        await self._write_status(job_id)
-        await self._broadcast(job_id, None)
+    # record progress reported in a generator line, then log the line unless it
+    # belongs to the structured progress channel
+    def _handle_output(self, job_id: str, line: str) -> None:
+        self._lines_total.inc()
+        if job_id in self._output_lines:
+            self._output_lines[job_id] += 1
+        parsed = parse_progress(line)
+        context = self.jobs.get(job_id)
+        if parsed and context:
+            done, total, structured = parsed
+            tracker = self._progress.get(job_id)
+            if tracker is None:
+                tracker = self._progress[job_id] = ProgressTracker(
+                    self.progress_interval
+                )
+            context.job.progress, due = tracker.update(done, total)
+            if due:
+                self._publish_progress(job_id)
+            if structured:
+                return
+        self._broadcast(job_id, line)
+
+    def _publish_progress(self, job_id: str) -> None:
+        context = self.jobs.get(job_id)
+        tracker = self._progress.get(job_id)
+        if not context or not context.job.progress or not tracker:
+            return
+        tracker.sent()
+        for subscription in self.subscribers.get(job_id, set()):
+            subscription.set_progress(context.job.progress)
 
-    async def _broadcast(self, job_id: str, message: str | None) -> None:
-        # add message to log history and broadcast to subscribers
-        if message is not None:
-            self.log_history.setdefault(job_id, []).append(message)
-        for queue in list(self.subscribers.get(job_id, set())):
-            await queue.put(message)
+    def _broadcast(self, job_id: str, message: str | None) -> None:
+        # add message to the job log and hand it to subscribers without waiting,
+        # None marks the end of the job
+        context = self.jobs.get(job_id)
+        subscriptions = self.subscribers.get(job_id, set())
+        if message is None:
+            # the last progress update is never throttled away
+            tracker = self._progress.get(job_id)
+            if tracker and tracker.pending:
+                self._publish_progress(job_id)
+            for subscription in subscriptions:
+                subscription.finish()
+            return
+        if not context:
+            return
+        sequence = self.logs.append(job_id, context.log_path, message)
+        for subscription in subscriptions:
+            subscription.push(sequence, message)
 
-    async def _fail_job(self, job_id: str, error: str) -> None:
+    async def _fail_job(
+        self, job_id: str, error: str, status: JobStatus = JobStatus.FAILED
+    ) -> None:
         context = self.jobs.get(job_id)
         if not context:
             return
-        context.job.status = JobStatus.FAILED
+        context.job.status = status
         context.job.error = error
         context.job.completed_at = datetime.now(timezone.utc)
+        self._jobs_finished.labels(status.value).inc()
 
         # write status to file and broadcast failure message to subscribers
-        await self._write_status(job_id)
-        await self._broadcast(job_id, error)
-        await self._broadcast(job_id, None)
+        self._write_status(job_id)
+        self._broadcast(job_id, error)
+        self._broadcast(job_id, None)
 
-    async def _write_status(self, job_id: str) -> None:
+    # persist the job status, written off the event loop and coalesced
+    def _write_status(self, job_id: str) -> None:
         context = self.jobs.get(job_id)
         if not context:
             return
-        payload: dict[str, Any] = context.job.model_dump()
-        context.status_path.write_text(json.dumps(payload, default=str, indent=2))
+        job = context.job
+        self.status_writer.schedule(
+            context.status_path, lambda: self._render_status(job)
+        )
+
+    @staticmethod
+    def _render_status(job: Job) -> str:
+        return job.model_dump_json(exclude={"queue_position"}, indent=2)
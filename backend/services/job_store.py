@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, TextIO
+
+
+# write a file atomically, readers see either the old or the new content
+def atomic_write_text(path: Path, text: str) -> None:
+    # unique per call, concurrent writers of one path never share a tmp file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+
+# lines ``start`` to ``stop`` of a text file, without keeping the ones before
+def read_lines(path: Path, start: int = 0, stop: int | None = None) -> list[str]:
+    with open(path, encoding="utf-8") as handle:
+        return [line[:-1] for line in itertools.islice(handle, start, stop)]
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+# persists status files off the event loop, coalescing rapid updates
+class StatusWriter:
+    def __init__(self, delay: float = 0.05) -> None:
+        self.delay = delay
+        self._pending: dict[Path, Callable[[], str]] = {}
+        self._locks: dict[Path, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def schedule(self, path: Path, render: Callable[[], str]) -> None:
+        if path in self._pending:
+            self._pending[path] = render
+            return
+        self._pending[path] = render
+        task = asyncio.create_task(self._write(path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _write(self, path: Path) -> None:
+        await asyncio.sleep(self.delay)
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        # writes to one path run in order, each rendering the latest state
+        async with lock:
+            render = self._pending.pop(path, None)
+            if render is None:
+                return
+            text = render()
+            try:
+                await asyncio.to_thread(atomic_write_text, path, text)
+            except OSError:
+                pass
+
+    def forget(self, path: Path) -> None:
+        self._pending.pop(path, None)
+        self._locks.pop(path, None)
+
+
+# append-only per-job log files with a small in-memory tail of each
+class LogSpool:
+    def __init__(self, tail_lines: int = 200) -> None:
+        self.tail_lines = tail_lines
+        self._handles: dict[str, TextIO] = {}
+        self._tails: dict[str, deque[str]] = {}
+        self._counts: dict[str, int] = {}
+
+    # append a line and return its 1-based line number in the file
+    def append(self, job_id: str, path: Path, line: str) -> int:
+        handle = self._handles.get(job_id)
+        if handle is None:
+            handle = self._handles[job_id] = open(path, "a", encoding="utf-8")
+            if job_id not in self._counts:
+                self._counts[job_id] = len(self.read(job_id, path))
+        handle.write(line + "\n")
+        tail = self._tails.get(job_id)
+        if tail is None:
+            tail = self._tails[job_id] = deque(maxlen=self.tail_lines)
+        tail.append(line)
+        self._counts[job_id] += 1
+        return self._counts[job_id]
+
+    def tail(self, job_id: str) -> list[str]:
+        return list(self._tails.get(job_id, ()))
+
+    def read(self, job_id: str, path: Path) -> list[str]:
+        # buffered lines must reach the file before it is replayed
+        handle = self._handles.get(job_id)
+        if handle is not None:
+            handle.flush()
+        try:
+            content = path.read_text(encoding="utf-8")
+        except OSError:
+            return self.tail(job_id)
+        return content.split("\n")[:-1]
+
+    # lines after the first ``after`` ones, read in a worker thread; lines
+    # appended meanwhile are left out, subscribers receive them
+    async def read_after(self, job_id: str, path: Path, after: int) -> list[str]:
+        handle = self._handles.get(job_id)
+        if handle is not None:
+            handle.flush()
+        stop = self._counts.get(job_id)
+        try:
+            return await asyncio.to_thread(read_lines, path, after, stop)
+        except OSError:
+            return self.tail(job_id)[after:]
+
+    def close(self, job_id: str) -> None:
+        handle = self._handles.pop(job_id, None)
+        if handle is not None:
+            handle.close()
+
+    def forget(self, job_id: str) -> None:
+        self.close(job_id)
+        self._tails.pop(job_id, None)
+        self._counts.pop(job_id, None)
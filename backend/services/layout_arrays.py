@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from ..models import LayoutData
+
+# Binary layout format served by /api/layouts/{job_id}/binary.
+# All integers and floats are little-endian.
+#
+#   offset  size    field
+#   0       4       magic b"LCLB"
+#   4       4       uint32 format version (1)
+#   8       4       uint32 metadata length in bytes (M)
+#   12      4       uint32 polygon count (N)
+#   16      4       uint32 label count (L)
+#   20      M       UTF-8 JSON metadata, space-padded so the arrays that
+#                   follow start on a 4-byte boundary:
+#                     canvas_width, canvas_height, start_x, start_y,
+#                     layer_maps, layers: [{name, offset, count}],
+#                     label_layers: [layer index], label_texts: [text]
+#   20+M    N*16    float32 polygon coords [x0, y0, x1, y1], grouped by layer;
+#                   layer i owns polygons [offset, offset + count)
+#   ...     L*8     float32 label positions [x, y]
+BINARY_MAGIC = b"LCLB"
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<4sIIII")
+
+
+# struct-of-arrays view of a parsed layout, polygons grouped by layer
+@dataclass
+class LayoutArrays:
+    canvas_width: float
+    canvas_height: float
+    start_x: float
+    start_y: float
+    layer_maps: dict[str, str]
+    layers: list[str]
+    # polygon ranges per layer: layer i owns rows offsets[i]:offsets[i + 1]
+    layer_offsets: np.ndarray
+    # (N,) int32 layer index per polygon
+    polygon_layers: np.ndarray
+    # (N,) int64 index of each row in LayoutData.polygons
+    polygon_order: np.ndarray
+    # (N, 4) float64 x0, y0, x1, y1
+    polygon_coords: np.ndarray
+    # (L,) int32 layer index per label
+    label_layers: np.ndarray
+    # (L, 2) float64 x, y
+    label_coords: np.ndarray
+    label_texts: list[str]
+
+    @classmethod
+    def from_layout(cls, layout: LayoutData) -> LayoutArrays:
+        return cls.from_columns(
+            layout.canvas_width,
+            layout.canvas_height,
+            layout.start_x,
+            layout.start_y,
+            layout.layer_maps,
+            [polygon.layer for polygon in layout.polygons],
+            [(p.x0, p.y0, p.x1, p.y1) for p in layout.polygons],
+            [label.layer for label in layout.labels],
+            [(label.x, label.y) for label in layout.labels],
+            [label.text for label in layout.labels],
+        )
+
+    # build from per-polygon and per-label columns in document order, such as
+    # those of the raw parsed data when the models are not needed
+    @classmethod
+    def from_columns(
+        cls,
+        canvas_width: float,
+        canvas_height: float,
+        start_x: float,
+        start_y: float,
+        layer_maps: dict[str, str],
+        polygon_layer_names: list[str],
+        polygon_rows: list[tuple[float, float, float, float]],
+        label_layer_names: list[str],
+        label_rows: list[tuple[float, float]],
+        label_texts: list[str],
+    ) -> LayoutArrays:
+        # layer dictionary in first-seen order, polygons before labels
+        layer_index: dict[str, int] = {}
+        for layer in polygon_layer_names:
+            layer_index.setdefault(layer, len(layer_index))
+        for layer in label_layer_names:
+            layer_index.setdefault(layer, len(layer_index))
+
+        polygon_layers = np.fromiter(
+            (layer_index[layer] for layer in polygon_layer_names),
+            dtype=np.int32,
+            count=len(polygon_layer_names),
+        )
+        polygon_coords = np.array(polygon_rows, dtype=np.float64).reshape(-1, 4)
+
+        # stable sort keeps the original draw order within each layer
+        order = np.argsort(polygon_layers, kind="stable")
+        polygon_layers = polygon_layers[order]
+        polygon_coords = polygon_coords[order]
+        counts = np.bincount(polygon_layers, minlength=len(layer_index))
+        layer_offsets = np.zeros(len(layer_index) + 1, dtype=np.int64)
+        np.cumsum(counts, out=layer_offsets[1:])
+
+        label_layers = np.fromiter(
+            (layer_index[layer] for layer in label_layer_names),
+            dtype=np.int32,
+            count=len(label_layer_names),
+        )
+        label_coords = np.array(label_rows, dtype=np.float64).reshape(-1, 2)
+
+        return cls(
+            canvas_width=canvas_width,
+            canvas_height=canvas_height,
+            start_x=start_x,
+            start_y=start_y,
+            layer_maps=dict(layer_maps),
+            layers=list(layer_index),
+            layer_offsets=layer_offsets,
+            polygon_layers=polygon_layers,
+            polygon_order=order.astype(np.int64),
+            polygon_coords=polygon_coords,
+            label_layers=label_layers,
+            label_coords=label_coords,
+            label_texts=list(label_texts),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.layer_offsets.nbytes
+            + self.polygon_layers.nbytes
+            + self.polygon_order.nbytes
+            + self.polygon_coords.nbytes
+            + self.label_layers.nbytes
+            + self.label_coords.nbytes
+        )
+
+    # indices of the given layer names in the layer dictionary, unknown names skipped
+    def layer_ids(self, layers: list[str]) -> list[int]:
+        lookup = {name: i for i, name in enumerate(self.layers)}
+        return [lookup[name] for name in layers if name in lookup]
+
+    def layer_slice(self, layer: str) -> slice:
+        index = self.layers.index(layer)
+        return slice(int(self.layer_offsets[index]), int(self.layer_offsets[index + 1]))
+
+    # polygon rows as (x0, y0, x1, y1) boxes with x0 <= x1 and y0 <= y1
+    def polygon_boxes(self, rows: slice | np.ndarray = slice(None)) -> np.ndarray:
+        x0, y0, x1, y1 = self.polygon_coords[rows].T
+        return np.column_stack(
+            (
+                np.minimum(x0, x1),
+                np.minimum(y0, y1),
+                np.maximum(x0, x1),
+                np.maximum(y0, y1),
+            )
+        )
+
+    def to_binary(self) -> bytes:
+        offsets = self.layer_offsets.tolist()
+        metadata = {
+            "canvas_width": self.canvas_width,
+            "canvas_height": self.canvas_height,
+            "start_x": self.start_x,
+            "start_y": self.start_y,
+            "layer_maps": self.layer_maps,
+            "layers": [
+                {
+                    "name": name,
+                    "offset": offsets[i],
+                    "count": offsets[i + 1] - offsets[i],
+                }
+                for i, name in enumerate(self.layers)
+            ],
+            "label_layers": self.label_layers.tolist(),
+            "label_texts": self.label_texts,
+        }
+        meta_bytes = json.dumps(metadata, separators=(",", ":")).encode()
+        meta_bytes += b" " * (-(_HEADER.size + len(meta_bytes)) % 4)
+
+        header = _HEADER.pack(
+            BINARY_MAGIC,
+            BINARY_VERSION,
+            len(meta_bytes),
+            len(self.polygon_coords),
+            len(self.label_coords),
+        )
+        return b"".join(
+            (
+                header,
+                meta_bytes,
+                self.polygon_coords.astype("<f4").tobytes(),
+                self.label_coords.astype("<f4").tobytes(),
+            )
+        )
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+from dataclasses import dataclass
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is served instead
+    brotli = None
+
+from ..models import InstancedLayout, LayoutData
+
+# bodies are compressed once per completed layout, so favour size over speed
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+# data class to store the serialized JSON of a layout in every encoding served
+@dataclass
+class LayoutBody:
+    etag: str
+    identity: bytes
+    gzip: bytes
+    brotli: bytes | None = None
+
+    @classmethod
+    def from_layout(cls, layout: LayoutData | InstancedLayout) -> LayoutBody:
+        return cls.from_json(layout.model_dump_json().encode())
+
+    @classmethod
+    def from_json(cls, identity: bytes) -> LayoutBody:
+        digest = hashlib.sha256(identity).hexdigest()[:32]
+        return cls(
+            etag=f'"{digest}"',
+            identity=identity,
+            gzip=gzip.compress(identity, compresslevel=GZIP_LEVEL, mtime=0),
+            brotli=(
+                brotli.compress(identity, quality=BROTLI_QUALITY) if brotli else None
+            ),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.identity) + len(self.gzip) + len(self.brotli or b"")
+
+    # return the smallest body the client accepts and its Content-Encoding
+    def encode(self, accept_encoding: str) -> tuple[bytes, str | None]:
+        accepted = _accepted_encodings(accept_encoding)
+        if self.brotli is not None and "br" in accepted:
+            return self.brotli, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+    # whether an If-None-Match header names this body's ETag
+    def matches(self, if_none_match: str) -> bool:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+# codings listed in an Accept-Encoding header without q=0
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = params.strip().removeprefix("q=")
+        if params and quality.replace(".", "", 1).isdigit() and float(quality) == 0:
+            continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    if "*" in accepted:
+        accepted.update({"br", "gzip"})
+    return accepted
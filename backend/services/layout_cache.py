@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from ..models import Label, LayoutData, Polygon
+
+# rough in-memory cost of one parsed pydantic model, measured on data/data.txt
+_POLYGON_BYTES = 1024
+_LABEL_BYTES = 512
+
+SNAPSHOT_SUFFIX = ".cache.npz"
+SNAPSHOT_VERSION = 1
+
+
+# data class to store a parsed layout and the products derived from it
+@dataclass
+class CacheEntry:
+    mtime: float
+    size: int
+    # None until the raw parsed data is first needed as validated models
+    layout: LayoutData | None
+    derived: dict[str, Any] = field(default_factory=dict)
+    nbytes: int = 0
+    data: dict[str, Any] | None = None
+    # content hash to write the snapshot under once the models are built
+    digest: str | None = None
+
+
+def estimate_nbytes(value: Any) -> int:
+    if isinstance(value, LayoutData):
+        return len(value.polygons) * _POLYGON_BYTES + len(value.labels) * _LABEL_BYTES
+    if isinstance(value, CacheEntry):
+        if value.layout is not None:
+            return estimate_nbytes(value.layout)
+        data = value.data or {}
+        polygons = len(data.get("polygons") or ())
+        return polygons * _POLYGON_BYTES + len(data.get("labels") or ()) * _LABEL_BYTES
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return int(getattr(value, "nbytes", 0))
+
+
+# LRU of parsed layouts bounded by an approximate byte budget
+class LayoutCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Path, CacheEntry] = OrderedDict()
+
+    def get(self, path: Path, stat: os.stat_result) -> CacheEntry | None:
+        entry = self._entries.get(path)
+        if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+            self.hits += 1
+            self._entries.move_to_end(path)
+            return entry
+        self.misses += 1
+        if entry:
+            self._discard(path)
+        return None
+
+    def put(self, path: Path, entry: CacheEntry) -> None:
+        self._discard(path)
+        entry.nbytes = estimate_nbytes(entry)
+        self._entries[path] = entry
+        self.nbytes += entry.nbytes
+        self._evict()
+
+    # account for a derived product added to an entry after it was cached
+    def grow(self, path: Path, entry: CacheEntry, value: Any) -> None:
+        added = estimate_nbytes(value)
+        entry.nbytes += added
+        if self._entries.get(path) is entry:
+            self.nbytes += added
+            self._evict()
+
+    # drop a derived product that was superseded, such as an older overlay
+    def discard(self, path: Path, entry: CacheEntry, key: str) -> None:
+        value = entry.derived.pop(key, None)
+        if value is None:
+            return
+        removed = estimate_nbytes(value)
+        entry.nbytes -= removed
+        if self._entries.get(path) is entry:
+            self.nbytes -= removed
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _discard(self, path: Path) -> None:
+        entry = self._entries.pop(path, None)
+        if entry:
+            self.nbytes -= entry.nbytes
+
+    # drop least recently used entries, always keeping the newest one
+    def _evict(self) -> None:
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.nbytes -= entry.nbytes
+            self.evictions += 1
+
+
+def snapshot_path(path: Path) -> Path:
+    return path.with_name(path.name + SNAPSHOT_SUFFIX)
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+# content_hash of a file too large to hold in memory, read in chunks
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as handle:
+        return hashlib.file_digest(handle, "sha256").hexdigest()
+
+
+# load the sidecar snapshot of a layout file if it matches size, mtime and hash
+def load_snapshot(path: Path, stat: os.stat_result, digest: str) -> LayoutData | None:
+    sidecar = snapshot_path(path)
+    try:
+        with np.load(sidecar, allow_pickle=False) as snapshot:
+            meta = json.loads(snapshot["meta"].tobytes())
+            if (
+                meta.get("version") != SNAPSHOT_VERSION
+                or meta.get("size") != stat.st_size
+                or meta.get("mtime") != stat.st_mtime
+                or meta.get("sha256") != digest
+            ):
+                return None
+            polygon_layers = snapshot["polygon_layers"].tolist()
+            polygon_coords = snapshot["polygon_coords"].tolist()
+            label_layers = snapshot["label_layers"].tolist()
+            label_coords = snapshot["label_coords"].tolist()
+    except (OSError, KeyError, ValueError):
+        return None
+
+    # the snapshot was written from validated models, skip re-validation
+    layers = meta["layers"]
+    polygons = [
+        Polygon.model_construct(
+            layer=layers[layer], x0=x0, y0=y0, x1=x1, y1=y1, width=w, height=h
+        )
+        for layer, (x0, y0, x1, y1, w, h) in zip(polygon_layers, polygon_coords)
+    ]
+    labels = [
+        Label.model_construct(layer=layers[layer], x=x, y=y, text=text)
+        for layer, (x, y), text in zip(label_layers, label_coords, meta["label_texts"])
+    ]
+    return LayoutData.model_construct(
+        canvas_width=meta["canvas_width"],
+        canvas_height=meta["canvas_height"],
+        start_x=meta["start_x"],
+        start_y=meta["start_y"],
+        layer_maps=meta["layer_maps"],
+        polygons=polygons,
+        labels=labels,
+    )
+
+
+# write the sidecar snapshot atomically, a failed write only costs a re-parse
+def write_snapshot(
+    path: Path, stat: os.stat_result, digest: str, layout: LayoutData
+) -> None:
+    layer_index: dict[str, int] = {}
+    polygon_layers = [
+        layer_index.setdefault(polygon.layer, len(layer_index))
+        for polygon in layout.polygons
+    ]
+    label_layers = [
+        layer_index.setdefault(label.layer, len(layer_index)) for label in layout.labels
+    ]
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": digest,
+        "canvas_width": layout.canvas_width,
+        "canvas_height": layout.canvas_height,
+        "start_x": layout.start_x,
+        "start_y": layout.start_y,
+        "layer_maps": layout.layer_maps,
+        "layers": list(layer_index),
+        "label_texts": [label.text for label in layout.labels],
+    }
+    arrays = {
+        "meta": np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        "polygon_layers": np.array(polygon_layers, dtype=np.int32),
+        "polygon_coords": np.array(
+            [(p.x0, p.y0, p.x1, p.y1, p.width, p.height) for p in layout.polygons],
+            dtype=np.float64,
+        ).reshape(-1, 6),
+        "label_layers": np.array(label_layers, dtype=np.int32),
+        "label_coords": np.array(
+            [(label.x, label.y) for label in layout.labels], dtype=np.float64
+        ).reshape(-1, 2),
+    }
+
+    sidecar = snapshot_path(path)
+    tmp_path = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as handle:
+            np.savez(handle, **arrays)
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ..models import LayerDiff, LayoutData, LayoutDiff
+from .layout_arrays import LayoutArrays
+
+
+_HASH_SEED = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MULTIPLIER = np.uint64(0xBF58476D1CE4E5B9)
+
+
+# 64-bit hash of each int64 row, mixing one column at a time
+def _row_hashes(keys: np.ndarray) -> np.ndarray:
+    hashes = np.full(len(keys), _HASH_SEED, dtype=np.uint64)
+    for column in keys.T:
+        hashes ^= np.ascontiguousarray(column).view(np.uint64)
+        hashes *= _HASH_MULTIPLIER
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+# occurrence number of each value among equal values, given a sort order
+def _ranks(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+    count = len(values)
+    ranked = values[order]
+    new_run = np.ones(count, dtype=bool)
+    if ranked.ndim > 1:
+        new_run[1:] = np.any(ranked[1:] != ranked[:-1], axis=1)
+    else:
+        new_run[1:] = ranked[1:] != ranked[:-1]
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(count), 0))
+    ranks = np.empty(count, dtype=np.int64)
+    ranks[order] = np.arange(count) - run_start
+    return ranks
+
+
+# sort-merge join on whole rows, exact but several times slower than hashing
+def _match_exact(
+    keys_a: np.ndarray, keys_b: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    ranked = []
+    for keys in (keys_a, keys_b):
+        ranks = _ranks(keys, np.lexsort(keys.T[::-1]))
+        ranked.append(np.column_stack((keys, ranks)))
+    combined = np.vstack(ranked)
+    order = np.lexsort(combined.T[::-1])
+    equal = np.all(combined[order[1:]] == combined[order[:-1]], axis=1)
+    return _pair_masks(order, equal, len(keys_a), len(combined))
+
+
+def _pair_masks(
+    order: np.ndarray, equal: np.ndarray, split: int, count: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # after ranking, rows are unique per side, so equal neighbours are a pair
+    matched = np.zeros(count, dtype=bool)
+    matched[order[:-1][equal]] = True
+    matched[order[1:][equal]] = True
+    return matched[:split], matched[split:]
+
+
+# return masks of the rows of keys_a and keys_b present in both
+def match_rows(
+    keys_a: np.ndarray, keys_b: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    hashes = []
+    for keys in (keys_a, keys_b):
+        row_hashes = _row_hashes(keys)
+        order = np.argsort(row_hashes)
+        ranks = _ranks(row_hashes, order)
+        # rows sharing a hash on one side must be identical
+        sorted_ranks = ranks[order]
+        positions = np.arange(len(order))
+        first = np.maximum.accumulate(np.where(sorted_ranks == 0, positions, 0))
+        repeated = np.flatnonzero(sorted_ranks)
+        if not np.array_equal(keys[order[repeated]], keys[order[first[repeated]]]):
+            return _match_exact(keys_a, keys_b)
+        hashes.append(_row_hashes(np.column_stack((row_hashes.view(np.int64), ranks))))
+
+    combined = np.concatenate(hashes)
+    order = np.argsort(combined)
+    equal = combined[order[1:]] == combined[order[:-1]]
+    rows = np.vstack((keys_a, keys_b))
+    if not np.array_equal(rows[order[:-1][equal]], rows[order[1:][equal]]):
+        return _match_exact(keys_a, keys_b)
+    return _pair_masks(order, equal, len(keys_a), len(combined))
+
+
+# coordinates compare by their exact float64 bits, with -0.0 folded into 0.0
+def _coordinate_bits(coords: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(coords + 0.0).view(np.int64)
+
+
+def _layer_ids(arrays: LayoutArrays, layers: dict[str, int]) -> np.ndarray:
+    ids = np.array([layers.setdefault(name, len(layers)) for name in arrays.layers])
+    return ids.astype(np.int64).reshape(-1)
+
+
+def _layer_counts(
+    names: list[str],
+    layer_ids: tuple[np.ndarray, np.ndarray],
+    matched: tuple[np.ndarray, np.ndarray],
+) -> dict[str, LayerDiff]:
+    size = len(names)
+    removed = np.bincount(layer_ids[0][~matched[0]], minlength=size)
+    unchanged = np.bincount(layer_ids[0][matched[0]], minlength=size)
+    added = np.bincount(layer_ids[1][~matched[1]], minlength=size)
+    return {
+        name: LayerDiff(
+            added=int(added[i]), removed=int(removed[i]), unchanged=int(unchanged[i])
+        )
+        for i, name in enumerate(names)
+        if added[i] or removed[i] or unchanged[i]
+    }
+
+
+# diff two layouts by exact (layer, rectangle) and (layer, text, x, y)
+def diff_layouts(
+    base: LayoutData,
+    base_arrays: LayoutArrays,
+    target: LayoutData,
+    target_arrays: LayoutArrays,
+) -> LayoutDiff:
+    layers: dict[str, int] = {}
+    base_layers = _layer_ids(base_arrays, layers)
+    target_layers = _layer_ids(target_arrays, layers)
+
+    # polygons, in the arrays' layer-grouped row order
+    polygon_ids = (
+        base_layers[base_arrays.polygon_layers],
+        target_layers[target_arrays.polygon_layers],
+    )
+    polygon_keys = [
+        np.column_stack((ids, _coordinate_bits(arrays.polygon_coords)))
+        for arrays, ids in zip((base_arrays, target_arrays), polygon_ids)
+    ]
+    polygons_matched = match_rows(*polygon_keys)
+
+    # labels, with texts interned to integers shared by both layouts
+    texts: dict[str, int] = {}
+    label_ids = (
+        base_layers[base_arrays.label_layers],
+        target_layers[target_arrays.label_layers],
+    )
+    label_keys = []
+    for arrays, ids in zip((base_arrays, target_arrays), label_ids):
+        text_ids = np.fromiter(
+            (texts.setdefault(text, len(texts)) for text in arrays.label_texts),
+            dtype=np.int64,
+            count=len(arrays.label_texts),
+        )
+        label_keys.append(
+            np.column_stack((ids, text_ids, _coordinate_bits(arrays.label_coords)))
+        )
+    labels_matched = match_rows(*label_keys)
+
+    removed_polygons = np.sort(base_arrays.polygon_order[~polygons_matched[0]])
+    added_polygons = np.sort(target_arrays.polygon_order[~polygons_matched[1]])
+    names = list(layers)
+    return LayoutDiff(
+        canvas_width=target.canvas_width,
+        canvas_height=target.canvas_height,
+        start_x=target.start_x,
+        start_y=target.start_y,
+        layer_maps=target.layer_maps,
+        removed_polygons=removed_polygons.tolist(),
+        removed_labels=np.flatnonzero(~labels_matched[0]).tolist(),
+        added_polygons=[target.polygons[i] for i in added_polygons.tolist()],
+        added_labels=[
+            target.labels[i] for i in np.flatnonzero(~labels_matched[1]).tolist()
+        ],
+        polygon_layers=_layer_counts(names, polygon_ids, polygons_matched),
+        label_layers=_layer_counts(names, label_ids, labels_matched),
+    )
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from ..layout_raster import coverage_counts
+from ..models import DrcReport, DrcRules, DrcViolation
+from .layout_arrays import LayoutArrays
+from .layout_parser import LayoutParser
+from .spatial_index import BoxGrid
+
+# distances within this of a limit pass, coordinates carry float noise
+_TOLERANCE = 1e-9
+
+
+# distinct boxes of one layer, and the polygons drawing each of them
+class _Shapes:
+    def __init__(self, arrays: LayoutArrays, layer: str) -> None:
+        rows = arrays.layer_slice(layer) if layer in arrays.layers else slice(0)
+        boxes = arrays.polygon_boxes(rows)
+        # sorted so that copies of a box are adjacent
+        order = np.lexsort(boxes.T[::-1])
+        boxes = boxes[order]
+        first = np.ones(len(boxes), dtype=bool)
+        first[1:] = np.any(boxes[1:] != boxes[:-1], axis=1)
+        self.boxes = boxes[first]
+        self._polygons = arrays.polygon_order[rows][order]
+        self._offsets = np.append(np.flatnonzero(first), len(boxes))
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def polygons(self, shape: int) -> list[int]:
+        start, end = self._offsets[shape], self._offsets[shape + 1]
+        return sorted(self._polygons[start:end].tolist())
+
+
+# shapes narrower than limit along either side
+def check_width(arrays: LayoutArrays, layer: str, limit: float) -> list[DrcViolation]:
+    shapes = _Shapes(arrays, layer)
+    boxes = shapes.boxes
+    widths = np.minimum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    narrow = np.flatnonzero(widths < limit - _TOLERANCE)
+    return [
+        DrcViolation(
+            rule="width",
+            layer=layer,
+            value=width,
+            limit=limit,
+            bounds=box,
+            polygons=shapes.polygons(shape),
+        )
+        for shape, width, box in zip(
+            narrow.tolist(), widths[narrow].tolist(), boxes[narrow].tolist()
+        )
+    ]
+
+
+# pairs of separate shapes closer than limit, corner to corner
+def check_spacing(
+    arrays: LayoutArrays, layer: str, limit: float
+) -> list[DrcViolation]:
+    shapes = _Shapes(arrays, layer)
+    if not len(shapes):
+        return []
+    boxes = shapes.boxes
+    grown = boxes + np.array([-1, -1, 1, 1]) * limit / 2
+    violations = []
+    for a, b in BoxGrid(grown).pairs():
+        box_a, box_b = boxes[a], boxes[b]
+        # the gap between the shapes, reversed along an axis they overlap on
+        near = np.minimum(box_a[:, 2:], box_b[:, 2:])
+        far = np.maximum(box_a[:, :2], box_b[:, :2])
+        gaps = np.maximum(far - near, 0)
+        distance = np.hypot(gaps[:, 0], gaps[:, 1])
+        close = (distance > _TOLERANCE) & (distance < limit - _TOLERANCE)
+        bounds = np.hstack(
+            (np.minimum(near, far)[close], np.maximum(near, far)[close])
+        )
+        violations += [
+            DrcViolation(
+                rule="spacing",
+                layer=layer,
+                value=value,
+                limit=limit,
+                bounds=gap,
+                polygons=sorted(shapes.polygons(i) + shapes.polygons(j)),
+            )
+            for i, j, value, gap in zip(
+                a[close].tolist(),
+                b[close].tolist(),
+                distance[close].tolist(),
+                bounds.tolist(),
+            )
+        ]
+    return violations
+
+
+# whether the union of boxes covers the target box
+def _covers(target: np.ndarray, boxes: np.ndarray) -> bool:
+    low = np.maximum(boxes[:, :2], target[:2])
+    high = np.minimum(boxes[:, 2:], target[2:])
+    inside = np.all(low < high, axis=1)
+    low, high = low[inside], high[inside]
+    xs = np.unique(np.concatenate((low[:, 0], high[:, 0], target[[0, 2]])))
+    ys = np.unique(np.concatenate((low[:, 1], high[:, 1], target[[1, 3]])))
+    c0, c1 = np.searchsorted(xs, low[:, 0]), np.searchsorted(xs, high[:, 0])
+    r0, r1 = np.searchsorted(ys, low[:, 1]), np.searchsorted(ys, high[:, 1])
+    return bool(coverage_counts(r0, c0, r1, c1, len(ys) - 1, len(xs) - 1).all())
+
+
+# vias not covered by metal up to limit past each side
+def check_enclosure(
+    arrays: LayoutArrays, via: str, metal: str, limit: float
+) -> list[DrcViolation]:
+    vias, metals = _Shapes(arrays, via), _Shapes(arrays, metal)
+    best = np.full(len(vias), -np.inf)
+    candidates = [np.zeros(0, np.int64)] * 2
+    if len(vias) and len(metals):
+        candidates = BoxGrid(metals.boxes).overlapping(vias.boxes)
+        via_boxes, metal_boxes = vias.boxes[candidates[0]], metals.boxes[candidates[1]]
+        margins = np.minimum(
+            via_boxes[:, :2] - metal_boxes[:, :2], metal_boxes[:, 2:] - via_boxes[:, 2:]
+        ).min(axis=1)
+        np.maximum.at(best, candidates[0], margins)
+
+    order = np.argsort(candidates[0], kind="stable")
+    touching, metal_ids = candidates[0][order], candidates[1][order]
+    grow = np.array([-1, -1, 1, 1]) * limit
+    violations = []
+    for shape in np.flatnonzero(best < limit - _TOLERANCE).tolist():
+        start, end = np.searchsorted(touching, [shape, shape + 1])
+        target = vias.boxes[shape] + grow
+        if end > start and _covers(target, metals.boxes[metal_ids[start:end]]):
+            continue
+        violations.append(
+            DrcViolation(
+                rule="enclosure",
+                layer=via,
+                other_layer=metal,
+                value=max(float(best[shape]), 0.0),
+                limit=limit,
+                bounds=vias.boxes[shape].tolist(),
+                polygons=vias.polygons(shape),
+            )
+        )
+    return violations
+
+
+# design rule checks of parsed layouts
+class LayoutChecker:
+    def __init__(self, rules: DrcRules, parser: LayoutParser) -> None:
+        self.rules = rules
+        self.parser = parser
+
+    # (name, check) of each rule, in the order of the rules file
+    def _checks(
+        self, arrays: LayoutArrays
+    ) -> list[tuple[str, Callable[[], list[DrcViolation]]]]:
+        rules = self.rules
+        checks = [
+            (f"width:{layer}", partial(check_width, arrays, layer, limit))
+            for layer, limit in rules.width.items()
+        ]
+        checks += [
+            (f"spacing:{layer}", partial(check_spacing, arrays, layer, limit))
+            for layer, limit in rules.spacing.items()
+        ]
+        checks += [
+            (
+                f"enclosure:{via}:{metal}",
+                partial(check_enclosure, arrays, via, metal, limit),
+            )
+            for via, metals in rules.enclosure.items()
+            for metal, limit in metals.items()
+        ]
+        return checks
+
+    def checked_layers(self) -> set[str]:
+        rules = self.rules
+        enclosed = {metal for metals in rules.enclosure.values() for metal in metals}
+        return {*rules.width, *rules.spacing, *rules.enclosure, *enclosed}
+
+    # check a layout file, handing each rule's violations to publish
+    async def check(
+        self,
+        path: Path,
+        publish: Callable[[list[DrcViolation]], None] | None = None,
+    ) -> DrcReport:
+        arrays = await self.parser.parse_layout_arrays(path)
+        start = time.perf_counter()
+        counts: dict[str, int] = {}
+        violations: list[DrcViolation] = []
+        for name, check in self._checks(arrays):
+            found = await asyncio.to_thread(check)
+            counts[name] = len(found)
+            violations += found
+            if found and publish:
+                publish(found)
+        elapsed = time.perf_counter() - start
+
+        offsets = arrays.layer_offsets
+        polygons = sum(
+            int(offsets[i + 1] - offsets[i])
+            for i in arrays.layer_ids(sorted(self.checked_layers()))
+        )
+        return DrcReport(
+            counts=counts,
+            polygons=polygons,
+            seconds=elapsed,
+            polygons_per_second=polygons / elapsed if elapsed > 0 else 0.0,
+            violations=violations,
+        )
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ..models import InstanceGroup, InstancedLayout, Label, LayoutData, Polygon
+from .layout_arrays import LayoutArrays
+
+# coordinates are stored as integer multiples of this, 1 pm for a layout in um
+RESOLUTION = 1e-6
+# translation sets tried on groups drawn many times per instance of another
+_MAX_SOURCES = 16
+# positions scanned while splitting classes, per polygon of the layout, and
+# the least charged for one try
+_SPLIT_WORK = 4
+_MIN_WORK = 1024
+# offsets checked on every position before the full translation set
+_SAMPLED_OFFSETS = 3
+
+
+# 64-bit mix of integer values, wrapping on overflow
+def _mix(values: np.ndarray) -> np.ndarray:
+    mixed = values.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    mixed ^= mixed >> np.uint64(31)
+    mixed *= np.uint64(0xBF58476D1CE4E5B9)
+    return mixed ^ (mixed >> np.uint64(29))
+
+
+# rectangles grouped by layer and size, with the positions of each
+class _Classes:
+    def __init__(self, layers: np.ndarray, boxes: np.ndarray) -> None:
+        sizes = boxes[:, 2:] - boxes[:, :2]
+        order = np.lexsort((boxes[:, 1], boxes[:, 0], sizes[:, 1], sizes[:, 0], layers))
+        layers, sizes, self.positions = layers[order], sizes[order], boxes[order, :2]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = np.any(sizes[1:] != sizes[:-1], axis=1)
+        first[1:] |= layers[1:] != layers[:-1]
+        self.layers, self.sizes = layers[first], sizes[first]
+        self.starts = np.append(np.flatnonzero(first), len(order))
+        self.counts = np.diff(self.starts)
+        self.class_of = np.repeat(np.arange(len(self.counts)), self.counts)
+        self.relative = self.positions - self.positions[self.starts[self.class_of]]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def rows(self, shape_class: int) -> slice:
+        return slice(self.starts[shape_class], self.starts[shape_class + 1])
+
+    # group of each class, shared by classes drawn at the same offsets
+    def signatures(self) -> np.ndarray:
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        hashes = np.add.reduceat(
+            _mix(self.relative[:, 0]) ^ _mix(self.relative[:, 1] + 1), self.starts[:-1]
+        )
+        hashes ^= _mix(self.counts)
+        _, first, groups = np.unique(hashes, return_index=True, return_inverse=True)
+
+        representative = first[groups]
+        rank = np.arange(len(self.relative)) - self.starts[self.class_of]
+        reference = self.starts[representative][self.class_of] + rank
+        reference = np.minimum(reference, len(self.relative) - 1)
+        same = np.all(self.relative == self.relative[reference], axis=1)
+        differs = ~np.logical_and.reduceat(same, self.starts[:-1])
+        differs = np.flatnonzero(differs | (self.counts != self.counts[representative]))
+        groups[differs] = len(first) + np.arange(len(differs))
+        return groups
+
+    # positions q such that the class is exactly q + translations
+    def split(self, shape_class: int, translations: np.ndarray) -> np.ndarray | None:
+        positions = self.positions[self.rows(shape_class)]
+        # positions as single keys within the class's bounding box
+        low = positions.min(axis=0)
+        span = positions.max(axis=0) - low + 1
+        if span[0] * span[1] >= 1 << 62:
+            return None
+        keys = np.sort((positions[:, 0] - low[0]) * span[1] + positions[:, 1] - low[1])
+
+        # key of each point, -1 outside of the box
+        def key_of(points: np.ndarray) -> np.ndarray:
+            moved = points - low
+            inside = np.all((moved >= 0) & (moved < span), axis=-1)
+            return np.where(inside, moved[..., 0] * span[1] + moved[..., 1], -1)
+
+        candidates = positions
+        samples = np.linspace(1, len(translations) - 1, _SAMPLED_OFFSETS).astype(int)
+        for offset in translations[np.unique(samples)]:
+            wanted = key_of(candidates + offset)
+            at = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+            candidates = candidates[keys[at] == wanted]
+        if len(candidates) * len(translations) != len(positions):
+            return None
+        covered = np.sort(key_of(candidates[:, None] + translations[None]), axis=None)
+        return candidates if np.array_equal(covered, keys) else None
+
+
+# store each repeated rectangle once, with the offsets of its copies;
+# coordinates are rounded to RESOLUTION and the draw order within a layer is
+# not kept
+def instance_layout(arrays: LayoutArrays) -> InstancedLayout:
+    boxes = np.round(arrays.polygon_boxes() / RESOLUTION).astype(np.int64)
+    classes = _Classes(arrays.polygon_layers.astype(np.int64), boxes)
+    groups = classes.signatures()
+    members = np.bincount(groups)
+    # first class of each group, written last to first so the first one wins
+    leaders = np.zeros(len(members), dtype=np.int64)
+    leaders[groups[::-1]] = np.arange(len(groups))[::-1]
+    leaders = leaders[members > 0]
+    leader_of = dict(zip(groups[leaders].tolist(), leaders.tolist()))
+
+    # the offsets of the repeated groups with the most classes, like cells,
+    # are tried on the other groups, most instances first, within a budget of
+    # positions scanned
+    repeated = leaders[classes.counts[leaders] > 1]
+    ranks = np.lexsort((-classes.counts[repeated], -members[groups[repeated]]))
+    sources = repeated[ranks[:_MAX_SOURCES]].tolist()
+    targets = repeated[np.argsort(-classes.counts[repeated], kind="stable")]
+    budget = _SPLIT_WORK * len(boxes)
+    anchors: dict[int, np.ndarray] = {}
+    # leaders of split groups and the source each joined, which stays put
+    moved: dict[int, int] = {}
+    for leader in targets.tolist():
+        if budget <= 0:
+            break
+        if leader in moved.values():
+            continue
+        count, size = int(classes.counts[leader]), int(members[groups[leader]])
+        for source in sources:
+            tiles = int(classes.counts[source])
+            if count % tiles or source in moved or tiles >= count:
+                continue
+            # five numbers per shape against two per offset
+            if 5 * size * count // tiles >= 5 * size + 2 * count:
+                continue
+            budget -= max(count, _MIN_WORK)
+            found = classes.split(leader, classes.relative[classes.rows(source)])
+            if found is not None:
+                moved[leader] = source
+                anchors[leader] = found
+                break
+
+    # members of a split group move with its leader
+    for shape_class in np.flatnonzero(np.isin(groups, groups[list(moved)])).tolist():
+        leader = leader_of[int(groups[shape_class])]
+        shift = classes.positions[classes.starts[shape_class]]
+        anchors[shape_class] = anchors[leader] - anchors[leader][0] + shift
+    for leader, source in moved.items():
+        groups[groups == groups[leader]] = groups[source]
+
+    # one shape per class at its first position, or per anchor when split
+    split = np.fromiter(anchors, dtype=np.int64, count=len(anchors))
+    is_split = np.zeros(len(classes), dtype=bool)
+    is_split[split] = True
+    plain = np.flatnonzero(~is_split)
+    shape_classes = np.concatenate(
+        [plain, *(np.full(len(anchors[c]), c) for c in split.tolist())]
+    ).astype(np.int64)
+    corners = np.concatenate(
+        [classes.positions[classes.starts[plain]], *anchors.values()]
+    ).reshape(-1, 2)
+    shapes = np.column_stack(
+        (
+            classes.layers[shape_classes],
+            corners,
+            corners + classes.sizes[shape_classes],
+        )
+    )
+    shape_groups = groups[shape_classes]
+    order = np.argsort(shape_groups, kind="stable")
+    shape_groups, shapes = shape_groups[order], shapes[order]
+    bounds = np.flatnonzero(np.diff(shape_groups, prepend=-1, append=-1))
+    starts, ends = bounds[:-1].tolist(), bounds[1:].tolist()
+    built = [
+        InstanceGroup.model_construct(
+            shapes=shapes[start:end].tolist(),
+            offsets=classes.relative[classes.rows(leader_of[group])].tolist(),
+        )
+        for group, start, end in zip(shape_groups[bounds[:-1]].tolist(), starts, ends)
+    ]
+
+    labels = [
+        Label.model_construct(layer=arrays.layers[layer], x=x, y=y, text=text)
+        for layer, (x, y), text in zip(
+            arrays.label_layers.tolist(),
+            arrays.label_coords.tolist(),
+            arrays.label_texts,
+        )
+    ]
+    ordered = sorted(built, key=lambda group: -len(group.offsets))
+    return InstancedLayout.model_construct(
+        canvas_width=arrays.canvas_width,
+        canvas_height=arrays.canvas_height,
+        start_x=arrays.start_x,
+        start_y=arrays.start_y,
+        layer_maps=arrays.layer_maps,
+        resolution=RESOLUTION,
+        layers=arrays.layers,
+        groups=ordered,
+        labels=labels,
+        polygons=len(boxes),
+        shapes=len(shapes),
+    )
+
+
+# the plain layout drawn by an instanced one, for clients without groups
+def expand_instances(layout: InstancedLayout) -> LayoutData:
+    # dividing by the integer units per um gives back 0.34 where multiplying
+    # by the resolution gives 0.33999999999999997
+    units = round(1 / layout.resolution)
+    polygons = [
+        Polygon.model_construct(
+            layer=layout.layers[layer],
+            x0=(x0 + dx) / units,
+            y0=(y0 + dy) / units,
+            x1=(x1 + dx) / units,
+            y1=(y1 + dy) / units,
+            width=(x1 - x0) / units,
+            height=(y1 - y0) / units,
+        )
+        for group in layout.groups
+        for dx, dy in group.offsets
+        for layer, x0, y0, x1, y1 in group.shapes
+    ]
+    return LayoutData.model_construct(
+        canvas_width=layout.canvas_width,
+        canvas_height=layout.canvas_height,
+        start_x=layout.start_x,
+        start_y=layout.start_y,
+        layer_maps=layout.layer_maps,
+        polygons=polygons,
+        labels=layout.labels,
+    )
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import re
+
+import numpy as np
+
+from ..models import Net, NetHighlight, NetList
+from .spatial_index import BoxGrid, LayoutIndex
+
+_METAL = re.compile(r"metal\s*(\d+)", re.IGNORECASE)
+_VIA = re.compile(r"via\s*(\d+)", re.IGNORECASE)
+
+
+# number of each metal and via layer, bottom up
+def conductor_stack(
+    layer_maps: dict[str, str], layers: list[str]
+) -> tuple[dict[str, int], dict[str, int]]:
+    names = list(dict.fromkeys([*layer_maps, *layers]))
+    return _numbered(_METAL, names), _numbered(_VIA, names)
+
+
+def _numbered(pattern: re.Pattern[str], names: list[str]) -> dict[str, int]:
+    matches = ((name, pattern.fullmatch(name)) for name in names)
+    numbers = {name: int(match.group(1)) for name, match in matches if match}
+    return dict(sorted(numbers.items(), key=lambda item: item[1]))
+
+
+# one copy of each (layer, box) row, and the copy of every input row
+def _dedupe(
+    layers: np.ndarray, boxes: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    order = np.lexsort((*boxes.T[::-1], layers))
+    layers, boxes = layers[order], boxes[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (layers[1:] != layers[:-1]) | np.any(boxes[1:] != boxes[:-1], axis=1)
+    copies = np.empty(len(order), dtype=np.int64)
+    copies[order] = np.cumsum(first) - 1
+    return layers[first], boxes[first], copies
+
+
+# smallest member of the connected component of each of count nodes
+def _components(count: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    parent = np.arange(count)
+    while len(a):
+        root_a, root_b = parent[a], parent[b]
+        low, high = np.minimum(root_a, root_b), np.maximum(root_a, root_b)
+        linked = low != high
+        a, b = a[linked], b[linked]
+        np.minimum.at(parent, high[linked], low[linked])
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+# electrical nets of one layout
+class LayoutNets:
+    def __init__(self, index: LayoutIndex) -> None:
+        self.index = index
+        arrays = self.arrays = index.arrays
+        metals, vias = conductor_stack(arrays.layer_maps, arrays.layers)
+        layer_ids = {name: i for i, name in enumerate(arrays.layers)}
+
+        # stack position of each layer, -1 for non-conductors
+        self._rank = np.full(len(arrays.layers), -1)
+        connects = np.zeros((len(arrays.layers),) * 2, dtype=bool)
+        for metal, level in metals.items():
+            if metal in layer_ids:
+                self._rank[layer_ids[metal]] = 2 * level
+                connects[layer_ids[metal], layer_ids[metal]] = True
+        for via, level in vias.items():
+            if via not in layer_ids:
+                continue
+            via_id = layer_ids[via]
+            self._rank[via_id] = 2 * level + 1
+            connects[via_id, via_id] = True
+            for metal, metal_level in metals.items():
+                if metal in layer_ids and metal_level in (level, level + 1):
+                    connects[via_id, layer_ids[metal]] = True
+                    connects[layer_ids[metal], via_id] = True
+
+        # identical shapes are one node
+        rows = np.flatnonzero(self._rank[arrays.polygon_layers] >= 0)
+        boxes = arrays.polygon_boxes(rows)
+        layers, boxes, copies = _dedupe(arrays.polygon_layers[rows], boxes)
+
+        roots = np.arange(len(boxes))
+        grid = None
+        if len(boxes):
+            grid = BoxGrid(boxes)
+            edges = [
+                (a[keep], b[keep])
+                for a, b in grid.pairs()
+                for keep in [connects[layers[a], layers[b]]]
+            ]
+            roots = _components(
+                len(boxes),
+                np.concatenate([a for a, _ in edges] or [np.zeros(0, np.int64)]),
+                np.concatenate([b for _, b in edges] or [np.zeros(0, np.int64)]),
+            )
+
+        # nets numbered by their first polygon in document order
+        row_roots = roots[copies]
+        firsts = np.full(len(boxes), np.iinfo(np.int64).max)
+        np.minimum.at(firsts, row_roots, arrays.polygon_order[rows])
+        components = np.flatnonzero(firsts < np.iinfo(np.int64).max)
+        components = components[np.argsort(firsts[components])]
+        net_of_root = np.full(len(boxes), -1)
+        net_of_root[components] = np.arange(len(components))
+
+        # net of each arrays row, -1 off the conductor layers
+        self.polygon_nets = np.full(len(arrays.polygon_layers), -1)
+        self.polygon_nets[rows] = net_of_root[row_roots]
+        self.net_count = len(components)
+        self._rows = rows[np.argsort(self.polygon_nets[rows], kind="stable")]
+        self._offsets = np.searchsorted(
+            self.polygon_nets[self._rows], np.arange(self.net_count + 1)
+        )
+        self._labels = self._label_nets(grid, layers, boxes, net_of_root[roots])
+        self._body: bytes | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.polygon_nets.nbytes + self._rows.nbytes + len(self._body or b"")
+
+    # label texts of each net, from labels lying on a shape of their layer
+    def _label_nets(
+        self,
+        grid: BoxGrid | None,
+        layers: np.ndarray,
+        boxes: np.ndarray,
+        box_nets: np.ndarray,
+    ) -> list[list[str]]:
+        names: list[list[str]] = [[] for _ in range(self.net_count)]
+        if grid is None or not len(self.arrays.label_coords):
+            return names
+        points = np.hstack((self.arrays.label_coords, self.arrays.label_coords))
+        point, box = grid.overlapping(points)
+        same_layer = layers[box] == self.arrays.label_layers[point]
+        point, box = point[same_layer], box[same_layer]
+        # one net per label, labels in document order
+        point, first = np.unique(point, return_index=True)
+        for label, net in zip(point.tolist(), box_nets[box[first]].tolist()):
+            text = self.arrays.label_texts[label]
+            if text not in names[net]:
+                names[net].append(text)
+        return names
+
+    def net(self, net_id: int) -> Net:
+        rows = self._rows[self._offsets[net_id] : self._offsets[net_id + 1]]
+        coords = self.arrays.polygon_coords[rows]
+        xs, ys = coords[:, [0, 2]], coords[:, [1, 3]]
+        layers = np.unique(self.arrays.polygon_layers[rows])
+        labels = self._labels[net_id]
+        return Net(
+            id=net_id,
+            name=labels[0] if labels else f"net{net_id}",
+            labels=labels,
+            polygons=len(rows),
+            layers=[self.arrays.layers[i] for i in layers.tolist()],
+            bounds=[xs.min(), ys.min(), xs.max(), ys.max()],
+        )
+
+    def to_json(self) -> bytes:
+        if self._body is None:
+            nets = [self.net(net_id) for net_id in range(self.net_count)]
+            self._body = NetList(nets=nets).model_dump_json().encode()
+        return self._body
+
+    def highlight(self, net_id: int) -> NetHighlight:
+        rows = self._rows[self._offsets[net_id] : self._offsets[net_id + 1]]
+        return NetHighlight(
+            net=self.net(net_id),
+            polygons=np.sort(self.arrays.polygon_order[rows]).tolist(),
+        )
+
+    # net of the topmost conductor at a point, among layers if given
+    def net_at(
+        self, x: float, y: float, layers: list[str] | None = None
+    ) -> NetHighlight | None:
+        rows = self.index.polygons.query(x, y, x, y)
+        rows = rows[self.polygon_nets[rows] >= 0]
+        if layers is not None:
+            layer_ids = self.arrays.layer_ids(layers)
+            rows = rows[np.isin(self.arrays.polygon_layers[rows], layer_ids)]
+        if not len(rows):
+            return None
+        top = rows[np.argmax(self._rank[self.arrays.polygon_layers[rows]])]
+        return self.highlight(int(self.polygon_nets[top]))
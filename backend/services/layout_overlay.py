@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from ..models import LayoutData
+
+
+# merge overlay on top of base, such as routes over cell polygons
+def overlay_layouts(base: LayoutData, overlay: LayoutData) -> LayoutData:
+    x0, y0 = base.start_x, base.start_y
+    x1, y1 = x0 + base.canvas_width, y0 + base.canvas_height
+    if overlay.polygons or overlay.labels:
+        x0 = min(x0, overlay.start_x)
+        y0 = min(y0, overlay.start_y)
+        x1 = max(x1, overlay.start_x + overlay.canvas_width)
+        y1 = max(y1, overlay.start_y + overlay.canvas_height)
+    return LayoutData.model_construct(
+        canvas_width=x1 - x0,
+        canvas_height=y1 - y0,
+        start_x=x0,
+        start_y=y0,
+        layer_maps={**overlay.layer_maps, **base.layer_maps},
+        polygons=[*base.polygons, *overlay.polygons],
+        labels=[*base.labels, *overlay.labels],
+    )
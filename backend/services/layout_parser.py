@@ -1,12 +1,56 @@
 from __future__ import annotations
 
+import asyncio
+import io
+import time
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import aiofiles
 import yaml
+from pydantic_core import to_json
 
+from ..layout_repr import is_repr, is_repr_file, load_layout, read_layout
 from ..models import Label, LayoutData, Polygon
+from .layout_arrays import LayoutArrays
+from .layout_body import LayoutBody
+from .layout_cache import (
+    CacheEntry,
+    LayoutCache,
+    content_hash,
+    file_hash,
+    load_snapshot,
+    write_snapshot,
+)
+from .layout_diff import diff_layouts
+from .layout_instances import instance_layout
+from .layout_nets import LayoutNets
+from .layout_overlay import overlay_layouts
+from .layout_preview import LayoutPreviews
+from .layout_stats import layout_stats, round_window
+from .layout_tiles import LayoutTiles
+from .metrics import MetricsRegistry
+from .spatial_index import LayoutIndex
+
+T = TypeVar("T")
+
+_BOUNDBOX_TAG = "!!python/object:bin.utilities.geometryutils.Boundbox"
+
+# maps the Boundbox attribute names written by the generator to parsed keys
+_BOUNDBOX_FIELDS = {
+    "_Boundbox__x0coord": "x0",
+    "_Boundbox__y0coord": "y0",
+    "_Boundbox__x1coord": "x1",
+    "_Boundbox__y1coord": "y1",
+    "width": "width",
+    "height": "height",
+    "area": "area",
+}
+
+_CANVAS_FIELDS = ("canvas_width", "canvas_height", "start_x", "start_y")
+
+
 # helper function to construct a boundbox from a yaml node
 def _boundbox_constructor(
     loader: yaml.SafeLoader, node: yaml.nodes.MappingNode
@@ -33,24 +77,540 @@ _LayoutLoader.add_constructor(
 )
 
 
+# raised when the fast path meets input outside the generator schema
+class _FastParseError(Exception):
+    pass
+
+
+_STR_TAG = "tag:yaml.org,2002:str"
+_resolver = yaml.resolver.Resolver()
+_plain_scalars: dict[str, bool] = {}
+
+
+# check that yaml would load a plain scalar as the same string, memoized
+# because layer names and label texts repeat across the whole file
+def _plain_str(value: str) -> str:
+    ok = _plain_scalars.get(value)
+    if ok is None:
+        ok = (
+            bool(value)
+            and value == value.strip()
+            and value[0] not in "!&*[]{}|>'\"%@`#,?:-"
+            and ": " not in value
+            and " #" not in value
+            and _resolver.resolve(yaml.ScalarNode, value, (True, False)) == _STR_TAG
+        )
+        _plain_scalars[value] = ok
+    if not ok:
+        raise _FastParseError(f"unsupported scalar: {value!r}")
+    return value
+
+
+# parse a number the way yaml would, rejecting forms such as octal ints
+def _number(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError as exc:
+        raise _FastParseError(f"bad number: {value!r}") from exc
+    digits = value.lstrip("+-")
+    if digits[:1] == "0" and digits[1:2].isdigit():
+        raise _FastParseError(f"bad number: {value!r}")
+    return number
+
+
+# single-pass parser for the exact layout schema the generator writes
+def _fast_parse(content: str) -> dict[str, Any]:
+    data: dict[str, Any] = {}
+    anchors: dict[str, dict[str, Any]] = {}
+    section: str | None = None
+    # the list entry currently being filled, and the boundbox being read
+    entry: list[Any] | None = None
+    boundbox: dict[str, Any] | None = None
+
+    for line in content.splitlines():
+        if not line:
+            continue
+
+        if boundbox is not None and line.startswith("    "):
+            key, sep, value = line[4:].partition(": ")
+            field = _BOUNDBOX_FIELDS.get(key)
+            if not sep or field is None:
+                raise _FastParseError(f"unexpected boundbox line: {line!r}")
+            boundbox[field] = _number(value)
+            continue
+        boundbox = None
+
+        if line.startswith("- - "):
+            if section not in ("polygons", "labels"):
+                raise _FastParseError(f"unexpected list entry: {line!r}")
+            entry = [_plain_str(line[4:])]
+            data[section].append(entry)
+            continue
+
+        if line.startswith("  - "):
+            if entry is None:
+                raise _FastParseError(f"unexpected list item: {line!r}")
+            item = line[4:]
+            if item.startswith("*"):
+                alias = anchors.get(item[1:])
+                if alias is None:
+                    raise _FastParseError(f"unknown alias: {item!r}")
+                entry.append(alias)
+                continue
+            anchor = None
+            if item.startswith("&"):
+                anchor, _, item = item[1:].partition(" ")
+            if item == _BOUNDBOX_TAG:
+                boundbox = {}
+                entry.append(boundbox)
+                if anchor:
+                    anchors[anchor] = boundbox
+                continue
+            if anchor:
+                raise _FastParseError(f"unsupported anchor: {line!r}")
+            entry.append(_plain_str(item))
+            continue
+
+        if line.startswith("  "):
+            if section != "layer_maps" or line[2] == " ":
+                raise _FastParseError(f"unexpected mapping line: {line!r}")
+            key, sep, value = line[2:].partition(": ")
+            if not sep:
+                raise _FastParseError(f"unexpected mapping line: {line!r}")
+            data["layer_maps"][_plain_str(key)] = _plain_str(value)
+            continue
+
+        # top-level key
+        entry = None
+        section = None
+        key, sep, value = line.partition(": ")
+        if not sep:
+            key = line.rstrip()[:-1] if line.rstrip().endswith(":") else None
+        if key in data:
+            raise _FastParseError(f"duplicate key: {key!r}")
+        if sep and key in _CANVAS_FIELDS:
+            data[key] = _number(value)
+        elif not sep and key == "layer_maps":
+            data[key] = {}
+            section = key
+        elif not sep and key in ("polygons", "labels"):
+            data[key] = []
+            section = key
+        else:
+            raise _FastParseError(f"unexpected top-level line: {line!r}")
+
+    # entries must match the shape _to_parsed_layout expects from yaml
+    for key, size in (("polygons", 2), ("labels", 3)):
+        for entry in data.get(key, ()):
+            if (
+                len(entry) != size
+                or not isinstance(entry[1], dict)
+                or len(entry[1]) != len(_BOUNDBOX_FIELDS)
+            ):
+                raise _FastParseError(f"malformed {key} entry")
+    return data
+
+
+# serialize raw parsed data straight to the JSON of its LayoutData
+def _fast_layout_json(data: dict[str, Any]) -> bytes:
+    canvas = {key: data.get(key, 0.0) for key in _CANVAS_FIELDS}
+    layer_maps = data.get("layer_maps", {}) or {}
+    strings: list[Any] = [*layer_maps.keys(), *layer_maps.values()]
+    floats: list[Any] = list(canvas.values())
+
+    polygons = []
+    for entry in data.get("polygons", []) or []:
+        if not entry or len(entry) < 2:
+            continue
+        boundbox = entry[1] or {}
+        values = (
+            boundbox.get("x0"),
+            boundbox.get("y0"),
+            boundbox.get("x1"),
+            boundbox.get("y1"),
+            boundbox.get("width"),
+            boundbox.get("height"),
+        )
+        x0, y0, x1, y1, width, height = values
+        polygons.append(
+            {
+                "layer": entry[0],
+                "x0": x0,
+                "y0": y0,
+                "x1": x1,
+                "y1": y1,
+                "width": width,
+                "height": height,
+            }
+        )
+        strings.append(entry[0])
+        floats.extend(values)
+
+    labels = []
+    for entry in data.get("labels", []) or []:
+        if not entry or len(entry) < 3:
+            continue
+        boundbox = entry[1] or {}
+        x0, y0 = boundbox.get("x0"), boundbox.get("y0")
+        x1, y1 = boundbox.get("x1"), boundbox.get("y1")
+        if x0 is None or y0 is None or x1 is None or y1 is None:
+            continue
+        coords = (x0, y0, x1, y1)
+        if set(map(type, coords)) != {float}:
+            raise _FastParseError("label coordinates need validation")
+        x, y = (x0 + x1) / 2, (y0 + y1) / 2
+        labels.append({"layer": entry[0], "x": x, "y": y, "text": entry[2]})
+        strings.append(entry[0])
+        strings.append(entry[2])
+
+    # checked in bulk, a per-value isinstance would cost as much as validating
+    if set(map(type, floats)) - {float} or set(map(type, strings)) - {str}:
+        raise _FastParseError("values need validation")
+    return to_json(
+        {**canvas, "layer_maps": layer_maps, "polygons": polygons, "labels": labels},
+        inf_nan_mode="null",
+    )
+
+
+# build the LayoutArrays of raw parsed data without its models
+def _fast_layout_arrays(data: dict[str, Any]) -> LayoutArrays:
+    canvas = [data.get(key, 0.0) for key in _CANVAS_FIELDS]
+    layer_maps = data.get("layer_maps", {}) or {}
+    strings: list[Any] = [*layer_maps.keys(), *layer_maps.values()]
+    floats: list[Any] = list(canvas)
+
+    polygon_layers, polygon_rows = [], []
+    for entry in data.get("polygons", []) or []:
+        if not entry or len(entry) < 2:
+            continue
+        boundbox = entry[1] or {}
+        x0, y0 = boundbox.get("x0"), boundbox.get("y0")
+        x1, y1 = boundbox.get("x1"), boundbox.get("y1")
+        polygon_layers.append(entry[0])
+        polygon_rows.append((x0, y0, x1, y1))
+        floats.extend((x0, y0, x1, y1, boundbox.get("width"), boundbox.get("height")))
+
+    label_layers, label_rows, label_texts = [], [], []
+    for entry in data.get("labels", []) or []:
+        if not entry or len(entry) < 3:
+            continue
+        boundbox = entry[1] or {}
+        x0, y0 = boundbox.get("x0"), boundbox.get("y0")
+        x1, y1 = boundbox.get("x1"), boundbox.get("y1")
+        if x0 is None or y0 is None or x1 is None or y1 is None:
+            continue
+        label_layers.append(entry[0])
+        label_rows.append(((x0 + x1) / 2, (y0 + y1) / 2))
+        label_texts.append(entry[2])
+        floats.extend((x0, y0, x1, y1))
+
+    strings += polygon_layers + label_layers + label_texts
+    if set(map(type, floats)) - {float} or set(map(type, strings)) - {str}:
+        raise _FastParseError("values need validation")
+    return LayoutArrays.from_columns(
+        *canvas,
+        layer_maps,
+        polygon_layers,
+        polygon_rows,
+        label_layers,
+        label_rows,
+        label_texts,
+    )
+
+
 class LayoutParser:
-    def __init__(self) -> None:
-        self._cache: dict[Path, tuple[float, LayoutData]] = {}
+    def __init__(
+        self,
+        max_cache_bytes: int = 512 * 1024 * 1024,
+        snapshots: bool = False,
+        metrics: MetricsRegistry | None = None,
+    ) -> None:
+        # memory tier, and an optional on-disk snapshot next to each layout file
+        self._cache = LayoutCache(max_cache_bytes)
+        self.snapshots = snapshots
+        # response bodies being built in a worker thread, awaited by later callers
+        self._building: dict[tuple[Path, float, int], asyncio.Task[LayoutBody]] = {}
+        self.metrics = metrics or MetricsRegistry()
+        self._register_metrics()
+
+    def _register_metrics(self) -> None:
+        metrics, cache = self.metrics, self._cache
+        # files read on cache misses, by how they were loaded
+        self._parse_seconds = metrics.histogram(
+            "layout_parse_seconds",
+            "Time to read and parse a layout file on a cache miss.",
+            ("format",),
+            buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+        )
+        self._parse_bytes = metrics.counter(
+            "layout_parse_bytes_total", "Bytes of layout files parsed.", ("format",)
+        )
+        for name, key, documentation in (
+            ("layout_cache_hits_total", "hits", "Parsed layout cache hits."),
+            ("layout_cache_misses_total", "misses", "Parsed layout cache misses."),
+            ("layout_cache_evictions_total", "evictions", "Layouts evicted."),
+        ):
+            metrics.counter(name, documentation, function=partial(getattr, cache, key))
+        metrics.gauge(
+            "layout_cache_hit_ratio",
+            "Share of parsed layout lookups served from memory.",
+            function=lambda: cache.stats()["hit_ratio"],
+        )
+        metrics.gauge(
+            "layout_cache_entries",
+            "Layouts held by the parse cache.",
+            function=lambda: cache.stats()["entries"],
+        )
+        metrics.gauge(
+            "layout_cache_bytes",
+            "Approximate bytes held by the parse cache.",
+            function=lambda: cache.nbytes,
+        )
 
     async def parse_layout_file(self, path: Path) -> LayoutData:
+        entry = await self._get_entry(path)
+        return self._materialize(path, entry)
+
+    # parse layout text without touching the cache, for synchronous callers
+    def parse_layout_text(self, content: str) -> LayoutData:
+        return self._to_parsed_layout(self._load(content))
+
+    # parse a layout file without touching the cache, such as an upload that is
+    # not yet in place
+    def read_layout_file(self, path: Path) -> LayoutData:
+        if is_repr_file(path):
+            data = load_layout(path)
+        else:
+            data = self._load(path.read_text())
+        if not isinstance(data, dict):
+            raise ValueError("not a layout file")
+        return self._to_parsed_layout(data)
+
+    async def parse_layout_arrays(self, path: Path) -> LayoutArrays:
+        return await self._derived(
+            path, "arrays", lambda entry: self._arrays_of(path, entry)
+        )
+
+    async def parse_layout_binary(self, path: Path) -> bytes:
+        arrays = await self.parse_layout_arrays(path)
+        return await self._derived(path, "binary", lambda _: arrays.to_binary())
+
+    async def parse_layout_index(self, path: Path) -> LayoutIndex:
+        arrays = await self.parse_layout_arrays(path)
+        return await self.get_derived(
+            path, "index", lambda layout: LayoutIndex(layout, arrays)
+        )
+
+    async def parse_layout_tiles(self, path: Path) -> LayoutTiles:
+        index = await self.parse_layout_index(path)
+        return await self.get_derived(path, "tiles", lambda _: LayoutTiles(index))
+
+    async def parse_layout_previews(self, path: Path) -> LayoutPreviews:
+        arrays = await self.parse_layout_arrays(path)
+        return await self._derived(path, "previews", lambda _: LayoutPreviews(arrays))
+
+    # serialized and precompressed JSON of the layout, built off the event loop
+    # because compressing a large layout takes seconds
+    async def parse_layout_body(self, path: Path) -> LayoutBody:
+        path = path.resolve()
+        entry = await self._get_entry(path)
+        body = entry.derived.get("body")
+        if body is not None:
+            return body
+
+        key = (path, entry.mtime, entry.size)
+        task = self._building.get(key)
+        if task is None:
+            # a layout only requested as JSON is never turned into models
+            if entry.layout is not None:
+                build = partial(LayoutBody.from_layout, entry.layout)
+            else:
+                build = partial(self._body_from_data, entry.data or {})
+            task = asyncio.create_task(asyncio.to_thread(build))
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        body = await task
+        if "body" not in entry.derived:
+            entry.derived["body"] = body
+            self._cache.grow(path, entry, body)
+        return entry.derived["body"]
+
+    # diff against another layout file, cached with the base layout and keyed
+    # on the other file's identity so that either file changing invalidates it
+    async def parse_layout_diff(self, path: Path, other: Path) -> bytes:
+        other = other.resolve()
+        stat = other.stat()
+        arrays = await self.parse_layout_arrays(path)
+        other_layout = await self.parse_layout_file(other)
+        other_arrays = await self.parse_layout_arrays(other)
+        key = f"diff:{other}:{stat.st_mtime_ns}:{stat.st_size}"
+        return await self.get_derived(
+            path,
+            key,
+            lambda layout: diff_layouts(layout, arrays, other_layout, other_arrays)
+            .model_dump_json()
+            .encode(),
+        )
+
+    # area and density analytics as JSON, cached per window size
+    async def parse_layout_stats(self, path: Path, window: float) -> bytes:
+        arrays = await self.parse_layout_arrays(path)
+        window = round_window(window)
+        key = f"stats:{window!r}"
+        entry = await self._get_entry(path)
+        body = entry.derived.get(key)
+        if body is None:
+            # millions of rectangles take seconds
+            stats = await asyncio.to_thread(layout_stats, arrays, window)
+            built = stats.model_dump_json().encode()
+            body = await self._derived(path, key, lambda _: built)
+        return body
+
+    # connectivity of the metal and via layers, built off the event loop like
+    # the stats
+    async def parse_layout_nets(self, path: Path) -> LayoutNets:
+        index = await self.parse_layout_index(path)
+        entry = await self._get_entry(path)
+        nets = entry.derived.get("nets")
+        if nets is None:
+            built = await asyncio.to_thread(LayoutNets, index)
+            nets = await self.get_derived(path, "nets", lambda _: built)
+        return nets
+
+    # repeated rectangles stored once with the offsets of their copies, as a
+    # precompressed body like the plain layout's
+    async def parse_layout_instances(self, path: Path) -> LayoutBody:
+        arrays = await self.parse_layout_arrays(path)
+        entry = await self._get_entry(path)
+        body = entry.derived.get("instances")
+        if body is None:
+            instanced = await asyncio.to_thread(instance_layout, arrays)
+            built = await asyncio.to_thread(LayoutBody.from_layout, instanced)
+            body = await self._derived(path, "instances", lambda _: built)
+        return body
+
+    # body of the layout with another file drawn over it, cached like a diff
+    async def parse_layout_overlay(self, path: Path, overlay: Path) -> LayoutBody:
+        path, overlay = path.resolve(), overlay.resolve()
+        stat = overlay.stat()
+        prefix = f"overlay:{overlay}:"
+        key = f"{prefix}{stat.st_mtime_ns}:{stat.st_size}"
+        entry = await self._get_entry(path)
+        body = entry.derived.get(key)
+        if body is None:
+            # bodies of earlier uploads of the overlay are not served again
+            for stale in [k for k in entry.derived if k.startswith(prefix)]:
+                self._cache.discard(path, entry, stale)
+            merged = overlay_layouts(
+                self._materialize(path, entry), await self.parse_layout_file(overlay)
+            )
+            # compressing a large merged layout takes seconds
+            built = await asyncio.to_thread(LayoutBody.from_layout, merged)
+            body = await self.get_derived(path, key, lambda _: built)
+        return body
+
+    # build a product from the parsed layout once and cache it alongside it,
+    # so it is dropped together with the layout when the file changes
+    async def get_derived(
+        self, path: Path, key: str, build: Callable[[LayoutData], T]
+    ) -> T:
+        return await self._derived(
+            path, key, lambda entry: build(self._materialize(path, entry))
+        )
+
+    # get_derived for products built from the cache entry, which need not
+    # turn the raw parsed data into models
+    async def _derived(
+        self, path: Path, key: str, build: Callable[[CacheEntry], T]
+    ) -> T:
+        path = path.resolve()
+        entry = await self._get_entry(path)
+        if key not in entry.derived:
+            entry.derived[key] = build(entry)
+            self._cache.grow(path, entry, entry.derived[key])
+        return entry.derived[key]
+
+    def cache_stats(self) -> dict[str, float]:
+        return self._cache.stats()
+
+    async def _get_entry(self, path: Path) -> CacheEntry:
         path = path.resolve()
         stat = path.stat()
-        cached = self._cache.get(path)
-        if cached and cached[0] == stat.st_mtime:
-            return cached[1]
+        cached = self._cache.get(path, stat)
+        if cached:
+            return cached
+
+        # repr dumps run to hundreds of MB, they are hashed and parsed in
+        # chunks instead of being read whole
+        started = time.perf_counter()
+        streamed = await asyncio.to_thread(is_repr_file, path)
+        raw = b""
+        if not streamed:
+            async with aiofiles.open(path, "rb") as handle:
+                raw = await handle.read()
+
+        entry = CacheEntry(mtime=stat.st_mtime, size=stat.st_size, layout=None)
+        if self.snapshots:
+            if streamed:
+                entry.digest = await asyncio.to_thread(file_hash, path)
+            else:
+                entry.digest = content_hash(raw)
+            entry.layout = load_snapshot(path, stat, entry.digest)
+        if entry.layout is None:
+            if streamed:
+                entry.data = await asyncio.to_thread(load_layout, path)
+            else:
+                entry.data = self._load(raw.decode())
+        if entry.layout is not None:
+            loaded = "snapshot"
+        else:
+            loaded = "repr" if streamed else "yaml"
+        self._parse_seconds.labels(loaded).observe(time.perf_counter() - started)
+        self._parse_bytes.labels(loaded).inc(stat.st_size)
+        self._cache.put(path, entry)
+        return entry
+
+    # build the validated models of an entry on first use, and snapshot them
+    def _materialize(self, path: Path, entry: CacheEntry) -> LayoutData:
+        if entry.layout is None:
+            entry.layout = self._to_parsed_layout(entry.data or {})
+            entry.data = None
+            path = path.resolve()
+            stat = path.stat()
+            # skip the snapshot if the file changed since it was read
+            unchanged = (stat.st_mtime, stat.st_size) == (entry.mtime, entry.size)
+            if entry.digest and unchanged:
+                write_snapshot(path, stat, entry.digest, entry.layout)
+        return entry.layout
+
+    # arrays straight from the raw parsed data while the models are not built
+    def _arrays_of(self, path: Path, entry: CacheEntry) -> LayoutArrays:
+        if entry.layout is None:
+            try:
+                return _fast_layout_arrays(entry.data or {})
+            except _FastParseError:
+                pass
+        return LayoutArrays.from_layout(self._materialize(path, entry))
+
+    def _body_from_data(self, data: dict[str, Any]) -> LayoutBody:
+        return LayoutBody.from_json(self._to_layout_json(data))
 
-        async with aiofiles.open(path, "r") as handle:
-            content = await handle.read()
+    # try the fast path first and fall back to the generic yaml loader
+    def _load(self, content: str) -> dict[str, Any]:
+        if is_repr(content[:64].encode()):
+            return read_layout(io.BytesIO(content.encode()))
+        try:
+            return _fast_parse(content)
+        except _FastParseError:
+            return yaml.load(content, Loader=_LayoutLoader) or {}
 
-        data = yaml.load(content, Loader=_LayoutLoader) or {}
-        layout = self._to_parsed_layout(data)
-        self._cache[path] = (stat.st_mtime, layout)
-        return layout
+    # serialize raw data without models, validating only data the fast path
+    # cannot vouch for
+    def _to_layout_json(self, data: dict[str, Any]) -> bytes:
+        try:
+            return _fast_layout_json(data)
+        except _FastParseError:
+            return self._to_parsed_layout(data).model_dump_json().encode()
 
     def _to_parsed_layout(self, data: dict[str, Any]) -> LayoutData:
         layer_maps = data.get("layer_maps", {}) or {}
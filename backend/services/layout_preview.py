@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from ..display_config import display_colors
+from ..layout_raster import DEFAULT_STYLE, Rects, encode_png, rasterize
+from .layout_arrays import LayoutArrays
+
+# longest preview side in pixels, whatever the request asks for
+MAX_PREVIEW_SIZE = 2048
+# previews are small and viewed once, favour encoding speed
+_PNG_LEVEL = 1
+
+_STYLES: dict[str, dict[str, Any]] = {
+    layer: style
+    for layers in display_colors.values()
+    for layer, style in layers.items()
+}
+
+
+# PNG previews of one layout, rendered with the array rasterizer
+class LayoutPreviews:
+    def __init__(self, arrays: LayoutArrays, max_cached: int = 32) -> None:
+        self.arrays = arrays
+        self.max_cached = max_cached
+        self.styles = [_STYLES.get(layer, DEFAULT_STYLE) for layer in arrays.layers]
+        # float32 sides grouped by layer, shared by every preview size
+        self.rects = Rects.from_coords(
+            arrays.polygon_coords, arrays.polygon_layers, len(arrays.layers)
+        )
+        self._previews: OrderedDict[tuple[Any, ...], bytes] = OrderedDict()
+        # renders run in worker threads
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        previews = sum(len(png) for png in self._previews.values())
+        return self.rects.nbytes + previews
+
+    def size(self, width: int | None, height: int | None) -> tuple[int, int]:
+        canvas_w = self.arrays.canvas_width or 1.0
+        canvas_h = self.arrays.canvas_height or 1.0
+        if width is None and height is None:
+            width = 256
+        if width is None:
+            width = round(height * canvas_w / canvas_h)
+        elif height is None:
+            height = round(width * canvas_h / canvas_w)
+        return (
+            min(max(int(width), 1), MAX_PREVIEW_SIZE),
+            min(max(int(height), 1), MAX_PREVIEW_SIZE),
+        )
+
+    def render(
+        self,
+        width: int | None = None,
+        height: int | None = None,
+        layers: list[str] | None = None,
+    ) -> bytes:
+        width, height = self.size(width, height)
+        layer_ids = (
+            tuple(sorted(set(self.arrays.layer_ids(layers))))
+            if layers is not None
+            else None
+        )
+        key = (width, height, layer_ids)
+        with self._lock:
+            png = self._previews.get(key)
+            if png is not None:
+                self._previews.move_to_end(key)
+                return png
+
+        png = encode_png(self._rasterize(width, height, layer_ids), _PNG_LEVEL)
+        with self._lock:
+            self._previews[key] = png
+            if len(self._previews) > self.max_cached:
+                self._previews.popitem(last=False)
+        return png
+
+    def _rasterize(
+        self, width: int, height: int, layer_ids: tuple[int, ...] | None
+    ) -> np.ndarray:
+        arrays = self.arrays
+        x0, y0 = arrays.start_x, arrays.start_y
+        canvas_w = arrays.canvas_width or 1.0
+        bounds = (x0, y0, x0 + canvas_w, y0 + (arrays.canvas_height or 1.0))
+        # plot_layout draws 2 inches per layout unit, lines are in points
+        line_scale = width / (canvas_w * 2.0) / 72
+        return rasterize(
+            self.rects, self.styles, bounds, width, height, line_scale, layer_ids
+        )
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from ..layout_raster import coverage_counts
+from ..models import LayerStats, LayoutStats
+from .layout_arrays import LayoutArrays
+
+# density windows over the whole canvas
+MAX_WINDOWS = 4096
+# significant digits of a window size, so that near-identical sizes share
+# one cached result
+_WINDOW_DIGITS = 3
+# compressed grid cells counted at once, larger areas are split in two; a grid
+# grows with the square of its boxes when they share no coordinates
+_MAX_CELLS = 1 << 17
+
+
+# distinct box edges along one axis, with the window edges between them
+def _grid_lines(low: np.ndarray, high: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    lines = np.unique(np.concatenate((low, high)))
+    inside = windows[(windows > lines[0]) & (windows < lines[-1])]
+    return np.union1d(lines, inside) if len(inside) else lines
+
+
+# start of each run of cells in the same window, and that window's index
+def _window_runs(lines: np.ndarray, windows: np.ndarray) -> tuple[np.ndarray, ...]:
+    index = np.searchsorted(windows, lines[:-1], side="right") - 1
+    starts = np.flatnonzero(np.diff(index, prepend=-2))
+    return starts, index[starts]
+
+
+# union area of boxes on the grid of lines xs by ys
+def _add_cells(
+    boxes: np.ndarray,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    windows: tuple[np.ndarray, np.ndarray],
+    density: np.ndarray,
+) -> float:
+    left, right = np.searchsorted(xs, boxes[:, [0, 2]]).T
+    bottom, top = np.searchsorted(ys, boxes[:, [1, 3]]).T
+    # rows go up from the bottom grid line
+    counts = coverage_counts(bottom, left, top, right, len(ys) - 1, len(xs) - 1)
+    widths = np.where(counts > 0, np.diff(xs), 0.0)
+
+    column_starts, window_columns = _window_runs(xs, windows[0])
+    row_starts, window_rows = _window_runs(ys, windows[1])
+    covered = np.add.reduceat(widths, column_starts, axis=1) * np.diff(ys)[:, None]
+    covered = np.add.reduceat(covered, row_starts, axis=0)
+
+    # cells outside the canvas count in the union but in no window
+    valid_rows = (window_rows >= 0) & (window_rows < density.shape[0])
+    valid_columns = (window_columns >= 0) & (window_columns < density.shape[1])
+    density[np.ix_(window_rows[valid_rows], window_columns[valid_columns])] += (
+        covered[np.ix_(valid_rows, valid_columns)]
+    )
+    return float(covered.sum())
+
+
+# area covered by (n, 4) left, bottom, right, top boxes, in one pass
+def union_area(
+    boxes: np.ndarray,
+    windows: tuple[np.ndarray, np.ndarray],
+    density: np.ndarray,
+) -> float:
+    area = 0.0
+    pending = [boxes]
+    while pending:
+        boxes = pending.pop()
+        if not len(boxes):
+            continue
+        xs = _grid_lines(boxes[:, 0], boxes[:, 2], windows[0])
+        ys = _grid_lines(boxes[:, 1], boxes[:, 3], windows[1])
+        if len(xs) < 2 or len(ys) < 2:
+            continue
+        if len(xs) * len(ys) > _MAX_CELLS:
+            axis, lines = (0, xs) if len(xs) >= len(ys) else (1, ys)
+            middle = lines[len(lines) // 2]
+            low = boxes[boxes[:, axis] < middle]
+            np.minimum(low[:, axis + 2], middle, out=low[:, axis + 2])
+            high = boxes[boxes[:, axis + 2] > middle]
+            np.maximum(high[:, axis], middle, out=high[:, axis])
+            pending += [low, high]
+            continue
+        area += _add_cells(boxes, xs, ys, windows, density)
+    return area
+
+
+def round_window(window: float) -> float:
+    return float(f"{window:.{_WINDOW_DIGITS}g}")
+
+
+# per-layer polygon count, areas, bounds and density map of a layout
+def layout_stats(arrays: LayoutArrays, window: float) -> LayoutStats:
+    columns = max(math.ceil(arrays.canvas_width / window), 1)
+    rows = max(math.ceil(arrays.canvas_height / window), 1)
+    if columns * rows > MAX_WINDOWS:
+        raise ValueError(
+            f"window too small, {rows} x {columns} windows exceed {MAX_WINDOWS}"
+        )
+    windows = (
+        arrays.start_x + window * np.arange(columns + 1),
+        arrays.start_y + window * np.arange(rows + 1),
+    )
+    canvas_area = arrays.canvas_width * arrays.canvas_height
+
+    boxes = arrays.polygon_boxes()
+    layers: dict[str, LayerStats] = {}
+    for layer, name in enumerate(arrays.layers):
+        start, end = arrays.layer_offsets[layer], arrays.layer_offsets[layer + 1]
+        if start == end:
+            continue
+        group = boxes[start:end]
+        density = np.zeros((rows, columns))
+        covered = union_area(group, windows, density)
+        low, high = group[:, :2].min(axis=0), group[:, 2:].max(axis=0)
+        layers[name] = LayerStats(
+            polygons=int(end - start),
+            total_area=float(
+                np.sum((group[:, 2] - group[:, 0]) * (group[:, 3] - group[:, 1]))
+            ),
+            union_area=covered,
+            utilization=covered / canvas_area if canvas_area > 0 else 0.0,
+            bounds=[*low.tolist(), *high.tolist()],
+            density=(density / (window * window)).tolist(),
+        )
+
+    return LayoutStats(
+        canvas_width=arrays.canvas_width,
+        canvas_height=arrays.canvas_height,
+        start_x=arrays.start_x,
+        start_y=arrays.start_y,
+        window=window,
+        rows=rows,
+        columns=columns,
+        layers=layers,
+    )
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import aiofiles
+from pydantic import ValidationError
+
+from ..models import Label, Polygon
+
+# geometry file a generator may append to while it runs, next to its --output
+PARTIAL_FILE = "layout.ndjson"
+
+
+# data class to store the geometry read from one chunk of the partial file
+@dataclass
+class GeometryBatch:
+    # byte offset just past the last complete line read
+    offset: int
+    header: dict[str, Any] | None = None
+    polygons: list[Polygon] = field(default_factory=list)
+    labels: list[Label] = field(default_factory=list)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "header": self.header,
+            "polygons": [polygon.model_dump() for polygon in self.polygons],
+            "labels": [label.model_dump() for label in self.labels],
+        }
+
+
+# add one geometry record to the batch, ignoring malformed ones
+def parse_record(record: Any, batch: GeometryBatch) -> None:
+    if not isinstance(record, dict):
+        return
+    kind = record.get("type")
+    try:
+        if kind == "polygon":
+            values = dict(record)
+            values.setdefault("width", abs(values["x1"] - values["x0"]))
+            values.setdefault("height", abs(values["y1"] - values["y0"]))
+            batch.polygons.append(Polygon.model_validate(values))
+        elif kind == "label":
+            batch.labels.append(Label.model_validate(record))
+        elif kind == "header":
+            batch.header = {
+                key: value for key, value in record.items() if key != "type"
+            }
+    except (KeyError, TypeError, ValidationError):
+        pass
+
+
+# incremental reader of the append-only geometry file of a running job
+class LayoutTail:
+    def __init__(self, path: Path, offset: int = 0) -> None:
+        self.path = path
+        self.offset = offset
+
+    async def read(self, max_bytes: int = 1 << 20) -> GeometryBatch | None:
+        try:
+            async with aiofiles.open(self.path, "rb") as handle:
+                await handle.seek(self.offset)
+                chunk = await handle.read(max_bytes)
+                # keep reading a record longer than max_bytes up to its end
+                while b"\n" not in chunk and len(chunk) >= max_bytes:
+                    more = await handle.read(max_bytes)
+                    if not more:
+                        break
+                    chunk += more
+        except OSError:
+            return None
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return None
+
+        batch = GeometryBatch(offset=self.offset + end + 1)
+        for line in chunk[:end].splitlines():
+            try:
+                parse_record(json.loads(line), batch)
+            except ValueError:
+                continue
+        self.offset = batch.offset
+        return batch
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import base64
+from collections import OrderedDict
+
+import numpy as np
+
+from ..models import LayoutTile, TileKind
+from .spatial_index import LayoutIndex
+
+# pixels per tile edge on raster tiles
+TILE_SIZE = 128
+# subpixels per pixel edge used to estimate coverage
+SUPERSAMPLE = 4
+# tiles touching at most this many polygons are sent as real geometry
+MAX_TILE_POLYGONS = 2000
+MAX_TILE_ZOOM = 24
+
+
+# lazily built level-of-detail tile pyramid over one parsed layout
+class LayoutTiles:
+    def __init__(
+        self,
+        index: LayoutIndex,
+        tile_size: int = TILE_SIZE,
+        max_polygons: int = MAX_TILE_POLYGONS,
+        max_cached: int = 1024,
+    ) -> None:
+        self.index = index
+        self.tile_size = tile_size
+        self.max_polygons = max_polygons
+        self.max_cached = max_cached
+        self._tiles: OrderedDict[tuple[int, int, int], LayoutTile] = OrderedDict()
+
+        # the pyramid covers the canvas and any geometry outside of it
+        arrays = index.arrays
+        x0, y0 = arrays.start_x, arrays.start_y
+        x1, y1 = x0 + arrays.canvas_width, y0 + arrays.canvas_height
+        if len(arrays.polygon_coords):
+            coords = arrays.polygon_coords
+            x0 = min(x0, coords[:, [0, 2]].min())
+            y0 = min(y0, coords[:, [1, 3]].min())
+            x1 = max(x1, coords[:, [0, 2]].max())
+            y1 = max(y1, coords[:, [1, 3]].max())
+        self.origin_x = x0
+        self.origin_y = y0
+        self.extent = max(x1 - x0, y1 - y0) or 1.0
+
+    def tile_bounds(self, z: int, x: int, y: int) -> tuple[float, float, float, float]:
+        side = self.extent / 2**z
+        x0 = self.origin_x + x * side
+        y0 = self.origin_y + y * side
+        return x0, y0, x0 + side, y0 + side
+
+    def get_tile(self, z: int, x: int, y: int) -> LayoutTile | None:
+        if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+            return None
+        key = (z, x, y)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        tile = self._build_tile(z, x, y)
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_cached:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _build_tile(self, z: int, x: int, y: int) -> LayoutTile:
+        bounds = self.tile_bounds(z, x, y)
+        rows = self.index.polygons.query(*bounds)
+
+        if len(rows) <= self.max_polygons:
+            layout = self.index.query_layout(*bounds)
+            return LayoutTile(
+                z=z,
+                x=x,
+                y=y,
+                bounds=list(bounds),
+                kind=TileKind.VECTOR,
+                polygons=layout.polygons,
+                labels=layout.labels,
+            )
+
+        # rows come back sorted, and the arrays are grouped by layer
+        arrays = self.index.arrays
+        layer_of_row = arrays.polygon_layers[rows]
+        splits = np.flatnonzero(np.diff(layer_of_row)) + 1
+        coverage: dict[str, str] = {}
+        for group in np.split(rows, splits):
+            layer = arrays.layers[arrays.polygon_layers[group[0]]]
+            raster = self._coverage(arrays.polygon_coords[group], bounds)
+            coverage[layer] = base64.b64encode(raster.tobytes()).decode()
+
+        return LayoutTile(
+            z=z,
+            x=x,
+            y=y,
+            bounds=list(bounds),
+            kind=TileKind.RASTER,
+            raster_size=self.tile_size,
+            coverage=coverage,
+        )
+
+    # fraction of each pixel covered by the union of the boxes, as 0..255
+    def _coverage(
+        self, boxes: np.ndarray, bounds: tuple[float, float, float, float]
+    ) -> np.ndarray:
+        size = self.tile_size * SUPERSAMPLE
+        scale = size / (bounds[2] - bounds[0])
+
+        # snap to the subpixel grid, every box covers at least one subpixel
+        def _span(low: np.ndarray, high: np.ndarray, origin: float):
+            start = np.floor((np.minimum(low, high) - origin) * scale)
+            stop = np.ceil((np.maximum(low, high) - origin) * scale)
+            start = np.clip(start, 0, size - 1).astype(np.int64)
+            stop = np.clip(np.maximum(stop, start + 1), 1, size).astype(np.int64)
+            return start, stop
+
+        ix0, ix1 = _span(boxes[:, 0], boxes[:, 2], bounds[0])
+        iy0, iy1 = _span(boxes[:, 1], boxes[:, 3], bounds[1])
+
+        # 2D difference array, prefix sums give the number of boxes per subpixel
+        width = size + 1
+        corners = np.concatenate(
+            (iy0 * width + ix0, iy0 * width + ix1, iy1 * width + ix0, iy1 * width + ix1)
+        )
+        weights = np.repeat(np.array([1, -1, -1, 1]), len(boxes))
+        diff = np.bincount(corners, weights, minlength=width * width)
+        counts = diff.reshape(width, width).cumsum(axis=0).cumsum(axis=1)
+        covered = counts[:size, :size] > 0.5
+
+        pixels = covered.reshape(
+            self.tile_size, SUPERSAMPLE, self.tile_size, SUPERSAMPLE
+        ).mean(axis=(1, 3))
+        return np.round(pixels * 255).astype(np.uint8)
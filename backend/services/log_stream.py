@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+
+from ..models import DrcReport, DrcViolation, JobProgress
+
+
+# data class to store one batch of log lines handed to a subscriber
+@dataclass
+class LogBatch:
+    # (sequence number, line) pairs, sequence numbers are 1-based log line numbers
+    lines: list[tuple[int, str]] = field(default_factory=list)
+    # lines skipped because the subscriber fell behind
+    dropped: int = 0
+    # latest progress if it changed since the previous batch
+    progress: JobProgress | None = None
+    # design rule violations found since the previous batch, and the report
+    # summary once the check is done
+    violations: list[DrcViolation] = field(default_factory=list)
+    drc: DrcReport | None = None
+    # the job finished and every buffered line has been handed out
+    finished: bool = False
+
+
+# bounded per-subscriber buffer of log lines, lines past max_buffer are counted
+# as dropped so that the publisher never waits on a slow client
+class Subscription:
+    def __init__(self, max_buffer: int = 1000, logs: bool = True) -> None:
+        self.max_buffer = max_buffer
+        self.logs = logs
+        self._buffer: deque[tuple[int, str]] = deque()
+        self._dropped = 0
+        self._progress: JobProgress | None = None
+        self._violations: list[DrcViolation] = []
+        self._drc: DrcReport | None = None
+        self._finished = False
+        self._wakeup = asyncio.Event()
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer)
+
+    def push(self, sequence: int, line: str) -> None:
+        if not self.logs:
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self._dropped += 1
+        else:
+            self._buffer.append((sequence, line))
+        self._wakeup.set()
+
+    def set_progress(self, progress: JobProgress) -> None:
+        self._progress = progress
+        self._wakeup.set()
+
+    def push_violations(self, violations: list[DrcViolation]) -> None:
+        room = self.max_buffer - len(self._violations)
+        self._violations += violations[:room]
+        self._wakeup.set()
+
+    def set_drc(self, report: DrcReport) -> None:
+        self._drc = report
+        self._wakeup.set()
+
+    def finish(self) -> None:
+        self._finished = True
+        self._wakeup.set()
+
+    # wait for lines, then collect for up to window seconds
+    async def next_batch(self, window: float = 0.0, max_lines: int = 500) -> LogBatch:
+        await self._wakeup.wait()
+        if window and not self._finished and len(self._buffer) < max_lines:
+            await asyncio.sleep(window)
+
+        count = min(len(self._buffer), max_lines)
+        batch = LogBatch(
+            lines=[self._buffer.popleft() for _ in range(count)],
+            dropped=self._dropped,
+            progress=self._progress,
+            violations=self._violations,
+            drc=self._drc,
+        )
+        self._dropped = 0
+        self._progress = None
+        self._violations = []
+        self._drc = None
+        batch.finished = self._finished and not self._buffer
+        if not self._buffer and not self._finished:
+            self._wakeup.clear()
+        return batch
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterator
+
+# default latency buckets in seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # per bucket, not cumulative, the last one is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None,
+    ) -> None:
+        if function is not None and labelnames:
+            raise ValueError(f"{name}: a function metric takes no labels")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.function = function
+        self._children: dict[tuple[str, ...], _Value | _Buckets] = {}
+        # unlabelled metrics are updated directly
+        self._default = self.labels() if not labelnames else None
+
+    def labels(self, *values: object):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    # drop every labelled child, for gauges rebuilt on each scrape
+    def clear(self) -> None:
+        self._children.clear()
+        if self._default is not None:
+            self._children[()] = self._default
+
+    def _new_child(self) -> _Value | _Buckets:
+        return _Value()
+
+    def samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        if self.function is not None:
+            yield self.name, (), float(self.function())
+            return
+        for key, child in self._children.items():
+            yield self.name, tuple(zip(self.labelnames, key)), child.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.value -= amount
+
+    def set(self, value: float) -> None:
+        self._default.value = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def samples(self) -> Iterator[tuple[str, tuple[tuple[str, str], ...], float]]:
+        for key, child in self._children.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip((*child.bounds, math.inf), child.counts):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket", labels + le, cumulative
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+
+# in-process counters, gauges and histograms in the Prometheus text format
+class MetricsRegistry:
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None,
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, function))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        self._collectors.append(collect)
+
+    # current value of one sample, e.g. value("layout_jobs", status="running")
+    def value(self, name: str, **labels: str) -> float | None:
+        for collect in self._collectors:
+            collect()
+        wanted = sorted(labels.items())
+        for metric in self._metrics.values():
+            for sample, sample_labels, value in metric.samples():
+                if sample == name and sorted(sample_labels) == wanted:
+                    return value
+        return None
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    pairs = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+                    name = f"{name}{{{pairs}}}"
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+
+# ASGI middleware timing HTTP requests per method, route and status
+class RequestMetrics:
+    def __init__(self, app, registry: MetricsRegistry) -> None:
+        self.app = app
+        self.latency = registry.histogram(
+            "http_request_duration_seconds",
+            "Time to the first response bytes of HTTP requests.",
+            ("method", "route", "status"),
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+        observed = False
+
+        async def send_timed(message) -> None:
+            nonlocal status, observed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                observed = True
+                self._observe(scope, status, time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not observed:
+                self._observe(scope, status, time.perf_counter() - started)
+
+    def _observe(self, scope, status: int, seconds: float) -> None:
+        # the router stores the matched route in the scope
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        self.latency.labels(scope["method"], path, status).observe(seconds)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1 << 53:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+import re
+import time
+
+from ..models import JobProgress
+
+# "[17/420] Generate polygon layer=Metal1" as printed by the generator
+_COUNTER = re.compile(r"^\[(\d+)/(\d+)\]")
+
+
+# return (done, total, structured) for a progress line, else None
+def parse_progress(line: str) -> tuple[int, int, bool] | None:
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        done, total = record.get("done"), record.get("total")
+        if isinstance(done, int) and isinstance(total, int):
+            return done, total, True
+        return None
+
+    match = _COUNTER.match(line)
+    if match:
+        return int(match.group(1)), int(match.group(2)), False
+    return None
+
+
+# progress state of one job, with the rate and ETA since the first update
+class ProgressTracker:
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.pending = False
+        self._start: tuple[float, int] | None = None
+        self._last_sent = float("-inf")
+
+    def update(self, done: int, total: int) -> tuple[JobProgress, bool]:
+        now = time.monotonic()
+        # a counter going backwards starts a new phase
+        if self._start is None or done < self._start[1]:
+            self._start = (now, done)
+        start_time, start_done = self._start
+        elapsed = now - start_time
+        rate = (done - start_done) / elapsed if elapsed > 0 else None
+        remaining = max(total - done, 0)
+        if not remaining:
+            eta: float | None = 0.0
+        else:
+            eta = remaining / rate if rate else None
+        progress = JobProgress(done=done, total=total, rate=rate, eta=eta)
+
+        self.pending = True
+        return progress, now - self._last_sent >= self.interval
+
+    def sent(self) -> None:
+        self.pending = False
+        self._last_sent = time.monotonic()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from ..models import GenerateRequest
+
+RESULT_FILE = "layout.yaml"
+USED_MARKER = "last_used"
+
+
+# hard link a file, falling back to a copy across filesystems
+def link_or_copy(src: Path, dst: Path) -> None:
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+# content-addressed store of generator outputs, keyed on the canonical request
+# and the generator's content hash, expired after max_age and evicted least
+# recently used past max_bytes
+class ResultCache:
+    def __init__(self, cache_dir: Path, max_age: float, max_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._script_hashes: dict[Path, tuple[float, int, str]] = {}
+
+    def key_for(self, request: GenerateRequest, generator_script: Path) -> str:
+        payload = request.model_dump(mode="json", exclude={"priority"})
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        script = generator_script.resolve()
+        digest = hashlib.sha256()
+        for part in (canonical, str(script), self._script_hash(script)):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def lookup(self, key: str) -> Path | None:
+        path = self.cache_dir / key / RESULT_FILE
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if time.time() - stat.st_mtime > self.max_age:
+            self._remove(path.parent)
+            return None
+        (path.parent / USED_MARKER).touch()
+        return path
+
+    def store(self, key: str, output_path: Path) -> None:
+        entry_dir = self.cache_dir / key
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = entry_dir / f"{RESULT_FILE}.{os.getpid()}.tmp"
+        link_or_copy(output_path, tmp_path)
+        os.replace(tmp_path, entry_dir / RESULT_FILE)
+        (entry_dir / USED_MARKER).touch()
+        self.evict()
+
+    def evict(self) -> None:
+        now = time.time()
+        entries: list[tuple[float, int, Path]] = []
+        for entry_dir in self.cache_dir.iterdir() if self.cache_dir.exists() else ():
+            try:
+                stat = (entry_dir / RESULT_FILE).stat()
+                used = (entry_dir / USED_MARKER).stat().st_mtime
+            except OSError:
+                self._remove(entry_dir)
+                continue
+            if now - stat.st_mtime > self.max_age:
+                self._remove(entry_dir)
+                continue
+            entries.append((used, stat.st_size, entry_dir))
+
+        # drop least recently used entries until under the size budget
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(entry_dir)
+            total -= size
+
+    def _script_hash(self, script: Path) -> str:
+        stat = script.stat()
+        cached = self._script_hashes.get(script)
+        if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        digest = hashlib.sha256(script.read_bytes()).hexdigest()
+        self._script_hashes[script] = (stat.st_mtime, stat.st_size, digest)
+        return digest
+
+    @staticmethod
+    def _remove(entry_dir: Path) -> None:
+        shutil.rmtree(entry_dir, ignore_errors=True)
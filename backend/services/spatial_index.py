@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import math
+from typing import Iterator
+
+import numpy as np
+
+from ..models import LayoutData
+from .layout_arrays import LayoutArrays
+
+# grid cells listing each box on average, the grid coarsens until it fits
+_CELLS_PER_BOX = 8
+# candidate pairs tested at once
+_PAIR_CHUNK = 1 << 22
+
+
+# static R-tree bulk-loaded with Sort-Tile-Recursive packing
+class STRTree:
+    def __init__(self, boxes: np.ndarray, node_size: int = 16) -> None:
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        # normalize so that x0 <= x1 and y0 <= y1
+        boxes = np.column_stack(
+            (
+                np.minimum(boxes[:, 0], boxes[:, 2]),
+                np.minimum(boxes[:, 1], boxes[:, 3]),
+                np.maximum(boxes[:, 0], boxes[:, 2]),
+                np.maximum(boxes[:, 1], boxes[:, 3]),
+            )
+        )
+        self.node_size = node_size
+        self.size = len(boxes)
+
+        # sort into vertical slabs by x center, then by y center within a slab
+        leaf_count = math.ceil(self.size / node_size)
+        slab_size = max(math.ceil(math.sqrt(leaf_count)), 1) * node_size
+        center_x = boxes[:, 0] + boxes[:, 2]
+        center_y = boxes[:, 1] + boxes[:, 3]
+        order = np.argsort(center_x, kind="stable")
+        slab = np.arange(self.size) // slab_size
+        order = order[np.lexsort((center_y[order], slab))]
+        self._ids = order
+
+        # levels[0] holds the items, the last level holds the root nodes
+        level = boxes[order]
+        self._levels = [level]
+        while len(level) > node_size:
+            starts = np.arange(0, len(level), node_size)
+            level = np.column_stack(
+                (
+                    np.minimum.reduceat(level[:, 0], starts),
+                    np.minimum.reduceat(level[:, 1], starts),
+                    np.maximum.reduceat(level[:, 2], starts),
+                    np.maximum.reduceat(level[:, 3], starts),
+                )
+            )
+            self._levels.append(level)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ids.nbytes + sum(level.nbytes for level in self._levels)
+
+    # return the sorted ids of all boxes touching the query rectangle
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        candidates = np.arange(len(self._levels[-1]))
+        children_offsets = np.arange(self.node_size)
+        for depth in range(len(self._levels) - 1, -1, -1):
+            level = self._levels[depth]
+            if depth < len(self._levels) - 1:
+                candidates = (
+                    candidates[:, None] * self.node_size + children_offsets
+                ).ravel()
+                candidates = candidates[candidates < len(level)]
+            boxes = level[candidates]
+            hits = (
+                (boxes[:, 0] <= x1)
+                & (boxes[:, 2] >= x0)
+                & (boxes[:, 1] <= y1)
+                & (boxes[:, 3] >= y0)
+            )
+            candidates = candidates[hits]
+            if not len(candidates):
+                break
+        return np.sort(self._ids[candidates])
+
+
+# uniform grid listing each box in every cell it touches, to find all pairs of
+# touching boxes at once; boxes must have x0 <= x1 and y0 <= y1
+class BoxGrid:
+    def __init__(self, boxes: np.ndarray) -> None:
+        self.boxes = boxes
+        self.origin = boxes[:, :2].min(axis=0)
+        sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        extent = float((boxes[:, 2:].max(axis=0) - self.origin).max())
+        cell = 2 * float(np.median(sides)) or extent / np.sqrt(len(boxes)) or 1.0
+        while True:
+            c0, r0 = self.cell_of(boxes[:, :2], cell).T
+            c1, r1 = self.cell_of(boxes[:, 2:], cell).T
+            spans = (c1 - c0 + 1) * (r1 - r0 + 1)
+            if spans.sum() <= _CELLS_PER_BOX * len(boxes):
+                break
+            cell *= 2
+        self.cell = cell
+        self.columns = int(c1.max()) + 1
+        self.rows = int(r1.max()) + 1
+        self.ids, self.keys = self._cells(c0, r0, c1, r1)
+        order = np.argsort(self.keys, kind="stable")
+        self.keys, self.ids = self.keys[order], self.ids[order]
+
+    # (column, row) of each (x, y) point
+    def cell_of(self, points: np.ndarray, cell: float | None = None) -> np.ndarray:
+        return np.floor((points - self.origin) / (cell or self.cell)).astype(np.int64)
+
+    # every (box, cell key) pair of boxes spanning cells c0..c1 by r0..r1
+    def _cells(
+        self, c0: np.ndarray, r0: np.ndarray, c1: np.ndarray, r1: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        widths = c1 - c0 + 1
+        spans = widths * (r1 - r0 + 1)
+        ids = np.repeat(np.arange(len(c0)), spans)
+        local = np.arange(len(ids)) - np.repeat(np.cumsum(spans) - spans, spans)
+        row = r0[ids] + local // widths[ids]
+        return ids, row * self.columns + c0[ids] + local % widths[ids]
+
+    # whether the intersections of touching boxes a and b start in cells keys,
+    # so that a pair listed in several shared cells is kept once
+    def _first_cell(
+        self, a: np.ndarray, b: np.ndarray, keys: np.ndarray
+    ) -> np.ndarray:
+        corner = np.maximum(a[:, :2], b[:, :2])
+        touching = np.all(corner <= np.minimum(a[:, 2:], b[:, 2:]), axis=1)
+        column, row = self.cell_of(corner).T
+        return touching & (row * self.columns + column == keys)
+
+    # yield chunks of touching box index pairs, each pair once
+    def pairs(self) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        count = len(self.keys)
+        # boxes sharing a cell are candidates, each with the later ones
+        run_end = np.flatnonzero(np.diff(self.keys, append=-1)) + 1
+        later = np.repeat(run_end, np.diff(run_end, prepend=0)) - np.arange(count) - 1
+        total = np.cumsum(later)
+        start = 0
+        while start < count:
+            done = total[start - 1] if start else 0
+            stop = int(np.searchsorted(total, done + _PAIR_CHUNK, "right"))
+            stop = max(stop, start + 1)
+            later_chunk = later[start:stop]
+            first = np.repeat(np.arange(start, stop), later_chunk)
+            offsets = np.cumsum(later_chunk) - later_chunk
+            slot = np.arange(len(first)) - np.repeat(offsets, later_chunk)
+            second = first + 1 + slot
+            start = stop
+
+            a, b = self.ids[first], self.ids[second]
+            keep = self._first_cell(self.boxes[a], self.boxes[b], self.keys[first])
+            yield a[keep], b[keep]
+
+    # return (query, box) index pairs of boxes touching each query box
+    def overlapping(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        low = np.maximum(self.cell_of(queries[:, :2]), 0)
+        last = np.array([self.columns - 1, self.rows - 1])
+        high = np.minimum(self.cell_of(queries[:, 2:]), last)
+        inside = np.all(low <= high, axis=1)
+        queries_inside = np.flatnonzero(inside)
+        ids, keys = self._cells(*low[inside].T, *high[inside].T)
+        query = queries_inside[ids]
+
+        start = np.searchsorted(self.keys, keys, "left")
+        counts = np.searchsorted(self.keys, keys, "right") - start
+        slot = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        entries = np.repeat(start, counts) + slot
+        query, box = np.repeat(query, counts), self.ids[entries]
+        keep = self._first_cell(queries[query], self.boxes[box], self.keys[entries])
+        return query[keep], box[keep]
+
+
+# spatial index over the polygons and labels of one parsed layout
+class LayoutIndex:
+    def __init__(self, layout: LayoutData, arrays: LayoutArrays) -> None:
+        self.layout = layout
+        self.arrays = arrays
+        self.polygons = STRTree(arrays.polygon_coords)
+        self.labels = STRTree(np.hstack((arrays.label_coords, arrays.label_coords)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.polygons.nbytes + self.labels.nbytes
+
+    # return polygon and label indices into the LayoutData lists
+    def query(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        layers: list[str] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        rows = self.polygons.query(x0, y0, x1, y1)
+        labels = self.labels.query(x0, y0, x1, y1)
+        if layers is not None:
+            layer_ids = self.arrays.layer_ids(layers)
+            rows = rows[np.isin(self.arrays.polygon_layers[rows], layer_ids)]
+            labels = labels[np.isin(self.arrays.label_layers[labels], layer_ids)]
+        return np.sort(self.arrays.polygon_order[rows]), labels
+
+    # return a LayoutData restricted to the geometry in the viewport
+    def query_layout(
+        self,
+        x0: float,
+        y0: float,
+        x1: float,
+        y1: float,
+        layers: list[str] | None = None,
+    ) -> LayoutData:
+        polygon_ids, label_ids = self.query(x0, y0, x1, y1, layers)
+        return self.layout.model_copy(
+            update={
+                "polygons": [self.layout.polygons[i] for i in polygon_ids.tolist()],
+                "labels": [self.layout.labels[i] for i in label_ids.tolist()],
+            }
+        )
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import secrets
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Coroutine
+
+WORKER_SCRIPT = Path(__file__).with_name("generator_worker.py")
+
+
+# a generator worker could not be started
+class WorkerError(RuntimeError):
+    pass
+
+
+# one warm generator process, running one job at a time
+class GeneratorWorker:
+    def __init__(
+        self,
+        process: asyncio.subprocess.Process,
+        token: str,
+        cpu_limit: int | None = None,
+    ) -> None:
+        self.process = process
+        self.token = token
+        # cpu seconds of each job, enforced by the worker from its own usage
+        self.cpu_limit = cpu_limit
+        self.jobs = 0
+        self.busy = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    # run one job and return its exit code, or None if the worker died
+    async def run(self, argv: list[str], on_line: Callable[[str], None]) -> int | None:
+        assert self.process.stdin is not None and self.process.stdout is not None
+        self.busy = True
+        self.jobs += 1
+        request = {"argv": argv, "cpu_limit": self.cpu_limit}
+        self.process.stdin.write(json.dumps(request).encode() + b"\n")
+        await self.process.stdin.drain()
+
+        sentinel = f"{self.token} exit "
+        # the worker ends the job's output with a newline before the sentinel,
+        # the blank line that makes is held back until more output follows
+        blank = False
+        async for raw_line in self.process.stdout:
+            line = raw_line.decode(errors="replace").rstrip()
+            output, found, code = line.rpartition(sentinel)
+            if found:
+                if output:
+                    on_line(output)
+                self.busy = False
+                return int(code)
+            if blank:
+                on_line("")
+            blank = not line
+            if line:
+                on_line(line)
+
+        # stdout closed before the job ended, the worker crashed or was killed
+        await self.process.wait()
+        return None
+
+    async def stop(self) -> None:
+        if self.alive and not self.busy and self.process.stdin is not None:
+            self.process.stdin.close()
+        else:
+            with contextlib.suppress(ProcessLookupError):
+                self.process.kill()
+        await self.process.wait()
+
+
+# warm generator processes with the generator module already imported, each
+# replaced after max_jobs jobs, when it dies, or when released mid-job
+class WorkerPool:
+    def __init__(
+        self,
+        generator_script: Path,
+        size: int,
+        max_jobs: int = 50,
+        preexec_fn: Callable[[], None] | None = None,
+        cpu_limit: int | None = None,
+    ) -> None:
+        self.generator_script = generator_script
+        self.size = size
+        self.max_jobs = max_jobs
+        self.preexec_fn = preexec_fn
+        self.cpu_limit = cpu_limit
+        # workers spawned or being spawned, idle ones wait in _idle
+        self._live = 0
+        self._idle: deque[GeneratorWorker] = deque()
+        self._available = asyncio.Event()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._closed = False
+
+    async def start(self) -> None:
+        missing = self.size - self._live
+        self._live += missing
+        await asyncio.gather(*(self._replace() for _ in range(missing)))
+
+    async def acquire(self) -> GeneratorWorker:
+        while True:
+            while self._idle:
+                worker = self._idle.popleft()
+                if worker.alive:
+                    return worker
+                self._live -= 1
+            if self._live < self.size:
+                self._live += 1
+                try:
+                    return await self._spawn()
+                except BaseException:
+                    self._live -= 1
+                    raise
+            self._available.clear()
+            await self._available.wait()
+
+    def release(self, worker: GeneratorWorker) -> None:
+        if worker.alive and not worker.busy and worker.jobs < self.max_jobs:
+            self._idle.append(worker)
+            self._available.set()
+            return
+
+        # recycle the worker and warm up a replacement in its slot
+        self._background(worker.stop())
+        if self._closed:
+            self._live -= 1
+        else:
+            self._background(self._replace())
+
+    async def close(self) -> None:
+        self._closed = True
+        workers = list(self._idle)
+        self._idle.clear()
+        self._live -= len(workers)
+        await asyncio.gather(*(worker.stop() for worker in workers))
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    # spawn a worker into a slot already counted in _live
+    async def _replace(self) -> None:
+        try:
+            worker = await self._spawn()
+        except WorkerError:
+            # acquire will retry the spawn and report the error to the job
+            self._live -= 1
+            self._available.set()
+            return
+        if self._closed:
+            self._live -= 1
+            await worker.stop()
+            return
+        self._idle.append(worker)
+        self._available.set()
+
+    async def _spawn(self) -> GeneratorWorker:
+        token = secrets.token_hex(16)
+        process = await asyncio.create_subprocess_exec(
+            "python",
+            "-u",
+            str(WORKER_SCRIPT),
+            str(self.generator_script),
+            token,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            preexec_fn=self.preexec_fn,
+        )
+        assert process.stdout is not None
+
+        # output before the ready line comes from importing the generator
+        output: list[str] = []
+        try:
+            async for raw_line in process.stdout:
+                line = raw_line.decode(errors="replace").rstrip()
+                if line == f"{token} ready":
+                    return GeneratorWorker(process, token, self.cpu_limit)
+                output.append(line)
+        except BaseException:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            raise
+        await process.wait()
+        detail = "\n".join(output[-20:])
+        raise WorkerError(
+            f"Generator worker exited with code {process.returncode}: {detail}"
+        )
+
+    def _background(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
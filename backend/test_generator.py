@@ -1,54 +1,54 @@
 from __future__ import annotations
 
 import argparse
+import json
 import shutil
 import sys
 import time
 from pathlib import Path
+from typing import Any, TextIO
 
 try:
     from .config import DATA_DIR
+    from .services.layout_parser import LayoutParser
+    from .services.layout_stream import PARTIAL_FILE
 except ImportError:  # Script execution fallback
     repo_root = Path(__file__).resolve().parents[1]
     sys.path.insert(0, str(repo_root))
     from backend.config import DATA_DIR
+    from backend.services.layout_parser import LayoutParser
+    from backend.services.layout_stream import PARTIAL_FILE
 
 
-def _parse_polygon_layers(data_path: Path) -> list[str]:
-    layers: list[str] = []
-    in_polygons = False
-    for raw_line in data_path.read_text().splitlines():
-        line = raw_line.strip()
-        if line.startswith("polygons:"):
-            in_polygons = True
-            continue
-        if line.startswith("labels:"):
-            in_polygons = False
-            continue
-        if not in_polygons:
-            continue
-        if line.startswith("- - "):
-            layers.append(line.replace("- - ", "", 1))
-    return layers
+# append records to the geometry file that /api/layouts/{job_id}/stream tails
+def _append_records(handle: TextIO, records: list[dict[str, Any]]) -> None:
+    handle.writelines(json.dumps(record) + "\n" for record in records)
+    handle.flush()
 
 
-def main() -> int:
+# in-process entry point, the worker pool imports this module once and calls
+# main() with the generator arguments for every job
+def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(description="Mock layout generator.")
     parser.add_argument("--output", required=True, help="Output YAML path.")
     parser.add_argument("--cell-name", default=None)
     parser.add_argument("--config", default=None, help="Optional config JSON path.")
     parser.add_argument("--delay-ms", type=int, default=200)
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     data_path = DATA_DIR / "data.txt"
     if not data_path.exists():
         print(f"Data file not found: {data_path}", file=sys.stderr)
         return 1
 
-    layers = _parse_polygon_layers(data_path)
-    total = len(layers)
+    layout = LayoutParser().parse_layout_text(data_path.read_text())
+    total = len(layout.polygons)
     delay = max(args.delay_ms, 0) / 1000.0
 
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = open(output_path.with_name(PARTIAL_FILE), "w", encoding="utf-8")
+
     print("Starting mock layout generation...")
     if args.cell_name:
         print(f"Cell name: {args.cell_name}")
@@ -56,13 +56,18 @@ def main() -> int:
         print(f"Config file: {args.config}")
     print(f"Polygons: {total}")
 
-    for index, layer in enumerate(layers, start=1):
-        print(f"[{index}/{total}] Generate polygon layer={layer}")
-        if delay:
-            time.sleep(delay)
+    # geometry is streamed as it is generated, the YAML file comes last
+    with partial:
+        header = layout.model_dump(exclude={"polygons", "labels"})
+        _append_records(partial, [{"type": "header", **header}])
+        for index, polygon in enumerate(layout.polygons, start=1):
+            print(f"[{index}/{total}] Generate polygon layer={polygon.layer}")
+            _append_records(partial, [{"type": "polygon", **polygon.model_dump()}])
+            if delay:
+                time.sleep(delay)
+        labels = [{"type": "label", **label.model_dump()} for label in layout.labels]
+        _append_records(partial, labels)
 
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
     shutil.copyfile(data_path, output_path)
     print(f"Layout written to {output_path}")
     print("Mock layout generation complete.")
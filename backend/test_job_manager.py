@@ -2,11 +2,43 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import time
 from pathlib import Path
+from unittest.mock import patch
 
-from backend.config import GENERATOR_SCRIPT, JOBS_DIR
-from backend.models import GenerateRequest, JobStatus
+from backend import test_generator
+from backend.config import DATA_DIR, GENERATOR_SCRIPT, JOBS_DIR
+from backend.models import (
+    FINISHED_STATUSES,
+    DrcRules,
+    GenerateRequest,
+    Job,
+    JobStatus,
+)
 from backend.services.job_manager import JobManager
+from backend.services.layout_drc import LayoutChecker
+from backend.services.layout_parser import LayoutParser
+from backend.services.layout_stream import PARTIAL_FILE
+from backend.services.metrics import MetricsRegistry
+from backend.services.progress import parse_progress
+from backend.services.result_cache import ResultCache
+
+# generator that writes data.txt after a short delay, for fast scenarios
+_QUICK_GENERATOR = """
+import argparse, shutil, time
+parser = argparse.ArgumentParser()
+parser.add_argument("--output")
+parser.add_argument("--cell-name")
+parser.add_argument("--config")
+args = parser.parse_args()
+print("generating", flush=True)
+time.sleep(0.3)
+shutil.copyfile({data!r}, args.output)
+"""
 
 
 async def _wait_for_completion(job_manager: JobManager, job_ids: list[str]) -> None:
@@ -19,23 +51,637 @@ async def _wait_for_completion(job_manager: JobManager, job_ids: list[str]) -> N
             if not job:
                 finished.add(job_id)
                 continue
-            if job.status in {JobStatus.COMPLETED, JobStatus.FAILED}:
+            if job.status in FINISHED_STATUSES:
                 finished.add(job_id)
         pending -= finished
 
 
 async def _stream_logs(job_manager: JobManager, job_id: str) -> None:
-    queue = job_manager.add_subscriber(job_id)
+    subscription = job_manager.add_subscriber(job_id)
     try:
-        for line in job_manager.get_history(job_id):
+        history = await job_manager.get_history(job_id)
+        for line in history:
             print(f"[{job_id}] {line}")
         while True:
-            log_line = await queue.get()
-            if log_line is None:
+            batch = await subscription.next_batch()
+            if batch.dropped:
+                print(f"[{job_id}] ... {batch.dropped} lines dropped")
+            for seq, log_line in batch.lines:
+                if seq > len(history):
+                    print(f"[{job_id}] {log_line}")
+            if batch.finished:
                 break
-            print(f"[{job_id}] {log_line}")
     finally:
-        job_manager.remove_subscriber(job_id, queue)
+        job_manager.remove_subscriber(job_id, subscription)
+
+
+async def test_result_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_QUICK_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        cache = ResultCache(jobs_dir / ".results", max_age=3600, max_bytes=10**9)
+        job_manager = JobManager(jobs_dir, generator, cache)
+        completed: list[str] = []
+
+        async def on_complete(job: Job, output_path: Path) -> None:
+            assert output_path.exists()
+            completed.append(job.job_id)
+
+        job_manager.completion_hooks.append(on_complete)
+
+        # identical in-flight requests coalesce onto one job
+        request = GenerateRequest(cell_name="cached_cell", config={"b": 1, "a": 2})
+        first = await job_manager.create_job(request)
+        await job_manager.start_job(first.job_id, request)
+        duplicate = await job_manager.create_job(
+            GenerateRequest(cell_name="cached_cell", config={"a": 2, "b": 1})
+        )
+        await job_manager.start_job(duplicate.job_id, request)
+        assert duplicate.job_id == first.job_id
+        await _wait_for_completion(job_manager, [first.job_id])
+        assert first.status == JobStatus.COMPLETED
+
+        # a repeated request completes immediately from the cache
+        hit = await job_manager.create_job(request)
+        assert hit.job_id != first.job_id and hit.status == JobStatus.COMPLETED
+        hit_output = job_manager.get_output_path(hit.job_id)
+        assert hit_output.read_bytes() == (DATA_DIR / "data.txt").read_bytes()
+
+        # completion hooks ran once for the generated job and the cache hit
+        await job_manager.flush()
+        assert completed == [first.job_id, hit.job_id]
+
+        # other requests still run the generator
+        other = await job_manager.create_job(GenerateRequest(cell_name="other"))
+        assert other.status == JobStatus.PENDING
+
+        # a changed generator script invalidates the key
+        generator.write_text(generator.read_text() + "\n# changed\n")
+        assert (await job_manager.create_job(request)).status == JobStatus.PENDING
+
+        # entries are evicted by size
+        ResultCache(cache.cache_dir, max_age=3600, max_bytes=0).evict()
+        assert not any(cache.cache_dir.iterdir())
+        print("Result cache: OK")
+
+
+async def test_scheduler() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_QUICK_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        job_manager = JobManager(jobs_dir, generator, max_concurrent=1)
+
+        # one generator at a time, higher priorities first
+        jobs = []
+        for priority in (0, 0, 5, 0):
+            request = GenerateRequest(cell_name=f"p{priority}", priority=priority)
+            job = await job_manager.create_job(request)
+            await job_manager.start_job(job.job_id, request)
+            jobs.append(job)
+        await asyncio.sleep(0.05)
+        running, low, high, last = jobs
+        assert running.status == JobStatus.RUNNING
+        positions = [job_manager.get_job(job.job_id).queue_position for job in jobs]
+        assert positions == [None, 2, 1, 3], positions
+
+        # cancelling a queued job moves the others up
+        await job_manager.cancel_job(low.job_id)
+        assert low.status == JobStatus.CANCELLED
+        assert job_manager.get_job(last.job_id).queue_position == 2
+
+        # cancelling a running job kills its generator
+        await job_manager.cancel_job(running.job_id)
+        assert running.status == JobStatus.CANCELLED
+        await _wait_for_completion(job_manager, [high.job_id, last.job_id])
+        assert high.status == last.status == JobStatus.COMPLETED
+        assert high.completed_at < last.completed_at
+
+        # cancelling while the generator is being spawned still stops it
+        spawn = asyncio.create_subprocess_exec
+        spawning = asyncio.Event()
+
+        async def slow_spawn(*args, **kwargs):
+            spawning.set()
+            process = await spawn(*args, **kwargs)
+            await asyncio.sleep(0.2)
+            return process
+
+        request = GenerateRequest(cell_name="spawning")
+        job = await job_manager.create_job(request)
+        with patch("asyncio.create_subprocess_exec", slow_spawn):
+            await job_manager.start_job(job.job_id, request)
+            await spawning.wait()
+            await job_manager.cancel_job(job.job_id)
+        await _wait_for_completion(job_manager, [job.job_id])
+        assert job.status == JobStatus.CANCELLED
+        assert not job_manager.jobs[job.job_id].output_path.exists()
+
+        # generators running past the timeout are killed
+        job_manager.timeout = 0.1
+        request = GenerateRequest(cell_name="slow")
+        slow = await job_manager.create_job(request)
+        await job_manager.start_job(slow.job_id, request)
+        await _wait_for_completion(job_manager, [slow.job_id])
+        assert slow.status == JobStatus.FAILED and "timed out" in slow.error
+        print("Scheduler: OK")
+
+
+async def test_registry() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_QUICK_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        job_manager = JobManager(jobs_dir, generator, log_tail_lines=1)
+
+        request = GenerateRequest(cell_name="durable")
+        done = await job_manager.create_job(request)
+        await job_manager.start_job(done.job_id, request)
+        await _wait_for_completion(job_manager, [done.job_id])
+        interrupted = await job_manager.create_job(GenerateRequest(cell_name="lost"))
+        await job_manager.flush()
+
+        # logs live on disk, only the tail stays in memory
+        assert await job_manager.get_history(done.job_id) == ["generating"]
+        assert job_manager.get_log_tail(done.job_id) == ["generating"]
+
+        # a new manager, as after a restart, picks the jobs back up
+        restarted = JobManager(jobs_dir, generator, retention_age=3600)
+        assert restarted.load_jobs() == 2
+        assert restarted.get_job(done.job_id).status == JobStatus.COMPLETED
+        assert await restarted.get_history(done.job_id) == ["generating"]
+        lost = restarted.get_job(interrupted.job_id)
+        assert lost.status == JobStatus.FAILED and "restart" in lost.error
+
+        # finished jobs past the retention age are removed from disk
+        assert await restarted.collect_garbage() == []
+        restarted.retention_age = 1e-6
+        removed = await restarted.collect_garbage()
+        assert sorted(removed) == sorted([done.job_id, interrupted.job_id])
+        assert not restarted.jobs and not any(jobs_dir.iterdir())
+
+        # the disk quota removes the oldest finished jobs first
+        quota = JobManager(jobs_dir, generator, retention_bytes=1)
+        jobs = []
+        for index in range(2):
+            job = await quota.create_job(GenerateRequest(cell_name=f"q{index}"))
+            await quota.cancel_job(job.job_id)
+            jobs.append(job)
+        await quota.flush()
+        assert await quota.collect_garbage() == [jobs[0].job_id, jobs[1].job_id]
+        print("Registry: OK")
+
+
+# generator printing a burst of lines faster than a subscriber drains them
+_CHATTY_GENERATOR = """
+import argparse, shutil
+parser = argparse.ArgumentParser()
+parser.add_argument("--output")
+parser.add_argument("--cell-name")
+parser.add_argument("--config")
+args = parser.parse_args()
+for index in range({lines}):
+    print("line", index, flush=True)
+shutil.copyfile({data!r}, args.output)
+"""
+
+
+async def test_streaming() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(
+            _CHATTY_GENERATOR.format(lines=500, data=str(DATA_DIR / "data.txt"))
+        )
+        job_manager = JobManager(jobs_dir, generator, subscriber_buffer=50)
+
+        # a subscriber that never reads costs at most its buffer
+        request = GenerateRequest(cell_name="chatty")
+        job = await job_manager.create_job(request)
+        stalled = job_manager.add_subscriber(job.job_id)
+        await job_manager.start_job(job.job_id, request)
+        await _wait_for_completion(job_manager, [job.job_id])
+        assert stalled.depth == 50
+
+        batch = await stalled.next_batch(max_lines=20)
+        assert [seq for seq, _ in batch.lines] == list(range(1, 21))
+        assert batch.dropped == 450 and not batch.finished
+        batch = await stalled.next_batch()
+        assert len(batch.lines) == 30 and batch.dropped == 0 and batch.finished
+        job_manager.remove_subscriber(job.job_id, stalled)
+
+        # the history resumes after a sequence number
+        history = await job_manager.get_history(job.job_id)
+        assert len(history) == 500 and history[0] == "line 0"
+        resumed = await job_manager.get_history(job.job_id, 498)
+        assert resumed == ["line 498", "line 499"]
+        print("Streaming: OK")
+
+
+async def test_drc() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_QUICK_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        # Metal1 is drawn 0.085 to 0.4 wide, VIA1 sits in Metal2 with no margin
+        rules = DrcRules(
+            width={"Metal1": 0.15}, enclosure={"VIA1": {"Metal2": 0.05}}
+        )
+        cache = ResultCache(jobs_dir / ".results", max_age=3600, max_bytes=10**9)
+        checker = LayoutChecker(rules, LayoutParser())
+        job_manager = JobManager(jobs_dir, generator, cache, checker=checker)
+
+        # violations reach subscribers before the job is reported complete
+        request = GenerateRequest(cell_name="drc")
+        job = await job_manager.create_job(request)
+        subscription = job_manager.add_subscriber(job.job_id, logs=False)
+        await job_manager.start_job(job.job_id, request)
+        violations, summary = [], None
+        while True:
+            batch = await subscription.next_batch()
+            violations += batch.violations
+            summary = batch.drc or summary
+            if batch.finished:
+                break
+        assert summary is not None and not summary.violations
+        assert sum(summary.counts.values()) == len(violations) > 0
+        assert {violation.rule for violation in violations} == {"width", "enclosure"}
+        assert all(v.value < v.limit for v in violations)
+        log = await job_manager.get_history(job.job_id)
+        assert any(line.startswith("Design rule check: ") for line in log), log
+
+        report = json.loads(await job_manager.get_drc_report(job.job_id))
+        assert report["counts"] == summary.counts
+        assert len(report["violations"]) == len(violations)
+
+        # cached results skip the post-step and are checked on first use
+        cached = await job_manager.create_job(request)
+        assert cached.status == JobStatus.COMPLETED
+        report = json.loads(await job_manager.get_drc_report(cached.job_id))
+        assert report["counts"] == summary.counts
+        await job_manager.close()
+
+        # a running check does not hold the generator slot
+        release = asyncio.Event()
+
+        class BlockedChecker:
+            calls = 0
+
+            async def check(self, path, on_violations=None):
+                BlockedChecker.calls += 1
+                await release.wait()
+                return await checker.check(path, on_violations)
+
+        job_manager = JobManager(
+            Path(tmp_dir) / "blocked", generator, max_concurrent=1
+        )
+        job_manager.checker = BlockedChecker()
+        requests = [GenerateRequest(cell_name=f"blocked{i}") for i in range(2)]
+        blocked = [await job_manager.create_job(request) for request in requests]
+        for job, request in zip(blocked, requests):
+            await job_manager.start_job(job.job_id, request)
+        await asyncio.wait_for(
+            _wait_for_completion(job_manager, [job.job_id for job in blocked]), 30
+        )
+        assert not job_manager.jobs[blocked[0].job_id].drc_path.exists()
+        # completed but still checked, a new subscriber gets the report and
+        # the report waits for the post-step instead of checking again
+        subscription = job_manager.add_subscriber(blocked[0].job_id)
+        report = asyncio.create_task(job_manager.get_drc_report(blocked[0].job_id))
+        await asyncio.sleep(0.1)
+        release.set()
+        summary, lines = None, []
+        while True:
+            batch = await subscription.next_batch()
+            summary = batch.drc or summary
+            lines += [line for _, line in batch.lines]
+            if batch.finished:
+                break
+        assert summary is not None
+        assert any(line.startswith("Design rule check: ") for line in lines)
+        assert json.loads(await report)["counts"] == summary.counts
+        assert BlockedChecker.calls == 2
+        await job_manager.flush()
+        # once checked, subscriptions finish at once
+        subscription = job_manager.add_subscriber(blocked[0].job_id)
+        batch = await asyncio.wait_for(subscription.next_batch(), 1)
+        assert batch.finished
+        await job_manager.close()
+        print(f"DRC: OK, {len(violations)} violations")
+
+
+# generator reporting progress through log lines and the JSON channel
+_PROGRESS_GENERATOR = """
+import argparse, json, shutil, time
+parser = argparse.ArgumentParser()
+parser.add_argument("--output")
+parser.add_argument("--cell-name")
+parser.add_argument("--config")
+args = parser.parse_args()
+for index in range(1, 201):
+    print(f"[{{index}}/200] Generate polygon layer=Metal1", flush=True)
+    time.sleep(0.002)
+print(json.dumps({{"done": 5, "total": 5}}), flush=True)
+shutil.copyfile({data!r}, args.output)
+"""
+
+
+async def test_progress() -> None:
+    assert parse_progress("[17/420] Generate polygon layer=Metal1") == (17, 420, False)
+    assert parse_progress('{"done": 3, "total": 4}') == (3, 4, True)
+    assert parse_progress("Polygons: 320") is None
+    assert parse_progress('{"done": "3"}') is None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_PROGRESS_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        job_manager = JobManager(jobs_dir, generator)
+
+        # a progress-only subscriber gets a handful of coalesced updates
+        request = GenerateRequest(cell_name="progress")
+        job = await job_manager.create_job(request)
+        subscription = job_manager.add_subscriber(job.job_id, logs=False)
+        await job_manager.start_job(job.job_id, request)
+        updates = []
+        while True:
+            batch = await subscription.next_batch()
+            assert not batch.lines
+            if batch.progress:
+                updates.append(batch.progress)
+            if batch.finished:
+                break
+        assert 1 < len(updates) < 50, len(updates)
+        assert (updates[-1].done, updates[-1].total, updates[-1].eta) == (5, 5, 0.0)
+        assert updates[-2].rate and updates[-2].rate > 0
+
+        # the status carries the latest progress, JSON lines are not logged
+        assert job.status == JobStatus.COMPLETED and job.progress == updates[-1]
+        history = await job_manager.get_history(job.job_id)
+        assert len(history) == 200 and history[-1].startswith("[200/200]")
+        print("Progress: OK")
+
+
+async def test_metrics() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("seconds", "Test.", ("kind",), buckets=(1, 5))
+    for value in (0.5, 1, 3, 7):
+        histogram.labels("a").observe(value)
+    text = registry.render()
+    assert '# TYPE seconds histogram\nseconds_bucket{kind="a",le="1"} 2\n' in text
+    assert 'seconds_bucket{kind="a",le="+Inf"} 4\n' in text
+    assert 'seconds_sum{kind="a"} 11.5\n' in text
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(
+            _CHATTY_GENERATOR.format(lines=500, data=str(DATA_DIR / "data.txt"))
+        )
+        metrics = MetricsRegistry()
+        parser = LayoutParser(metrics=metrics)
+        job_manager = JobManager(
+            jobs_dir,
+            generator,
+            max_concurrent=1,
+            subscriber_buffer=50,
+            metrics=metrics,
+        )
+
+        async def broken_hook(job: Job, output_path: Path) -> None:
+            raise RuntimeError("hook failed")
+
+        job_manager.completion_hooks.append(broken_hook)
+
+        # one job runs with a stalled subscriber while another waits its turn
+        request = GenerateRequest(cell_name="metrics")
+        job = await job_manager.create_job(request)
+        stalled = job_manager.add_subscriber(job.job_id)
+        await job_manager.start_job(job.job_id, request)
+        queued_request = GenerateRequest(cell_name="queued")
+        queued = await job_manager.create_job(queued_request)
+        await job_manager.start_job(queued.job_id, queued_request)
+        while job.status == JobStatus.PENDING:
+            await asyncio.sleep(0)
+        assert metrics.value("layout_jobs", status="running") == 1
+        assert metrics.value("layout_jobs", status="pending") == 1
+        assert metrics.value("layout_jobs_queued") == 1
+        await job_manager.cancel_job(queued.job_id)
+        await _wait_for_completion(job_manager, [job.job_id])
+
+        assert metrics.value("layout_jobs", status="completed") == 1
+        assert metrics.value("layout_jobs_finished_total", status="cancelled") == 1
+        assert metrics.value("layout_generator_output_lines_total") == 500
+        assert metrics.value(
+            "layout_generator_duration_seconds_count", outcome="completed"
+        ) == 1
+        assert metrics.value("layout_sse_subscribers", job_id=job.job_id) == 1
+        assert metrics.value("layout_sse_queue_depth", job_id=job.job_id) == 50
+        await job_manager.flush()
+        assert metrics.value("layout_background_failures_total", task="hook") == 1
+        # finished generators have no rate and closed streams no series
+        job_manager.remove_subscriber(job.job_id, stalled)
+        text = metrics.render()
+        assert "layout_job_output_lines_per_second{" not in text
+        assert "layout_sse_subscribers{" not in text
+
+        # one miss parses the file, the next lookup is a hit
+        output_path = job_manager.get_output_path(job.job_id)
+        await parser.parse_layout_file(output_path)
+        await parser.parse_layout_file(output_path)
+        size = output_path.stat().st_size
+        assert metrics.value("layout_parse_bytes_total", format="yaml") == size
+        assert metrics.value("layout_parse_seconds_count", format="yaml") == 1
+        assert metrics.value("layout_cache_hit_ratio") == 0.5
+        print("Metrics: OK")
+
+
+# generator with an in-process entry point, importing the heavy libraries the
+# real generators use
+_WORKER_GENERATOR = """
+import argparse, os, shutil, time
+import matplotlib.pyplot
+import numpy
+import yaml
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output")
+    parser.add_argument("--cell-name")
+    parser.add_argument("--config")
+    args = parser.parse_args(argv)
+    print("pid", os.getpid())
+    if args.cell_name == "fail":
+        return 3
+    if args.cell_name == "crash":
+        os._exit(9)
+    if args.cell_name == "slow":
+        time.sleep(30)
+    shutil.copyfile({data!r}, args.output)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
+"""
+
+
+# generator whose last write does not end its line
+_UNTERMINATED_GENERATOR = """
+import argparse, shutil, sys
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output")
+    parser.add_argument("--cell-name")
+    parser.add_argument("--config")
+    args = parser.parse_args(argv)
+    print("first line")
+    if args.cell_name == "unterminated":
+        sys.stdout.write("progress without newline")
+    else:
+        print("last line")
+    shutil.copyfile({data!r}, args.output)
+"""
+
+
+async def test_worker_output() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(
+            _UNTERMINATED_GENERATOR.format(data=str(DATA_DIR / "data.txt"))
+        )
+        job_manager = JobManager(jobs_dir, generator, workers=1)
+        await job_manager.start()
+        try:
+            # the job ends instead of waiting for the sentinel line forever
+            cell_names = ["unterminated", "terminated", "unterminated"]
+            jobs = await asyncio.wait_for(_run_jobs(job_manager, cell_names), 30)
+            assert all(job.status == JobStatus.COMPLETED for job in jobs)
+            histories = [await job_manager.get_history(job.job_id) for job in jobs]
+            assert histories == [
+                ["first line", "progress without newline"],
+                ["first line", "last line"],
+                ["first line", "progress without newline"],
+            ], histories
+        finally:
+            await job_manager.close()
+        print("Worker output: OK")
+
+
+# generator spending about 0.6 cpu seconds per job
+_BUSY_GENERATOR = """
+import argparse, shutil, time
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output")
+    parser.add_argument("--cell-name")
+    parser.add_argument("--config")
+    args = parser.parse_args(argv)
+    end = time.process_time() + 0.6
+    while time.process_time() < end:
+        pass
+    shutil.copyfile({data!r}, args.output)
+"""
+
+
+async def test_worker_limits() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_BUSY_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        # three jobs share one worker: together they exceed both the cpu limit
+        # and the timeout, each of them alone does not
+        job_manager = JobManager(
+            jobs_dir, generator, max_concurrent=3, timeout=1.5, cpu_limit=1, workers=1
+        )
+        await job_manager.start()
+        try:
+            requests = [GenerateRequest(cell_name=f"busy{i}") for i in range(3)]
+            jobs = [await job_manager.create_job(request) for request in requests]
+            for job, request in zip(jobs, requests):
+                await job_manager.start_job(job.job_id, request)
+            job_ids = [job.job_id for job in jobs]
+            await asyncio.wait_for(_wait_for_completion(job_manager, job_ids), 30)
+            statuses = [(job.status, job.error) for job in jobs]
+            assert all(job.status == JobStatus.COMPLETED for job in jobs), statuses
+        finally:
+            await job_manager.close()
+        print("Worker limits: OK")
+
+
+async def _run_jobs(job_manager: JobManager, cell_names: list[str]) -> list[Job]:
+    jobs = []
+    for cell_name in cell_names:
+        request = GenerateRequest(cell_name=cell_name)
+        job = await job_manager.create_job(request)
+        await job_manager.start_job(job.job_id, request)
+        await _wait_for_completion(job_manager, [job.job_id])
+        jobs.append(job)
+    return jobs
+
+
+async def test_workers(count: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # the bundled generator runs in-process
+        output = Path(tmp_dir) / "direct.yaml"
+        with contextlib.redirect_stdout(io.StringIO()):
+            code = test_generator.main(["--output", str(output), "--delay-ms", "0"])
+        assert code == 0
+        assert output.read_bytes() == (DATA_DIR / "data.txt").read_bytes()
+        records = (Path(tmp_dir) / PARTIAL_FILE).read_text().splitlines()
+        assert json.loads(records[0])["type"] == "header" and len(records) > 300
+
+        jobs_dir = Path(tmp_dir) / "jobs"
+        generator = Path(tmp_dir) / "generator.py"
+        generator.write_text(_WORKER_GENERATOR.format(data=str(DATA_DIR / "data.txt")))
+        job_manager = JobManager(jobs_dir, generator, workers=1, worker_max_jobs=3)
+        await job_manager.start()
+
+        # jobs share a worker until it is recycled after max_jobs
+        jobs = await _run_jobs(job_manager, ["a", "fail", "b", "c"])
+        pids = [(await job_manager.get_history(job.job_id))[0] for job in jobs]
+        assert pids[0] == pids[1] == pids[2] != pids[3], pids
+        assert [job.status for job in jobs] == [
+            JobStatus.COMPLETED,
+            JobStatus.FAILED,
+            JobStatus.COMPLETED,
+            JobStatus.COMPLETED,
+        ]
+        assert jobs[1].error == "Generator exited with code 3"
+
+        # a crashed worker fails its job and is replaced
+        crashed, after = await _run_jobs(job_manager, ["crash", "d"])
+        assert crashed.status == JobStatus.FAILED and "worker" in crashed.error
+        assert after.status == JobStatus.COMPLETED
+
+        # cancelling and timeouts kill the worker
+        request = GenerateRequest(cell_name="slow")
+        slow = await job_manager.create_job(request)
+        await job_manager.start_job(slow.job_id, request)
+        await asyncio.sleep(0.2)
+        await job_manager.cancel_job(slow.job_id)
+        assert slow.status == JobStatus.CANCELLED
+        job_manager.timeout = 0.5
+        timed_out, after = await _run_jobs(job_manager, ["slow", "e"])
+        assert timed_out.status == JobStatus.FAILED and "timed out" in timed_out.error
+        assert after.status == JobStatus.COMPLETED
+        await job_manager.close()
+        print("Workers: OK")
+
+        # latency of sequential jobs, one interpreter per job vs warm workers
+        for workers in (0, 1):
+            job_manager = JobManager(jobs_dir, generator, workers=workers)
+            await job_manager.start()
+            start = time.perf_counter()
+            jobs = await _run_jobs(job_manager, [f"bench{i}" for i in range(count)])
+            elapsed = (time.perf_counter() - start) / count
+            await job_manager.close()
+            assert all(job.status == JobStatus.COMPLETED for job in jobs)
+            mode = "workers" if workers else "subprocess"
+            print(f"{mode}: {elapsed * 1000:.0f} ms per job")
 
 
 async def main() -> None:
@@ -47,8 +693,57 @@ async def main() -> None:
         default=str(GENERATOR_SCRIPT),
         help="Path to generator script.",
     )
+    parser.add_argument(
+        "--scenario",
+        choices=[
+            "jobs",
+            "registry",
+            "result-cache",
+            "scheduler",
+            "progress",
+            "streaming",
+            "drc",
+            "metrics",
+            "worker-output",
+            "worker-limits",
+            "workers",
+        ],
+        default="jobs",
+        help="Run concurrent jobs, or one of the fast scenarios.",
+    )
     args = parser.parse_args()
 
+    if args.scenario == "result-cache":
+        await test_result_cache()
+        return
+    if args.scenario == "scheduler":
+        await test_scheduler()
+        return
+    if args.scenario == "registry":
+        await test_registry()
+        return
+    if args.scenario == "progress":
+        await test_progress()
+        return
+    if args.scenario == "streaming":
+        await test_streaming()
+        return
+    if args.scenario == "drc":
+        await test_drc()
+        return
+    if args.scenario == "metrics":
+        await test_metrics()
+        return
+    if args.scenario == "worker-output":
+        await test_worker_output()
+        return
+    if args.scenario == "worker-limits":
+        await test_worker_limits()
+        return
+    if args.scenario == "workers":
+        await test_workers(args.jobs)
+        return
+
     generator_path = Path(args.generator).resolve()
     job_manager = JobManager(JOBS_DIR, generator_path)
 
@@ -1,9 +1,48 @@
 from __future__ import annotations
 
 import asyncio
+import copy
+import gzip
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import yaml
 
 from backend.config import DATA_DIR
-from backend.services.layout_parser import LayoutParser
+from backend.layout_repr import ReprFormatError, read_layout
+from backend.layout_synth import write_layout
+from backend.models import DrcRules, InstancedLayout, LayoutData, Polygon
+from backend.services.layout_arrays import LayoutArrays
+from backend.services.layout_cache import snapshot_path
+from backend.services.layout_diff import _match_exact, diff_layouts, match_rows
+from backend.services.layout_drc import (
+    LayoutChecker,
+    check_enclosure,
+    check_spacing,
+    check_width,
+)
+from backend.services.layout_instances import expand_instances, instance_layout
+from backend.services.layout_nets import LayoutNets, conductor_stack
+from backend.services.layout_parser import (
+    LayoutParser,
+    _fast_layout_arrays,
+    _fast_layout_json,
+    _fast_parse,
+    _FastParseError,
+    _LayoutLoader,
+)
+from backend.services.layout_preview import LayoutPreviews
+from backend.services.layout_stats import layout_stats, union_area
+from backend.services.layout_stream import LayoutTail
+from backend.services.spatial_index import LayoutIndex
 
 
 async def test_layout_parser() -> None:
@@ -25,8 +64,663 @@ async def test_layout_parser() -> None:
     if parsed.labels:
         print("First label:", parsed.labels[0])
 
+    # the fast path must produce exactly what the generic yaml loader does
+    content = yaml_path.read_text()
+    start = time.perf_counter()
+    fast = _fast_parse(content)
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    slow = yaml.load(content, Loader=_LayoutLoader)
+    slow_time = time.perf_counter() - start
+    assert fast == slow, "fast path differs from yaml loader"
+    print(f"Fast path: {fast_time * 1000:.1f} ms, yaml: {slow_time * 1000:.1f} ms")
+
+    # anything outside the generator schema falls back to the yaml loader
+    fallback = parser._load("# comment\n" + content)
+    assert fallback == slow, "fallback differs from yaml loader"
+
+    # decode the columnar binary encoding and compare it with the models
+    body = await parser.parse_layout_binary(yaml_path)
+    magic, version, meta_len, n_polygons, n_labels = struct.unpack_from("<4sIIII", body)
+    assert (magic, version) == (b"LCLB", 1)
+    metadata = json.loads(body[20 : 20 + meta_len])
+    coords = np.frombuffer(body, "<f4", n_polygons * 4, 20 + meta_len).reshape(-1, 4)
+    decoded = sorted(
+        (layer["name"], *map(float, coords[i]))
+        for layer in metadata["layers"]
+        for i in range(layer["offset"], layer["offset"] + layer["count"])
+    )
+    expected = sorted(
+        (p.layer, *map(float, np.float32([p.x0, p.y0, p.x1, p.y1])))
+        for p in parsed.polygons
+    )
+    assert decoded == expected, "binary polygons differ from parsed layout"
+    assert metadata["label_texts"] == [label.text for label in parsed.labels]
+    print("Binary:", len(body), "bytes,", len(parsed.model_dump_json()), "bytes as JSON")
+
     return 0
 
 
+async def test_layout_cache() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        layout_path = Path(tmp_dir) / "layout.yaml"
+        shutil.copyfile(DATA_DIR / "data.txt", layout_path)
+
+        # the first parse writes a snapshot next to the layout file
+        first = LayoutParser(snapshots=True)
+        parsed = await first.parse_layout_file(layout_path)
+        assert snapshot_path(layout_path).exists()
+        assert await first.parse_layout_file(layout_path) is parsed
+        assert first.cache_stats()["hits"] == 1
+
+        # a fresh parser, as after a restart, loads the snapshot instead
+        start = time.perf_counter()
+        restored = await LayoutParser(snapshots=True).parse_layout_file(layout_path)
+        print(f"Snapshot load: {(time.perf_counter() - start) * 1000:.1f} ms")
+        assert restored.model_dump_json() == parsed.model_dump_json()
+
+        # a changed file invalidates both tiers
+        layout_path.write_text(layout_path.read_text().replace("v_out", "v_mid"))
+        changed = await first.parse_layout_file(layout_path)
+        assert changed.labels[-1].text == "v_mid"
+        restored = await LayoutParser(snapshots=True).parse_layout_file(layout_path)
+        assert restored.labels[-1].text == "v_mid"
+
+        # the memory tier evicts least recently used layouts over budget
+        other_path = Path(tmp_dir) / "other.yaml"
+        shutil.copyfile(DATA_DIR / "data.txt", other_path)
+        small = LayoutParser(max_cache_bytes=1)
+        await small.parse_layout_file(layout_path)
+        await small.parse_layout_file(other_path)
+        stats = small.cache_stats()
+        assert stats["entries"] == 1 and stats["evictions"] == 1
+        print("Cache stats:", stats)
+
+
+async def test_layout_json() -> None:
+    parser = LayoutParser()
+    data = parser._load((DATA_DIR / "data.txt").read_text())
+
+    # the fast path produces the exact bytes of the validated models
+    expected = parser._to_parsed_layout(data).model_dump_json().encode()
+    assert _fast_layout_json(data) == expected
+
+    # values pydantic would coerce go through the models, with the same output
+    odd = copy.deepcopy(data)
+    odd["polygons"][0][1]["x0"] = 1
+    odd["polygons"][1][1]["y1"] = float("nan")
+    odd["labels"][0][1] = {**odd["labels"][0][1], "x0": None}
+    for raw in (odd, {}):
+        assert parser._to_layout_json(raw) == (
+            parser._to_parsed_layout(raw).model_dump_json().encode()
+        )
+    for fast in (_fast_layout_json, _fast_layout_arrays):
+        try:
+            fast(odd)
+        except _FastParseError:
+            pass
+        else:
+            raise AssertionError("int coordinate skipped validation")
+
+    # so are the arrays, field by field
+    arrays = _fast_layout_arrays(data)
+    expected_arrays = LayoutArrays.from_layout(parser._to_parsed_layout(data))
+    for name, value in vars(expected_arrays).items():
+        assert np.array_equal(getattr(arrays, name), value), name
+
+    # per-polygon cost with and without per-element models
+    large = {**data, "polygons": data["polygons"] * 1000}
+    start = time.perf_counter()
+    expected = parser._to_parsed_layout(large).model_dump_json().encode()
+    models_time = time.perf_counter() - start
+    start = time.perf_counter()
+    fast = parser._to_layout_json(large)
+    fast_time = time.perf_counter() - start
+    assert fast == expected
+    count = len(large["polygons"])
+    print(
+        f"Layout JSON of {count} polygons: models {models_time / count * 1e6:.2f} us"
+        f"/polygon, fast path {fast_time / count * 1e6:.2f} us/polygon"
+    )
+
+
+async def test_layout_body() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        layout_path = Path(tmp_dir) / "layout.yaml"
+        shutil.copyfile(DATA_DIR / "data.txt", layout_path)
+        parser = LayoutParser()
+
+        # concurrent requests share one build, later ones hit the cache
+        bodies = await asyncio.gather(
+            *(parser.parse_layout_body(layout_path) for _ in range(4))
+        )
+        body = bodies[0]
+        assert all(other is body for other in bodies)
+        assert await parser.parse_layout_body(layout_path) is body
+        layout = await parser.parse_layout_file(layout_path)
+        assert json.loads(body.identity) == layout.model_dump(mode="json")
+        assert gzip.decompress(body.gzip) == body.identity
+
+        # the ETag only depends on the content
+        fresh = await LayoutParser().parse_layout_body(layout_path)
+        assert fresh.etag == body.etag and fresh.gzip == body.gzip
+        assert body.matches(body.etag) and body.matches(f"W/{body.etag}, \"x\"")
+        assert body.matches("*") and not body.matches('"other"')
+
+        # content negotiation
+        assert body.encode("") == (body.identity, None)
+        assert body.encode("gzip, deflate") == (body.gzip, "gzip")
+        assert body.encode("gzip;q=0, deflate") == (body.identity, None)
+        if body.brotli is not None:
+            assert body.encode("gzip, br") == (body.brotli, "br")
+        print(f"Layout body: {len(body.identity)} B, gzip {len(body.gzip)} B")
+
+        # a changed file gets a new body and ETag
+        layout_path.write_text(layout_path.read_text().replace("v_out", "v_mid"))
+        changed = await parser.parse_layout_body(layout_path)
+        assert changed.etag != body.etag
+
+
+async def test_layout_preview() -> None:
+    # warming the body and preview of a completed job builds no models
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        layout_path = Path(tmp_dir) / "layout.yaml"
+        shutil.copyfile(DATA_DIR / "data.txt", layout_path)
+        warm = LayoutParser(snapshots=True)
+        await warm.parse_layout_body(layout_path)
+        (await warm.parse_layout_previews(layout_path)).render(256)
+        assert (await warm._get_entry(layout_path)).layout is None
+        assert not snapshot_path(layout_path).exists()
+
+    parser = LayoutParser()
+    previews = await parser.parse_layout_previews(DATA_DIR / "data.txt")
+    png = previews.render(256)
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+    width, height = struct.unpack(">II", png[16:24])
+    assert (width, height) == (256, 195)
+    assert previews.render(256) is png
+    metals = previews.render(256, layers=["Metal1", "Metal2", "unknown"])
+    assert metals != png and previews.render(64, 64) != png
+
+    # rendering cost on 1M rectangles spread over 20 layers
+    rng = np.random.default_rng(0)
+    size = 1_000_000
+    arrays = LayoutArrays.from_layout(await parser.parse_layout_file(DATA_DIR / "data.txt"))
+    corner = rng.random((size, 2)) * [arrays.canvas_width, arrays.canvas_height]
+    layers = np.sort(rng.integers(0, 20, size)).astype(np.int32)
+    arrays.polygon_coords = np.hstack((corner, corner + rng.random((size, 2)) * 0.2))
+    arrays.polygon_layers = layers
+    arrays.layer_offsets = np.searchsorted(layers, np.arange(len(arrays.layers) + 1))
+    large = LayoutPreviews(arrays)
+    start = time.perf_counter()
+    large.render(256)
+    print(f"Preview of {size} polygons: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+async def test_layout_repr() -> None:
+    raw = (DATA_DIR / "demofile-data-routes.txt").read_bytes()
+    data = read_layout(io.BytesIO(raw))
+    assert len(data["polygons"]) == raw.count(b"Boundbox(") == 125
+    assert data["polygons"][0] == [
+        "Metal4",
+        {"x0": 0.555, "y0": 3.3, "x1": 2.835, "y1": 3.8, "width": 2.28, "height": 0.5},
+    ]
+    assert data["layer_maps"]["VIA1"] == "VIA1" and data["labels"] == []
+    # entries cut anywhere by the chunk boundaries parse the same
+    for chunk_size in (1, 7, 4096):
+        assert read_layout(io.BytesIO(raw), chunk_size) == data
+    for bad in (raw[:-20], raw.replace(b"width: 2.28", b"width: x"), raw + b"junk"):
+        try:
+            read_layout(io.BytesIO(bad))
+        except ReprFormatError:
+            continue
+        raise AssertionError("malformed dump parsed")
+
+    # the parser detects dumps, and overlays them on a layout
+    parser = LayoutParser()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        routes_path = Path(tmp_dir) / "routes.txt"
+        routes_path.write_bytes(raw)
+        routes = await parser.parse_layout_file(routes_path)
+        assert routes == parser.parse_layout_text(raw.decode())
+        assert routes == parser.read_layout_file(routes_path)
+        body = await parser.parse_layout_overlay(DATA_DIR / "data.txt", routes_path)
+        merged = json.loads(body.identity)
+        base = await parser.parse_layout_file(DATA_DIR / "data.txt")
+        assert len(merged["polygons"]) == len(base.polygons) + len(routes.polygons)
+        assert merged["polygons"][-1] == routes.polygons[-1].model_dump()
+        assert merged["canvas_width"] == base.canvas_width
+
+        # a new upload of the overlay replaces the body of the previous one
+        entry = await parser._get_entry(DATA_DIR / "data.txt")
+        held = parser.cache_stats()["bytes"]
+        routes_path.write_bytes(raw.replace(b"Metal4", b"Metal5", 1))
+        os.utime(routes_path, ns=(1, 1))
+        again = await parser.parse_layout_overlay(DATA_DIR / "data.txt", routes_path)
+        assert again.etag != body.etag
+        overlays = [key for key in entry.derived if key.startswith("overlay:")]
+        assert len(overlays) == 1
+        assert parser.cache_stats()["bytes"] < held + body.nbytes
+
+    # streaming cost on a single-line dump of 1M entries
+    entries = raw.strip()[1:-1]
+    large = b"[" + b", ".join([entries] * 8000) + b"]"
+    start = time.perf_counter()
+    count = len(read_layout(io.BytesIO(large))["polygons"])
+    elapsed = time.perf_counter() - start
+    print(f"Repr dump of {count} polygons ({len(large) >> 20} MiB): {elapsed:.2f} s")
+
+
+async def test_layout_synth() -> None:
+    # the same size and seed give the same bytes, the fast path reads them
+    # like yaml does, and every label resolves to an anchored metal shape
+    handle = io.StringIO()
+    labels = write_layout(handle, 5000, seed=3)
+    text = handle.getvalue()
+    again = io.StringIO()
+    write_layout(again, 5000, seed=3)
+    assert again.getvalue() == text
+    other = io.StringIO()
+    write_layout(other, 5000, seed=4)
+    assert other.getvalue() != text
+    assert _fast_parse(text) == yaml.load(text, Loader=_LayoutLoader)
+
+    layout = LayoutParser().parse_layout_text(text)
+    assert len(layout.polygons) == 5000 and len(layout.labels) == labels > 0
+    layers = [polygon.layer for polygon in layout.polygons]
+    assert max(set(layers), key=layers.count) == "Contact"
+    assert {label.layer for label in layout.labels} <= {"Metal2", "Metal3", "Metal4"}
+    assert all(
+        0 <= polygon.x0 < polygon.x1 <= layout.canvas_width
+        and 0 <= polygon.y0 < polygon.y1 <= layout.canvas_height
+        for polygon in layout.polygons
+    )
+
+
+async def test_layout_stats() -> None:
+    # two overlapping squares, one stacked twice: union 4 + 4 - 1
+    boxes = np.array(
+        [[0, 0, 2, 2], [1, 1, 3, 3], [1, 1, 3, 3], [5, 5, 5, 6]], dtype=np.float64
+    )
+    windows = (np.arange(0.0, 5.0, 2.0), np.arange(0.0, 5.0, 2.0))
+    density = np.zeros((2, 2))
+    assert union_area(boxes, windows, density) == 7
+    assert density.tolist() == [[4.0, 1.0], [1.0, 1.0]]
+
+    # matches a brute-force union on random boxes, also when split in grids
+    rng = np.random.default_rng(0)
+    corners = np.round(rng.random((60, 2)) * 10, 2)
+    boxes = np.hstack((corners, corners + np.round(rng.random((60, 2)) * 3, 2)))
+    xs, ys = np.unique(boxes[:, [0, 2]]), np.unique(boxes[:, [1, 3]])
+    mx, my = np.meshgrid((xs[1:] + xs[:-1]) / 2, (ys[1:] + ys[:-1]) / 2)
+    inside = np.zeros(mx.shape, dtype=bool)
+    for x0, y0, x1, y1 in boxes:
+        inside |= (mx > x0) & (mx < x1) & (my > y0) & (my < y1)
+    expected = float(np.diff(ys) @ inside @ np.diff(xs))
+    windows = (np.arange(0.0, 16.0, 3.0), np.arange(0.0, 16.0, 3.0))
+    for max_cells in (1 << 17, 64):
+        with patch("backend.services.layout_stats._MAX_CELLS", max_cells):
+            density = np.zeros((5, 5))
+            assert abs(union_area(boxes, windows, density) - expected) < 1e-9
+            assert abs(density.sum() - expected) < 1e-9
+
+    parser = LayoutParser()
+    arrays = await parser.parse_layout_arrays(DATA_DIR / "data.txt")
+    stats = layout_stats(arrays, 2.0)
+    assert (stats.rows, stats.columns) == (3, 4)
+    contact = stats.layers["Contact"]
+    assert contact.polygons == 132 and contact.bounds == [0.25, 0.17, 7.53, 5.585]
+    assert contact.union_area <= contact.total_area
+    window_area = sum(map(sum, contact.density)) * 4.0
+    assert abs(window_area - contact.union_area) < 1e-9
+    body = await parser.parse_layout_stats(DATA_DIR / "data.txt", 2.0)
+    assert await parser.parse_layout_stats(DATA_DIR / "data.txt", 2.0001) is body
+    # too many windows are refused before any work
+    try:
+        await parser.parse_layout_stats(DATA_DIR / "data.txt", 0.01)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("578 x 778 windows accepted")
+
+    # cost on 1M polygons: the layout tiled 56 x 56 times, on a copy of the
+    # parser's arrays
+    arrays = copy.copy(arrays)
+    copies = 56
+    steps = np.arange(copies)
+    dx, dy = np.meshgrid(steps * arrays.canvas_width, steps * arrays.canvas_height)
+    offsets = np.column_stack((dx.ravel(), dy.ravel(), dx.ravel(), dy.ravel()))
+    coords = arrays.polygon_coords[None] + offsets[:, None]
+    layers = np.broadcast_to(arrays.polygon_layers, coords.shape[:2]).ravel()
+    order = np.argsort(layers, kind="stable")
+    arrays.polygon_coords = coords.reshape(-1, 4)[order]
+    arrays.polygon_layers = layers[order]
+    arrays.layer_offsets = arrays.layer_offsets * len(offsets)
+    arrays.canvas_width *= copies
+    arrays.canvas_height *= copies
+    start = time.perf_counter()
+    layout_stats(arrays, 10.0)
+    elapsed = time.perf_counter() - start
+    print(f"Stats of {len(order)} polygons: {elapsed:.2f} s")
+
+
+async def test_layout_nets() -> None:
+    metals, vias = conductor_stack({"VIA1": "VIA1", "Metal2": "Metal2"}, ["Metal1"])
+    assert (metals, vias) == ({"Metal1": 1, "Metal2": 2}, {"VIA1": 1})
+
+    # VIA2 joins Metal2 and Metal3 by number, with no VIA1 in the layout
+    layout = LayoutData(
+        canvas_width=2,
+        canvas_height=2,
+        start_x=0,
+        start_y=0,
+        layer_maps={},
+        polygons=[
+            Polygon(layer=layer, x0=0, y0=0, x1=1, y1=1, width=1, height=1)
+            for layer in ["Metal1", "Metal2", "VIA2", "Metal3"]
+        ],
+        labels=[],
+    )
+    stacked = LayoutNets(LayoutIndex(layout, LayoutArrays.from_layout(layout)))
+    assert stacked.polygon_nets.tolist() == [0, 1, 1, 1]
+
+    parser = LayoutParser()
+    nets = await parser.parse_layout_nets(DATA_DIR / "data.txt")
+    assert await parser.parse_layout_nets(DATA_DIR / "data.txt") is nets
+    listed = json.loads(nets.to_json())["nets"]
+    assert [net["name"] for net in listed] == ["VSS", "v_out", "v_in", "VDD", "v_in"]
+    # v_out is labelled on Metal3 and climbs the vias up to Metal5
+    assert {"Metal1", "VIA4", "Metal5"} <= set(listed[1]["layers"])
+
+    # every polygon of a net touches another one of it, and the net at any of
+    # its polygons is the net itself
+    layout = await parser.parse_layout_file(DATA_DIR / "data.txt")
+    highlight = nets.highlight(1)
+    assert len(highlight.polygons) == listed[1]["polygons"]
+    polygon = layout.polygons[highlight.polygons[0]]
+    x, y = (polygon.x0 + polygon.x1) / 2, (polygon.y0 + polygon.y1) / 2
+    assert nets.net_at(x, y, [polygon.layer]).net.id == 1
+    assert nets.net_at(-100.0, -100.0) is None
+
+    # cost on 1M polygons: the layout tiled 56 x 56 times
+    arrays = copy.copy(await parser.parse_layout_arrays(DATA_DIR / "data.txt"))
+    copies = 56
+    steps = np.arange(copies)
+    dx, dy = np.meshgrid(steps * arrays.canvas_width, steps * arrays.canvas_height)
+    offsets = np.column_stack((dx.ravel(), dy.ravel(), dx.ravel(), dy.ravel()))
+    coords = arrays.polygon_coords[None] + offsets[:, None]
+    layers = np.broadcast_to(arrays.polygon_layers, coords.shape[:2]).ravel()
+    order = np.argsort(layers, kind="stable")
+    arrays.polygon_coords = coords.reshape(-1, 4)[order]
+    arrays.polygon_layers = layers[order]
+    arrays.polygon_order = order.astype(np.int64)
+    arrays.layer_offsets = arrays.layer_offsets * len(offsets)
+    index = LayoutIndex(layout, arrays)
+    start = time.perf_counter()
+    tiled = LayoutNets(index)
+    elapsed = time.perf_counter() - start
+    print(f"Nets of {len(order)} polygons: {elapsed:.2f} s, {tiled.net_count} nets")
+
+
+async def test_layout_drc() -> None:
+    boxes = [
+        ("M1", 0, 0, 1, 0.1),  # 0.1 wide
+        ("M1", 1.2, 0, 2, 1),  # 0.2 from the first one
+        ("M1", 1.2, 0, 2, 1),  # stacked copy
+        ("M1", 2, 1, 3, 2),  # touches the second one at a corner
+        ("M1", 3.25, 2.2, 4, 3),  # 0.25 and 0.2 away diagonally
+        ("M1", 2, 0.5, 2.5, 1.5),  # shares the second one's right edge
+        ("V1", 1.3, 0.3, 1.5, 0.5),  # enclosed by 0.1
+        ("V1", 1.9, 0.8, 2.1, 0.95),  # across two metal shapes
+        ("V1", 5, 5, 5.1, 5.1),  # no metal
+    ]
+    layout = LayoutData(
+        canvas_width=6,
+        canvas_height=6,
+        start_x=0,
+        start_y=0,
+        layer_maps={},
+        polygons=[
+            Polygon(
+                layer=layer, x0=x0, y0=y0, x1=x1, y1=y1, width=x1 - x0, height=y1 - y0
+            )
+            for layer, x0, y0, x1, y1 in boxes
+        ],
+        labels=[],
+    )
+    arrays = LayoutArrays.from_layout(layout)
+    narrow = check_width(arrays, "M1", 0.2)
+    assert [(v.polygons, v.value) for v in narrow] == [([0], 0.1)]
+    spacing = sorted(check_spacing(arrays, "M1", 0.4), key=lambda v: v.value)
+    assert [v.polygons for v in spacing] == [[0, 1, 2], [3, 4]]
+    assert abs(spacing[0].value - 0.2) < 1e-9 and spacing[0].bounds == [1, 0, 1.2, 0.1]
+    assert abs(spacing[1].value - np.hypot(0.25, 0.2)) < 1e-9
+    # the via across two shapes is enclosed by their union
+    enclosure = check_enclosure(arrays, "V1", "M1", 0.05)
+    assert [(v.polygons, v.value) for v in enclosure] == [([8], 0.0)]
+    enclosure = check_enclosure(arrays, "V1", "M1", 0.15)
+    assert [v.polygons for v in enclosure] == [[6], [7], [8]]
+    assert check_width(arrays, "M9", 1.0) == []
+
+    # the sample rules pass on the sample layout
+    rules = DrcRules.model_validate_json((DATA_DIR / "drc_rules.json").read_text())
+    parser = LayoutParser()
+    report = await LayoutChecker(rules, parser).check(DATA_DIR / "data.txt")
+    assert not report.violations and report.polygons > 0
+
+    # cost on 1M polygons: the layout tiled 56 x 56 times, Contact included
+    arrays = copy.copy(await parser.parse_layout_arrays(DATA_DIR / "data.txt"))
+    copies = 56
+    steps = np.arange(copies)
+    dx, dy = np.meshgrid(steps * arrays.canvas_width, steps * arrays.canvas_height)
+    offsets = np.column_stack((dx.ravel(), dy.ravel(), dx.ravel(), dy.ravel()))
+    coords = arrays.polygon_coords[None] + offsets[:, None]
+    layers = np.broadcast_to(arrays.polygon_layers, coords.shape[:2]).ravel()
+    order = np.argsort(layers, kind="stable")
+    arrays.polygon_coords = coords.reshape(-1, 4)[order]
+    arrays.polygon_layers = layers[order]
+    arrays.polygon_order = order.astype(np.int64)
+    arrays.layer_offsets = arrays.layer_offsets * len(offsets)
+    rules.width["Contact"] = rules.spacing["Contact"] = 0.07
+    checker = LayoutChecker(rules, parser)
+    with patch.object(parser, "parse_layout_arrays", return_value=arrays):
+        report = await checker.check(DATA_DIR / "data.txt")
+    assert not report.violations
+    print(
+        f"DRC of {report.polygons} polygons: {report.seconds:.2f} s, "
+        f"{report.polygons_per_second:.0f} polygons/s"
+    )
+
+
+async def test_layout_instances() -> None:
+    # every polygon comes back from the instances, stacked copies included
+    def boxes(layout: LayoutData) -> list[tuple]:
+        rows = []
+        for p in layout.polygons:
+            box = [min(p.x0, p.x1), min(p.y0, p.y1), max(p.x0, p.x1), max(p.y0, p.y1)]
+            rows.append((p.layer, *np.round(box, 6).tolist()))
+        return sorted(rows)
+
+    parser = LayoutParser()
+    for name in ("data.txt", "demofile-data-routes.txt"):
+        layout = await parser.parse_layout_file(DATA_DIR / name)
+        arrays = await parser.parse_layout_arrays(DATA_DIR / name)
+        instanced = instance_layout(arrays)
+        assert instanced.polygons == len(layout.polygons)
+        assert boxes(expand_instances(instanced)) == boxes(layout)
+        assert all(group.offsets[0] == [0, 0] for group in instanced.groups)
+
+        # numbers stored and bytes served against the plain layout
+        plain = await parser.parse_layout_body(DATA_DIR / name)
+        body = await parser.parse_layout_instances(DATA_DIR / name)
+        assert await parser.parse_layout_instances(DATA_DIR / name) is body
+        assert InstancedLayout.model_validate_json(body.identity) == instanced
+        numbers = sum(
+            5 * len(group.shapes) + 2 * len(group.offsets)
+            for group in instanced.groups
+        )
+        print(
+            f"Instances of {name}: {instanced.polygons} polygons as "
+            f"{instanced.shapes} shapes in {len(instanced.groups)} groups, "
+            f"{numbers * 8} of {arrays.polygon_coords.nbytes} coordinate bytes, "
+            f"JSON {len(body.identity)} of {len(plain.identity)} bytes, "
+            f"gzip {len(body.gzip)} of {len(plain.gzip)}"
+        )
+
+    # a duplicated rectangle and a pair of shapes repeated along a row
+    polygons = [("M1", 0, 0, 1, 1), ("M1", 0, 0, 1, 1), ("M1", 5, 5, 6, 7)]
+    polygons += [("M2", x, 0, x + 1, 2) for x in range(10, 20, 2)]
+    polygons += [("V1", x + 0.25, 0.5, x + 0.75, 1) for x in range(10, 20, 2)]
+    layout = LayoutData(
+        canvas_width=20,
+        canvas_height=7,
+        start_x=0,
+        start_y=0,
+        layer_maps={},
+        polygons=[
+            Polygon(
+                layer=layer, x0=x0, y0=y0, x1=x1, y1=y1, width=x1 - x0, height=y1 - y0
+            )
+            for layer, x0, y0, x1, y1 in polygons
+        ],
+        labels=[],
+    )
+    instanced = instance_layout(LayoutArrays.from_layout(layout))
+    assert sorted(len(group.offsets) for group in instanced.groups) == [1, 2, 5]
+    assert instanced.shapes == 4
+    assert boxes(expand_instances(instanced)) == boxes(layout)
+    # coordinates come back as parsed, without rounding
+    layout.polygons = [
+        Polygon(layer="M1", x0=0.34, y0=0.07, x1=1.1, y1=0.3, width=0.76, height=0.23)
+    ]
+    expanded = expand_instances(instance_layout(LayoutArrays.from_layout(layout)))
+    assert (expanded.polygons[0].x0, expanded.polygons[0].y1) == (0.34, 0.3)
+
+    # cost on 1M polygons: the layout tiled 56 x 56 times, one tile per instance
+    arrays = copy.copy(await parser.parse_layout_arrays(DATA_DIR / "data.txt"))
+    copies = 56
+    steps = np.arange(copies)
+    dx, dy = np.meshgrid(steps * arrays.canvas_width, steps * arrays.canvas_height)
+    offsets = np.column_stack((dx.ravel(), dy.ravel(), dx.ravel(), dy.ravel()))
+    coords = arrays.polygon_coords[None] + offsets[:, None]
+    layers = np.broadcast_to(arrays.polygon_layers, coords.shape[:2]).ravel()
+    order = np.argsort(layers, kind="stable")
+    arrays.polygon_coords = coords.reshape(-1, 4)[order]
+    arrays.polygon_layers = layers[order]
+    start = time.perf_counter()
+    tiled = instance_layout(arrays)
+    elapsed = time.perf_counter() - start
+    assert [len(group.offsets) for group in tiled.groups] == [len(offsets)]
+    payload = len(tiled.model_dump_json())
+    print(
+        f"Instances of {tiled.polygons} polygons: {elapsed:.2f} s, "
+        f"{tiled.shapes} shapes, JSON {payload} bytes"
+    )
+
+
+async def test_layout_tail() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        partial_path = Path(tmp_dir) / "layout.ndjson"
+        tail = LayoutTail(partial_path)
+        assert await tail.read() is None
+
+        # only complete lines are read, malformed records are skipped
+        polygon = {"type": "polygon", "layer": "M1", "x0": 0, "y0": 0, "x1": 2, "y1": 1}
+        with open(partial_path, "w") as handle:
+            handle.write(json.dumps({"type": "header", "canvas_width": 4}) + "\n")
+            handle.write(json.dumps(polygon) + "\n")
+            handle.write('not json\n{"type": "label", "layer": "M", "x": 0')
+            handle.flush()
+            batch = await tail.read()
+            assert batch.header == {"canvas_width": 4} and not batch.labels
+            assert (batch.polygons[0].width, batch.polygons[0].height) == (2, 1)
+            assert await tail.read() is None
+
+            # the rest of a partially written line arrives later
+            handle.write(', "y": 0, "text": "b"}\n')
+            label = {"type": "label", "layer": "M", "x": 1, "y": 2, "text": "a"}
+            handle.write(json.dumps(label) + "\n")
+        batch = await tail.read()
+        assert [label.text for label in batch.labels] == ["b", "a"]
+        assert batch.offset == partial_path.stat().st_size
+
+        # resuming from an offset skips what was already read
+        resumed = await LayoutTail(partial_path, batch.offset).read()
+        assert resumed is None
+        print("Layout tail: OK")
+
+
+async def test_layout_diff() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = Path(tmp_dir) / "base.yaml"
+        target_path = Path(tmp_dir) / "target.yaml"
+        shutil.copyfile(DATA_DIR / "data.txt", base_path)
+        target_path.write_text(base_path.read_text().replace("v_out", "v_mid"))
+        parser = LayoutParser()
+        base = await parser.parse_layout_file(base_path)
+
+        # drop, add and duplicate polygons on top of the changed label
+        target = await parser.parse_layout_file(target_path)
+        new_polygon = base.polygons[0].model_copy(update={"x1": 99.0})
+        target = target.model_copy(
+            update={"polygons": target.polygons[3:] + [new_polygon, base.polygons[5]]}
+        )
+        diff = diff_layouts(
+            base,
+            LayoutArrays.from_layout(base),
+            target,
+            LayoutArrays.from_layout(target),
+        )
+        assert diff.removed_polygons == [0, 1, 2]
+        assert diff.added_polygons == [new_polygon, base.polygons[5]]
+        assert [base.labels[i].text for i in diff.removed_labels] == ["v_out"]
+        assert [label.text for label in diff.added_labels] == ["v_mid"]
+        assert sum(layer.unchanged for layer in diff.polygon_layers.values()) == (
+            len(base.polygons) - 3
+        )
+
+        # applying the delta in place yields the target geometry
+        removed = set(diff.removed_polygons)
+        patched = [p for i, p in enumerate(base.polygons) if i not in removed]
+        patched += diff.added_polygons
+        assert sorted(p.model_dump_json() for p in patched) == sorted(
+            p.model_dump_json() for p in target.polygons
+        )
+
+        # diffs are cached per pair and invalidated with either file
+        body = await parser.parse_layout_diff(base_path, target_path)
+        assert await parser.parse_layout_diff(base_path, target_path) is body
+        assert json.loads(body)["added_labels"][0]["text"] == "v_mid"
+        target_path.write_text(base_path.read_text())
+        unchanged = json.loads(await parser.parse_layout_diff(base_path, target_path))
+        assert not unchanged["removed_polygons"] and not unchanged["added_labels"]
+
+    # hashed joins agree with the exact sort on 1M rows with duplicates
+    rng = np.random.default_rng(0)
+    size = 1_000_000
+    keys_a = np.column_stack(
+        (rng.integers(0, 20, size), rng.random((size, 4)).view(np.int64))
+    )
+    keys_b = np.vstack((keys_a[1000:], keys_a[:10], rng.integers(0, 9, (990, 5))))
+    start = time.perf_counter()
+    matched_a, matched_b = match_rows(keys_a, keys_b)
+    print(f"Diff of {size} polygons: {time.perf_counter() - start:.2f} s")
+    assert (~matched_a).sum() == 990 and (~matched_b).sum() == 990
+    exact_a, exact_b = _match_exact(keys_a, keys_b)
+    assert np.array_equal(exact_a, matched_a) and np.array_equal(exact_b, matched_b)
+
+
 if __name__ == "__main__":
     asyncio.run(test_layout_parser())
+    asyncio.run(test_layout_cache())
+    asyncio.run(test_layout_json())
+    asyncio.run(test_layout_body())
+    asyncio.run(test_layout_preview())
+    asyncio.run(test_layout_repr())
+    asyncio.run(test_layout_synth())
+    asyncio.run(test_layout_stats())
+    asyncio.run(test_layout_nets())
+    asyncio.run(test_layout_drc())
+    asyncio.run(test_layout_instances())
+    asyncio.run(test_layout_tail())
+    asyncio.run(test_layout_diff())
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from backend.config import DATA_DIR
+from backend.models import TileKind
+from backend.services.layout_parser import LayoutParser
+from backend.services.layout_tiles import LayoutTiles
+from backend.services.spatial_index import STRTree
+
+
+def _brute_force(boxes: np.ndarray, x0: float, y0: float, x1: float, y1: float):
+    hits = (
+        (boxes[:, 0] <= x1)
+        & (boxes[:, 2] >= x0)
+        & (boxes[:, 1] <= y1)
+        & (boxes[:, 3] >= y0)
+    )
+    return np.nonzero(hits)[0]
+
+
+async def test_layout_index() -> None:
+    parser = LayoutParser()
+    yaml_path = DATA_DIR / "data.txt"
+    parsed = await parser.parse_layout_file(yaml_path)
+    index = await parser.parse_layout_index(yaml_path)
+
+    # the whole canvas returns every polygon and label in document order
+    whole = index.query_layout(-1, -1, 100, 100)
+    assert whole.polygons == parsed.polygons
+    assert whole.labels == parsed.labels
+
+    viewport = index.query_layout(0.5, 3.3, 1.0, 3.6, ["Metal1", "Metal4"])
+    assert viewport.polygons and all(
+        p.layer in {"Metal1", "Metal4"}
+        and p.x0 <= 1.0 and p.x1 >= 0.5 and p.y0 <= 3.6 and p.y1 >= 3.3
+        for p in viewport.polygons
+    )
+    print("Viewport polygons:", len(viewport.polygons), "labels:", len(viewport.labels))
+
+
+async def test_layout_tiles() -> None:
+    parser = LayoutParser()
+    yaml_path = DATA_DIR / "data.txt"
+    parsed = await parser.parse_layout_file(yaml_path)
+    index = await parser.parse_layout_index(yaml_path)
+    tiles = LayoutTiles(index, max_polygons=100)
+
+    # the whole layout is too dense for one vector tile
+    root = tiles.get_tile(0, 0, 0)
+    assert root is not None and root.kind == TileKind.RASTER
+    assert set(root.coverage) == {p.layer for p in parsed.polygons}
+    assert tiles.get_tile(0, 0, 0) is root
+    assert tiles.get_tile(1, 2, 0) is None
+
+    # zooming in far enough returns the real rectangles
+    z = 4
+    vector = [tiles.get_tile(z, x, y) for x in range(2**z) for y in range(2**z)]
+    assert all(tile.kind == TileKind.VECTOR for tile in vector)
+    assert {p for tile in vector for p in map(id, tile.polygons)} == set(
+        map(id, parsed.polygons)
+    )
+    print("Root tile layers:", len(root.coverage))
+
+
+def test_str_tree(size: int) -> None:
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 1000, (size, 2))
+    boxes = np.hstack((corners, corners + rng.uniform(0.05, 2, (size, 2))))
+
+    start = time.perf_counter()
+    tree = STRTree(boxes)
+    print(f"Built STR tree over {size} boxes in {time.perf_counter() - start:.3f} s")
+
+    queries = [(500, 500, 510, 505), (0, 0, 1000, 1000), (-5, -5, -1, -1)]
+    for query in queries:
+        assert np.array_equal(tree.query(*query), _brute_force(boxes, *query))
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        tree.query(*queries[0])
+    elapsed = (time.perf_counter() - start) / 1000
+    print(f"Viewport query: {elapsed * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spatial index test runner.")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(test_layout_index())
+    asyncio.run(test_layout_tiles())
+    test_str_tree(args.size)
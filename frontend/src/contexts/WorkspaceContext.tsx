@@ -15,7 +15,8 @@ import {
   startGeneration,
 } from "@/lib/api";
 import { useJobStream } from "@/hooks/useJobStream";
-import type { DisplayConfig, LayoutData } from "@/lib/types";
+import { useLayoutStream } from "@/hooks/useLayoutStream";
+import type { DisplayConfig, JobProgress, LayoutData } from "@/lib/types";
 
 interface WorkspaceContextValue {
   libraries: string[];
@@ -29,6 +30,7 @@ interface WorkspaceContextValue {
   layerConfig: DisplayConfig | null;
   layerVisibility: Record<string, boolean>;
   logs: string[];
+  progress: JobProgress | null;
   isStreaming: boolean;
   isLayerConfigLoading: boolean;
   isLayoutLoading: boolean;
@@ -86,8 +88,10 @@ export function WorkspaceProvider({ children }: { children: ReactNode }) {
   const {
     logs: streamLogs,
     status: streamStatus,
+    progress,
     isStreaming,
   } = useJobStream(activeJobId);
+  const partialLayout = useLayoutStream(isGenerating ? activeJobId : null);
   const completionKeyRef = useRef<string | null>(null);
 
   useEffect(() => {
@@ -130,6 +134,13 @@ export function WorkspaceProvider({ children }: { children: ReactNode }) {
     setContextLogs([]);
   }, [activeJobId]);
 
+  // Show geometry as the generator writes it; the completed layout replaces it.
+  useEffect(() => {
+    if (isGenerating && partialLayout) {
+      setLayoutData(partialLayout);
+    }
+  }, [isGenerating, partialLayout]);
+
   useEffect(() => {
     if (!activeJobId || !streamStatus) {
       return;
@@ -207,6 +218,11 @@ export function WorkspaceProvider({ children }: { children: ReactNode }) {
         isCancelled = true;
       };
     }
+
+    if (streamStatus === "cancelled") {
+      setIsGenerating(false);
+      setContextLogs((previous) => [...previous, "Generation cancelled."]);
+    }
   }, [activeJobId, streamStatus]);
 
   const generateLayout = useCallback(
@@ -256,6 +272,7 @@ export function WorkspaceProvider({ children }: { children: ReactNode }) {
       layerConfig,
       layerVisibility,
       logs,
+      progress,
       isStreaming,
       isLayerConfigLoading,
       isLayoutLoading,
@@ -275,6 +292,7 @@ export function WorkspaceProvider({ children }: { children: ReactNode }) {
       layerConfig,
       layerVisibility,
       logs,
+      progress,
       isStreaming,
       isLayerConfigLoading,
       isLayoutLoading,
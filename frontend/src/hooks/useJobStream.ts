@@ -1,25 +1,40 @@
 import { useEffect, useState } from "react";
 import { getJobStatus } from "@/lib/api";
-import type { JobStatus } from "@/lib/types";
+import type { DrcReport, DrcViolation, JobProgress, JobStatus } from "@/lib/types";
 
 interface UseJobStreamResult {
   logs: string[];
   status: JobStatus | null;
+  progress: JobProgress | null;
+  violations: DrcViolation[];
+  drc: Omit<DrcReport, "violations"> | null;
   isStreaming: boolean;
 }
 
 function isJobStatus(value: string): value is JobStatus {
-  return value === "pending" || value === "running" || value === "completed" || value === "failed";
+  return (
+    value === "pending" ||
+    value === "running" ||
+    value === "completed" ||
+    value === "failed" ||
+    value === "cancelled"
+  );
 }
 
 export function useJobStream(jobId: string | null): UseJobStreamResult {
   const [logs, setLogs] = useState<string[]>([]);
   const [status, setStatus] = useState<JobStatus | null>(null);
+  const [progress, setProgress] = useState<JobProgress | null>(null);
+  const [violations, setViolations] = useState<DrcViolation[]>([]);
+  const [drc, setDrc] = useState<Omit<DrcReport, "violations"> | null>(null);
   const [isStreaming, setIsStreaming] = useState(false);
 
   useEffect(() => {
     setLogs([]);
     setStatus(null);
+    setProgress(null);
+    setViolations([]);
+    setDrc(null);
     setIsStreaming(false);
 
     if (!jobId) {
@@ -30,9 +45,48 @@ export function useJobStream(jobId: string | null): UseJobStreamResult {
     const source = new EventSource(`/api/generate/${jobId}/stream`);
     setIsStreaming(true);
 
+    // The server batches several log lines into one event, one per data line.
     const onLog = (event: Event) => {
       const message = event as MessageEvent<string>;
-      setLogs((previous) => [...previous, String(message.data)]);
+      const lines = String(message.data).split("\n");
+      setLogs((previous) => [...previous, ...lines]);
+    };
+
+    // Lines skipped because this client fell behind the generator output.
+    const onDropped = (event: Event) => {
+      const message = event as MessageEvent<string>;
+      const count = String(message.data).trim();
+      setLogs((previous) => [...previous, `... ${count} log lines skipped`]);
+    };
+
+    // Throttled progress state parsed from the generator output.
+    const onProgress = (event: Event) => {
+      const message = event as MessageEvent<string>;
+      try {
+        setProgress(JSON.parse(String(message.data)) as JobProgress);
+      } catch {
+        // Ignore malformed progress updates.
+      }
+    };
+
+    // Design rule violations, streamed rule by rule when the check is enabled.
+    const onViolations = (event: Event) => {
+      const message = event as MessageEvent<string>;
+      try {
+        const batch = JSON.parse(String(message.data)) as DrcViolation[];
+        setViolations((previous) => [...previous, ...batch]);
+      } catch {
+        // Ignore malformed batches, the full report is at /drc.
+      }
+    };
+
+    const onDrc = (event: Event) => {
+      const message = event as MessageEvent<string>;
+      try {
+        setDrc(JSON.parse(String(message.data)) as Omit<DrcReport, "violations">);
+      } catch {
+        // Ignore malformed summaries.
+      }
     };
 
     const onComplete = (event: Event) => {
@@ -48,12 +102,21 @@ export function useJobStream(jobId: string | null): UseJobStreamResult {
     };
 
     source.addEventListener("log", onLog);
+    source.addEventListener("dropped", onDropped);
+    source.addEventListener("progress", onProgress);
+    source.addEventListener("violations", onViolations);
+    source.addEventListener("drc", onDrc);
     source.addEventListener("complete", onComplete);
     source.onerror = () => {
+      // While the browser reconnects it sends Last-Event-ID and the server
+      // resumes after the last line received, so only a closed stream ends it.
+      if (source.readyState !== EventSource.CLOSED) {
+        return;
+      }
       source.close();
       setIsStreaming(false);
-      // Fallback: poll the job status when the stream errors or closes
-      // without delivering a "complete" event.
+      // Fallback: poll the job status when the stream closes without
+      // delivering a "complete" event.
       if (!cancelled) {
         getJobStatus(jobId)
           .then((job) => {
@@ -70,10 +133,14 @@ export function useJobStream(jobId: string | null): UseJobStreamResult {
     return () => {
       cancelled = true;
       source.removeEventListener("log", onLog);
+      source.removeEventListener("dropped", onDropped);
+      source.removeEventListener("progress", onProgress);
+      source.removeEventListener("violations", onViolations);
+      source.removeEventListener("drc", onDrc);
       source.removeEventListener("complete", onComplete);
       source.close();
     };
   }, [jobId]);
 
-  return { logs, status, isStreaming };
+  return { logs, status, progress, violations, drc, isStreaming };
 }
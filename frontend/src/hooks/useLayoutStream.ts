@@ -0,0 +1,61 @@
+import { useEffect, useState } from "react";
+import type { LayoutData, LayoutStreamBatch } from "@/lib/types";
+
+// Geometry of a running job, accumulated from the incremental layout stream.
+// Stays null until the generator has written its header record.
+export function useLayoutStream(jobId: string | null): LayoutData | null {
+  const [layout, setLayout] = useState<LayoutData | null>(null);
+
+  useEffect(() => {
+    setLayout(null);
+
+    if (!jobId) {
+      return;
+    }
+
+    const source = new EventSource(`/api/layouts/${jobId}/stream`);
+    let header: LayoutStreamBatch["header"] = null;
+    const polygons: LayoutData["polygons"] = [];
+    const labels: LayoutData["labels"] = [];
+
+    const onGeometry = (event: Event) => {
+      const message = event as MessageEvent<string>;
+      let batch: LayoutStreamBatch;
+      try {
+        batch = JSON.parse(String(message.data)) as LayoutStreamBatch;
+      } catch {
+        return;
+      }
+      header = batch.header ?? header;
+      for (const polygon of batch.polygons) {
+        polygons.push(polygon);
+      }
+      for (const label of batch.labels) {
+        labels.push(label);
+      }
+      // Batches are appended in place and only the wrapper object is new, so
+      // consumers see a new layout without the arrays being copied per batch.
+      if (header) {
+        setLayout({ ...header, polygons, labels });
+      }
+    };
+
+    const onComplete = () => {
+      source.close();
+    };
+
+    source.addEventListener("geometry", onGeometry);
+    source.addEventListener("complete", onComplete);
+    source.onerror = () => {
+      source.close();
+    };
+
+    return () => {
+      source.removeEventListener("geometry", onGeometry);
+      source.removeEventListener("complete", onComplete);
+      source.close();
+    };
+  }, [jobId]);
+
+  return layout;
+}
@@ -1,4 +1,19 @@
-import type { DisplayConfig, GenerateRequest, Job, LayoutData } from "@/lib/types";
+import type {
+  BinaryLayerRange,
+  DisplayConfig,
+  DrcReport,
+  GenerateRequest,
+  InstancedLayout,
+  Job,
+  LayoutBinary,
+  LayoutData,
+  LayoutDiff,
+  LayoutStats,
+  LayoutTile,
+  Net,
+  NetHighlight,
+  Polygon,
+} from "@/lib/types";
 
 export class ApiError extends Error {
   public readonly status: number;
@@ -55,10 +70,218 @@ export function getJobStatus(jobId: string): Promise<Job> {
   return requestJson<Job>(`/api/generate/${jobId}/status`);
 }
 
+export function cancelGeneration(jobId: string): Promise<Job> {
+  return requestJson<Job>(`/api/generate/${jobId}`, { method: "DELETE" });
+}
+
 export function getLayout(jobId: string): Promise<LayoutData> {
   return requestJson<LayoutData>(`/api/layouts/${jobId}`);
 }
 
+export function getInstancedLayout(jobId: string): Promise<InstancedLayout> {
+  return requestJson<InstancedLayout>(`/api/layouts/${jobId}/instances`);
+}
+
+// Draws every instance of every group, as served by getLayout up to the draw
+// order within a layer.
+export function expandInstancedLayout(layout: InstancedLayout): LayoutData {
+  // integer units per um: dividing keeps 0.34 exact where multiplying by the
+  // resolution gives 0.33999999999999997
+  const units = Math.round(1 / layout.resolution);
+  const polygons: Polygon[] = [];
+  for (const group of layout.groups) {
+    for (const [dx, dy] of group.offsets) {
+      for (const [layer, x0, y0, x1, y1] of group.shapes) {
+        polygons.push({
+          layer: layout.layers[layer],
+          x0: (x0 + dx) / units,
+          y0: (y0 + dy) / units,
+          x1: (x1 + dx) / units,
+          y1: (y1 + dy) / units,
+          width: (x1 - x0) / units,
+          height: (y1 - y0) / units,
+        });
+      }
+    }
+  }
+  return {
+    canvas_width: layout.canvas_width,
+    canvas_height: layout.canvas_height,
+    start_x: layout.start_x,
+    start_y: layout.start_y,
+    layer_maps: layout.layer_maps,
+    polygons,
+    labels: layout.labels,
+  };
+}
+
+export function queryLayout(
+  jobId: string,
+  viewport: { x0: number; y0: number; x1: number; y1: number },
+  layers?: string[],
+): Promise<LayoutData> {
+  const params = new URLSearchParams({
+    x0: String(viewport.x0),
+    y0: String(viewport.y0),
+    x1: String(viewport.x1),
+    y1: String(viewport.y1),
+  });
+  if (layers) {
+    params.set("layers", layers.join(","));
+  }
+  return requestJson<LayoutData>(`/api/layouts/${jobId}/query?${params.toString()}`);
+}
+
+export function getLayoutTile(jobId: string, z: number, x: number, y: number): Promise<LayoutTile> {
+  return requestJson<LayoutTile>(`/api/layouts/${jobId}/tiles/${z}/${x}/${y}`);
+}
+
+// URL of a server-rendered PNG thumbnail, usable directly as an <img> src
+export function getLayoutPreviewUrl(
+  jobId: string,
+  size: { width?: number; height?: number } = {},
+  layers?: string[],
+): string {
+  const params = new URLSearchParams();
+  if (size.width) {
+    params.set("w", String(size.width));
+  }
+  if (size.height) {
+    params.set("h", String(size.height));
+  }
+  if (layers) {
+    params.set("layers", layers.join(","));
+  }
+  const query = params.toString();
+  return `/api/layouts/${jobId}/preview.png${query ? `?${query}` : ""}`;
+}
+
+// Uploads a layout file or Boundbox repr dump (e.g. routes) to draw over a job's layout
+export function uploadLayoutOverlay(
+  jobId: string,
+  name: string,
+  file: Blob,
+): Promise<{ name: string; polygons: number; labels: number; layers: string[] }> {
+  return requestJson(`/api/layouts/${jobId}/overlays/${name}`, { method: "PUT", body: file });
+}
+
+export function getOverlaidLayout(jobId: string, name: string): Promise<LayoutData> {
+  return requestJson<LayoutData>(`/api/layouts/${jobId}/overlays/${name}`);
+}
+
+// Per-layer areas and a density map over window x window squares (layout units)
+export function getLayoutStats(jobId: string, window?: number): Promise<LayoutStats> {
+  const query = window ? `?window=${window}` : "";
+  return requestJson<LayoutStats>(`/api/layouts/${jobId}/stats${query}`);
+}
+
+// Design rule violations of a completed layout, when the server checks them
+export function getDrcReport(jobId: string): Promise<DrcReport> {
+  return requestJson<DrcReport>(`/api/layouts/${jobId}/drc`);
+}
+
+export async function getLayoutNets(jobId: string): Promise<Net[]> {
+  const { nets } = await requestJson<{ nets: Net[] }>(`/api/layouts/${jobId}/nets`);
+  return nets;
+}
+
+export function getNet(jobId: string, netId: number): Promise<NetHighlight> {
+  return requestJson<NetHighlight>(`/api/layouts/${jobId}/nets/${netId}`);
+}
+
+// Net of the topmost metal or via at a layout point, rejects when there is none
+export function getNetAt(
+  jobId: string,
+  x: number,
+  y: number,
+  layers?: string[],
+): Promise<NetHighlight> {
+  const params = new URLSearchParams({ x: String(x), y: String(y) });
+  if (layers?.length) params.set("layers", layers.join(","));
+  return requestJson<NetHighlight>(`/api/layouts/${jobId}/nets/at?${params}`);
+}
+
+export function getLayoutDiff(jobId: string, otherJobId: string): Promise<LayoutDiff> {
+  return requestJson<LayoutDiff>(`/api/layouts/${jobId}/diff/${otherJobId}`);
+}
+
+// Turns the layout of jobId into the one of otherJobId without re-downloading
+// the unchanged geometry.
+export function applyLayoutDiff(base: LayoutData, diff: LayoutDiff): LayoutData {
+  const removedPolygons = new Set(diff.removed_polygons);
+  const removedLabels = new Set(diff.removed_labels);
+  return {
+    canvas_width: diff.canvas_width,
+    canvas_height: diff.canvas_height,
+    start_x: diff.start_x,
+    start_y: diff.start_y,
+    layer_maps: diff.layer_maps,
+    polygons: base.polygons
+      .filter((_, index) => !removedPolygons.has(index))
+      .concat(diff.added_polygons),
+    labels: base.labels.filter((_, index) => !removedLabels.has(index)).concat(diff.added_labels),
+  };
+}
+
+const LAYOUT_BINARY_MAGIC = "LCLB";
+const LAYOUT_BINARY_HEADER_SIZE = 20;
+
+interface LayoutBinaryMetadata {
+  canvas_width: number;
+  canvas_height: number;
+  start_x: number;
+  start_y: number;
+  layer_maps: Record<string, string>;
+  layers: BinaryLayerRange[];
+  label_layers: number[];
+  label_texts: string[];
+}
+
+// Decodes the header documented in backend/services/layout_arrays.py. The
+// coordinate arrays are views over the response buffer, not copies.
+export function decodeLayoutBinary(buffer: ArrayBuffer): LayoutBinary {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  if (magic !== LAYOUT_BINARY_MAGIC) {
+    throw new Error(`Unexpected layout binary magic: ${magic}`);
+  }
+  const version = view.getUint32(4, true);
+  if (version !== 1) {
+    throw new Error(`Unsupported layout binary version: ${version}`);
+  }
+  const metadataLength = view.getUint32(8, true);
+  const polygonCount = view.getUint32(12, true);
+  const labelCount = view.getUint32(16, true);
+
+  const metadata = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, LAYOUT_BINARY_HEADER_SIZE, metadataLength)),
+  ) as LayoutBinaryMetadata;
+
+  const polygonOffset = LAYOUT_BINARY_HEADER_SIZE + metadataLength;
+  const labelOffset = polygonOffset + polygonCount * 16;
+
+  return {
+    canvas_width: metadata.canvas_width,
+    canvas_height: metadata.canvas_height,
+    start_x: metadata.start_x,
+    start_y: metadata.start_y,
+    layer_maps: metadata.layer_maps,
+    layers: metadata.layers,
+    polygonCoords: new Float32Array(buffer, polygonOffset, polygonCount * 4),
+    labelLayers: metadata.label_layers,
+    labelTexts: metadata.label_texts,
+    labelCoords: new Float32Array(buffer, labelOffset, labelCount * 2),
+  };
+}
+
+export async function getLayoutBinary(jobId: string): Promise<LayoutBinary> {
+  const response = await fetch(`/api/layouts/${jobId}/binary`);
+  if (!response.ok) {
+    throw new ApiError(`API request failed with status ${response.status}`, response.status, await response.text());
+  }
+  return decodeLayoutBinary(await response.arrayBuffer());
+}
+
 export function getLayoutConfig(): Promise<DisplayConfig> {
   return requestJson<DisplayConfig>("/api/layout/config");
 }
@@ -1,4 +1,11 @@
-export type JobStatus = "pending" | "running" | "completed" | "failed";
+export type JobStatus = "pending" | "running" | "completed" | "failed" | "cancelled";
+
+export interface JobProgress {
+  done: number;
+  total: number;
+  rate: number | null;
+  eta: number | null;
+}
 
 export interface Job {
   job_id: string;
@@ -6,6 +13,9 @@ export interface Job {
   created_at: string;
   completed_at: string | null;
   error: string | null;
+  priority: number;
+  queue_position: number | null;
+  progress: JobProgress | null;
 }
 
 export interface Polygon {
@@ -35,6 +45,147 @@ export interface LayoutData {
   labels: Label[];
 }
 
+export interface LayerDiff {
+  added: number;
+  removed: number;
+  unchanged: number;
+}
+
+// Delta from one job's layout to another's, see backend/models.py.
+export interface LayoutDiff {
+  canvas_width: number;
+  canvas_height: number;
+  start_x: number;
+  start_y: number;
+  layer_maps: Record<string, string>;
+  removed_polygons: number[];
+  removed_labels: number[];
+  added_polygons: Polygon[];
+  added_labels: Label[];
+  polygon_layers: Record<string, LayerDiff>;
+  label_layers: Record<string, LayerDiff>;
+}
+
+export interface LayerStats {
+  polygons: number;
+  total_area: number;
+  union_area: number;
+  utilization: number;
+  bounds: [number, number, number, number];
+  // covered fraction per window, rows of columns, first row at the bottom
+  density: number[][];
+}
+
+// Per-layer area and density analytics, see backend/models.py.
+export interface LayoutStats {
+  canvas_width: number;
+  canvas_height: number;
+  start_x: number;
+  start_y: number;
+  window: number;
+  rows: number;
+  columns: number;
+  layers: Record<string, LayerStats>;
+}
+
+export interface DrcViolation {
+  rule: "width" | "spacing" | "enclosure";
+  layer: string;
+  other_layer: string | null;
+  value: number;
+  limit: number;
+  bounds: [number, number, number, number];
+  // indices into LayoutData.polygons
+  polygons: number[];
+}
+
+// Design rule check of a completed layout, see backend/models.py.
+export interface DrcReport {
+  counts: Record<string, number>;
+  polygons: number;
+  seconds: number;
+  polygons_per_second: number;
+  violations: DrcViolation[];
+}
+
+// Electrical net of the metal and via layers, see backend/models.py.
+export interface Net {
+  id: number;
+  name: string;
+  // more than one label means shorted nets
+  labels: string[];
+  polygons: number;
+  layers: string[];
+  bounds: [number, number, number, number];
+}
+
+export interface NetHighlight {
+  net: Net;
+  // indices into LayoutData.polygons
+  polygons: number[];
+}
+
+// Layout with repeated rectangles stored once, see backend/models.py.
+export interface InstanceGroup {
+  // [layer index, x0, y0, x1, y1] at the first instance
+  shapes: number[][];
+  // [dx, dy] of every instance, the first one is [0, 0]
+  offsets: number[][];
+}
+
+export interface InstancedLayout extends Omit<LayoutData, "polygons"> {
+  // shape coordinates and offsets are integer multiples of this
+  resolution: number;
+  layers: string[];
+  groups: InstanceGroup[];
+  polygons: number;
+  shapes: number;
+}
+
+export type LayoutHeader = Omit<LayoutData, "polygons" | "labels">;
+
+// One event of /api/layouts/{job_id}/stream while the job is running.
+export interface LayoutStreamBatch {
+  header: LayoutHeader | null;
+  polygons: Polygon[];
+  labels: Label[];
+}
+
+export interface BinaryLayerRange {
+  name: string;
+  offset: number;
+  count: number;
+}
+
+// Columnar layout decoded from /api/layouts/{job_id}/binary.
+// Layer i owns polygonCoords[offset * 4, (offset + count) * 4) as x0, y0, x1, y1.
+export interface LayoutBinary {
+  canvas_width: number;
+  canvas_height: number;
+  start_x: number;
+  start_y: number;
+  layer_maps: Record<string, string>;
+  layers: BinaryLayerRange[];
+  polygonCoords: Float32Array;
+  labelLayers: number[];
+  labelTexts: string[];
+  labelCoords: Float32Array;
+}
+
+// Level-of-detail tile from /api/layouts/{job_id}/tiles/{z}/{x}/{y}.
+// Raster tiles carry base64 uint8 coverage per layer, first row at the bottom.
+export interface LayoutTile {
+  z: number;
+  x: number;
+  y: number;
+  bounds: [number, number, number, number];
+  kind: "raster" | "vector";
+  raster_size: number;
+  coverage: Record<string, string>;
+  polygons: Polygon[];
+  labels: Label[];
+}
+
 export interface LayerConfig {
   color: string;
   facecolor: string;
@@ -49,4 +200,5 @@ export type DisplayConfig = Record<string, Record<string, LayerConfig>>;
 export interface GenerateRequest {
   cell_name?: string;
   config?: Record<string, unknown>;
+  priority?: number;
 }